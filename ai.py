@@ -0,0 +1,357 @@
+import time
+
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from zobrist import position_key
+
+#score given to a won game, large enough that no heuristic score can reach it
+WIN_SCORE = 1000000
+
+#bonus for owning a corner in the heuristic evaluation
+CORNER_WEIGHT = 10
+
+
+class SearchTimeout(Exception):
+    '''
+    Raised inside the search when the time budget for a move runs out
+    '''
+    pass
+
+
+def other_player(player):
+    '''
+    gets the opponent of a player
+
+    ARGS:
+        player (str): 'X' or 'O'
+    RETURNS:
+        (str): 'O' or 'X'
+    '''
+    if(player == 'X'):
+        return 'O'
+    return 'X'
+
+def final_score(board, player):
+    '''
+    Score of a finished game from a player's point of view
+
+    ARGS:
+        board (Board): board at the end of the game
+        player (str): 'X' or 'O' for which player the score is for
+    RETURNS:
+        (int): WIN_SCORE plus the disc difference for a win, minus that for a loss, 0 for a tie
+    '''
+    o_num, x_num = board.get_piece_count()
+    diff = o_num - x_num
+    if(player == 'X'):
+        diff = -diff
+
+    if(diff > 0):
+        return WIN_SCORE + diff
+    elif(diff < 0):
+        return -WIN_SCORE + diff
+    return 0
+
+def evaluate(board, player):
+    '''
+    Heuristic score of a position from a player's point of view, disc difference plus a bonus for each corner
+
+    ARGS:
+        board (Board): board to score
+        player (str): 'X' or 'O' for which player the score is for
+    RETURNS:
+        (int): higher is better for player
+    '''
+    o_num, x_num = board.get_piece_count()
+    score = o_num - x_num
+
+    last = board.dimensions[0] - 1
+    for i, j in ((0, 0), (0, last), (last, 0), (last, last)):
+        piece = board.get_piece(i, j)
+        if(piece == 'O'):
+            score += CORNER_WEIGHT
+        elif(piece == 'X'):
+            score -= CORNER_WEIGHT
+
+    if(player == 'X'):
+        return -score
+    return score
+
+
+class AIPlayer:
+    '''
+    Computer player which searches with negamax, alpha-beta pruning and iterative deepening under a time budget
+
+    The search only uses Board.get_available_moves, make_move and unmake_move so it works with any backend.
+    A player with no moves passes and the game ends when both players have no moves, the same as gameLoop.
+    Results are kept in a transposition table keyed on Board.hash_key which is reused between moves.
+    Once few enough empty squares are left the position is solved exactly with endgame.EndgameSolver instead,
+    falling back to the normal search if the solve doesn't finish in time. An opening book, if given, is
+    checked before any search and its move played when one has been seen in enough games.
+
+    Attributes:
+        time_limit float: seconds allowed per move
+        max_depth int: deepest iteration to search
+        evaluate function(board, player): heuristic score used at the search horizon
+        table TranspositionTable: search results for positions seen so far
+        endgame_empties int: empty squares at or below which the position is solved exactly, 0 to never solve
+        solver EndgameSolver: exact solver with its own transposition table
+        book OpeningBook: opening book checked before searching, None for no book
+        book_depth int: number of moves from the start of the game the book is checked for
+        book_min_games int: fewest games a book move needs to be played
+        from_book bool: whether the last move came from the book
+        nodes int: number of nodes searched for the last move
+        depth_reached int: depth of the last fully completed iteration for the last move
+        elapsed float: seconds spent on the last move
+
+    Methods:
+        choose_move(board, player): returns the best move found for player (1 indexed) or None if they have to pass
+        get_stats(): returns a dict with the search statistics of the last move
+    '''
+    def __init__(self, time_limit=1.0, max_depth=64, evaluate=evaluate, table_size=1 << 16, endgame_empties=10,
+                 book=None, book_depth=20, book_min_games=10):
+        '''
+        Constructor
+
+        ARGS:
+            time_limit (float): seconds allowed per move
+            max_depth (int): deepest iteration to search
+            evaluate (function(board, player)): heuristic score used at the search horizon
+            table_size (int): number of buckets in the transposition table
+            endgame_empties (int): empty squares at or below which the position is solved exactly
+            book (OpeningBook): opening book to check before searching
+            book_depth (int): number of moves from the start of the game the book is checked for
+            book_min_games (int): fewest games a book move needs to be played
+        '''
+        #imported here as the endgame module uses this one's helpers
+        from endgame import EndgameSolver
+
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.evaluate = evaluate
+        self.table = TranspositionTable(table_size)
+        self.endgame_empties = endgame_empties
+        self.solver = EndgameSolver(endgame_empties)
+        self.book = book
+        self.book_depth = book_depth
+        self.book_min_games = book_min_games
+        self.from_book = False
+
+        self.nodes = 0
+        self.depth_reached = 0
+        self.elapsed = 0.0
+        self.deadline = 0.0
+
+    def choose_move(self, board, player):
+        '''
+        Searches for the best move for a player
+
+        The board is returned in the state it was given in and piece_dirs is left filled for player,
+        so the move can be played with add_piece straight away.
+
+        ARGS:
+            board (Board): current position
+            player (str): 'X' or 'O' for which player is moving
+        RETURNS:
+            ((int, int)): the chosen move in the same 1 indexed form as get_available_moves, None if player has no moves
+        '''
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit
+        self.nodes = 0
+        self.depth_reached = 0
+        self.from_book = False
+
+        moves = self.order_moves(board, board.get_available_moves(player))
+        best_move = moves[0] if moves else None
+
+        size = board.dimensions[0]
+        placed = sum(board.get_piece_count())
+        empties = size * size - placed
+        decided = False
+
+        #every move adds a piece so the pieces beyond the starting 4 count the moves played
+        if(self.book is not None and len(moves) > 1 and placed - 4 < self.book_depth):
+            book_move = self.book.choose_move(board, player, self.book_min_games)
+            if(book_move in moves):
+                best_move = book_move
+                self.from_book = True
+                decided = True
+
+        #with zero or one moves there is nothing to search
+        if(len(moves) > 1 and not decided and empties <= self.endgame_empties):
+            try:
+                best_move = self.solver.solve(board, player, self.deadline)[1]
+                self.nodes = self.solver.nodes
+                self.depth_reached = empties
+                decided = True
+            except SearchTimeout:
+                self.nodes = self.solver.nodes
+
+        if(len(moves) > 1 and not decided):
+            try:
+                for depth in range(1, self.max_depth + 1):
+                    best_move, score = self.search_root(board, player, moves, depth)
+                    self.depth_reached = depth
+
+                    #search the best move first in the next iteration
+                    moves.remove(best_move)
+                    moves.insert(0, best_move)
+
+                    #a proven result will not change with more depth
+                    if(abs(score) >= WIN_SCORE):
+                        break
+            except SearchTimeout:
+                pass
+
+        #leave piece_dirs as it was for the root position
+        board.get_available_moves(player)
+
+        self.elapsed = time.perf_counter() - start
+        return best_move
+
+    def search_root(self, board, player, moves, depth):
+        '''
+        Searches every root move to a fixed depth
+
+        ARGS:
+            board (Board): current position
+            player (str): 'X' or 'O' for which player is moving
+            moves ([(int, int)]): root moves (1 indexed), searched in order
+            depth (int): depth to search to
+        RETURNS:
+            ((int, int), int): the best move and its score
+        '''
+        opponent = other_player(player)
+        alpha = -WIN_SCORE * 2
+        beta = WIN_SCORE * 2
+        best_move = moves[0]
+
+        for move in moves:
+            board.make_move((move[0] - 1, move[1] - 1), player)
+            try:
+                score = -self.negamax(board, opponent, depth - 1, -beta, -alpha, False)
+            finally:
+                board.unmake_move()
+
+            if(score > alpha):
+                alpha = score
+                best_move = move
+
+        return best_move, alpha
+
+    def negamax(self, board, player, depth, alpha, beta, passed):
+        '''
+        Negamax search with alpha-beta pruning
+
+        ARGS:
+            board (Board): current position
+            player (str): 'X' or 'O' for which player is moving
+            depth (int): remaining depth
+            alpha, beta (int, int): search window
+            passed (bool): whether the previous player passed
+        RETURNS:
+            (int): score of the position for player
+        '''
+        self.nodes += 1
+        if(self.nodes & 127 == 0 and time.perf_counter() > self.deadline):
+            raise SearchTimeout
+
+        if(depth <= 0):
+            return self.evaluate(board, player)
+
+        #use a stored result if it was searched deep enough, otherwise just its best move for ordering
+        key = position_key(board, player)
+        entry = self.table.probe(key)
+        table_move = None
+        if(entry):
+            stored_depth, stored_score, bound, table_move = entry
+            if(stored_depth >= depth):
+                if(bound == EXACT):
+                    return stored_score
+                elif(bound == LOWER):
+                    alpha = max(alpha, stored_score)
+                else:
+                    beta = min(beta, stored_score)
+                if(alpha >= beta):
+                    return stored_score
+
+        opponent = other_player(player)
+        moves = board.get_available_moves(player)
+
+        #no moves means a pass, and if the opponent passed as well the game is over
+        if(not moves):
+            if(passed):
+                return final_score(board, player)
+            return -self.negamax(board, opponent, depth - 1, -beta, -alpha, True)
+
+        original_alpha = alpha
+        best_score = -WIN_SCORE * 2
+        best_move = None
+        for move in self.order_moves(board, moves, table_move):
+            board.make_move((move[0] - 1, move[1] - 1), player)
+            try:
+                score = -self.negamax(board, opponent, depth - 1, -beta, -alpha, False)
+            finally:
+                board.unmake_move()
+
+            if(score > best_score):
+                best_score = score
+                best_move = move
+                if(score > alpha):
+                    alpha = score
+                    if(alpha >= beta):
+                        break
+
+        #a score at or below the original alpha is only an upper bound, one at or above beta only a lower bound
+        if(best_score <= original_alpha):
+            bound = UPPER
+        elif(best_score >= beta):
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(key, depth, best_score, bound, best_move)
+
+        return best_score
+
+    def order_moves(self, board, moves, first=None):
+        '''
+        Orders moves so corners get searched first and squares next to corners last
+
+        ARGS:
+            board (Board): current position
+            moves ([(int, int)]): moves to order (1 indexed)
+            first ((int, int)): move to search before all others, usually the best move from the transposition table
+        RETURNS:
+            [(int, int)]: the moves in search order
+        '''
+        size = board.dimensions[0]
+
+        def priority(move):
+            if(move == first):
+                return -1
+            near_i = move[0] <= 2 or move[0] >= size - 1
+            near_j = move[1] <= 2 or move[1] >= size - 1
+            corner_i = move[0] == 1 or move[0] == size
+            corner_j = move[1] == 1 or move[1] == size
+            if(corner_i and corner_j):
+                return 0
+            elif(near_i and near_j):
+                return 2
+            return 1
+
+        return sorted(moves, key=priority)
+
+    def get_stats(self):
+        '''
+        Statistics for the last move searched
+
+        RETURNS:
+            ({str: number}): nodes searched, depth reached, seconds taken, nodes per second, whether the move
+                             came from the book and the transposition table statistics under 'table'
+        '''
+        nps = self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+        return {'nodes': self.nodes, 'depth': self.depth_reached, 'time': self.elapsed, 'nps': nps,
+                'book': self.from_book, 'table': self.table.get_stats()}
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,308 @@
+import numpy as np
+
+from board import Board, DIRECTIONS
+from compact import CODES, VALUES
+
+
+def look(planes, di, dj, steps=1):
+    '''
+    Shifts boolean planes so every position holds the value found a number of steps away in a direction
+
+    out[..., i, j] is planes[..., i + steps * di, j + steps * dj], or False when that is off the board.
+
+    ARGS:
+        planes (np.ndarray): boolean array with the board in the last two axes
+        di, dj (int, int): direction step, one of DIRECTIONS
+        steps (int): number of steps to look
+    RETURNS:
+        (np.ndarray): shifted array with the same shape
+    '''
+    size = planes.shape[-1]
+    out = np.zeros_like(planes)
+    oy = di * steps
+    ox = dj * steps
+    if(abs(oy) >= size or abs(ox) >= size):
+        return out
+
+    out[..., max(0, -oy):size - max(0, oy), max(0, -ox):size - max(0, ox)] = \
+        planes[..., max(0, oy):size - max(0, -oy), max(0, ox):size - max(0, -ox)]
+    return out
+
+def legal_move_dirs(cells, codes):
+    '''
+    Finds the flip directions of every position on a stack of boards
+
+    Same rule as Board.is_valid_move: direction d is valid from an empty position when the next position that way
+    is an opponent piece and the run of opponent pieces is closed by a piece of the player to move.
+
+    ARGS:
+        cells (np.ndarray): int8 array (K, size, size) of cell codes (see compact.CODES)
+        codes (np.ndarray): int8 array (K,) with the code of the player to move on each board
+    RETURNS:
+        (np.ndarray): bool array (K, 8, size, size), [k, d - 1, i, j] is True if direction d flips from i, j on board k
+    '''
+    count, size = cells.shape[0], cells.shape[-1]
+    own = cells == codes[:, None, None]
+    opp = cells == (3 - codes)[:, None, None]
+    empty = cells == 0
+
+    dirs = np.zeros((count, 8, size, size), dtype=bool)
+    for d, (di, dj) in enumerate(DIRECTIONS):
+        #run holds the positions whose first k - 1 steps this way were all opponent pieces
+        run = look(opp, di, dj, 1)
+        found = np.zeros_like(run)
+        for k in range(2, size):
+            if(not run.any()):
+                break
+            found |= run & look(own, di, dj, k)
+            run &= look(opp, di, dj, k)
+        dirs[:, d] = found & empty
+
+    return dirs
+
+def random_moves(mask, rng):
+    '''
+    Picks a uniformly random legal move on every board
+
+    ARGS:
+        mask (np.ndarray): bool array (K, size, size) of legal moves
+        rng (np.random.Generator): source of randomness
+    RETURNS:
+        (np.ndarray): int array (K, 2) of 0 indexed moves, -1 on boards without a legal move
+    '''
+    count, size = mask.shape[0], mask.shape[-1]
+
+    #the legal position with the highest random score is the pick
+    scores = rng.random(mask.shape) * mask
+    flat = scores.reshape(count, -1).argmax(axis=1)
+
+    moves = np.stack((flat // size, flat % size), axis=1)
+    moves[~mask.reshape(count, -1).any(axis=1)] = -1
+    return moves
+
+
+class BatchBoard:
+    '''
+    K boards of the same size held as one numpy array so move generation and moves run for all of them at once
+
+    Cells use the same codes as the compact backend (0 empty, 1 O, 2 X). Moves found and pieces flipped are the
+    same as Board.is_valid_move and turn_pieces give for each board on its own.
+
+    Attributes:
+        cells np.ndarray: int8 array (K, size, size) of cell codes
+        dimensions (int, int): dimensions of each board
+
+    Methods:
+        from_boards(boards): builds a batch from Board objects
+        legal_moves(players): returns the legal move masks and flip directions for every board
+        apply_moves(moves, players): plays one move (or a pass) on every board
+        get_piece_counts(): returns the O and X counts of every board
+        get_available_moves(k, player): returns the moves on one board in the same form as Board.get_available_moves
+        to_board(k, backend): builds a Board for one of the boards
+        play_random(rng, start): plays random moves on every board until all the games are over
+    '''
+    def __init__(self, count, size):
+        '''
+        Constructor, every board starts with the same 4 pieces as Board
+
+        ARGS:
+            count (int): number of boards
+            size (int): size of each square board
+        '''
+        self.dimensions = (size, size)
+        self.cells = np.zeros((count, size, size), dtype=np.int8)
+
+        half = size // 2
+        self.cells[:, half - 1, half - 1] = CODES['O']
+        self.cells[:, half, half] = CODES['O']
+        self.cells[:, half, half - 1] = CODES['X']
+        self.cells[:, half - 1, half] = CODES['X']
+
+    def __len__(self):
+        '''
+        length method
+
+        RETURNS:
+            int: number of boards
+        '''
+        return self.cells.shape[0]
+
+    @classmethod
+    def from_boards(cls, boards):
+        '''
+        Builds a batch holding the positions of some boards
+
+        ARGS:
+            boards ([Board]): boards of the same size, any backend
+        RETURNS:
+            (BatchBoard): batch with board k in the position of boards[k]
+        '''
+        size = boards[0].dimensions[0]
+        batch = cls(len(boards), size)
+        batch.cells[:] = 0
+        for k, brd in enumerate(boards):
+            for i in range(size):
+                for j in range(size):
+                    piece = brd.get_piece(i, j)
+                    if(piece):
+                        batch.cells[k, i, j] = CODES[piece]
+        return batch
+
+    def player_codes(self, players):
+        '''
+        Converts the player argument of the batch methods to an array of cell codes
+
+        ARGS:
+            players (str or np.ndarray): 'O' or 'X' for every board, or an array (K,) of codes
+        RETURNS:
+            (np.ndarray): int8 array (K,) of player codes
+        '''
+        if(isinstance(players, str)):
+            return np.full(len(self), CODES[players], dtype=np.int8)
+        return np.asarray(players, dtype=np.int8)
+
+    def legal_moves(self, players):
+        '''
+        Finds the legal moves on every board
+
+        ARGS:
+            players (str or np.ndarray): player to move, see player_codes
+        RETURNS:
+            (np.ndarray, np.ndarray): bool mask (K, size, size) of legal moves and bool array (K, 8, size, size)
+                                      of flip directions, the batched form of piece_dirs
+        '''
+        dirs = legal_move_dirs(self.cells, self.player_codes(players))
+        return dirs.any(axis=1), dirs
+
+    def apply_moves(self, moves, players):
+        '''
+        Plays one move on every board, flipping pieces the same way turn_pieces does
+
+        ARGS:
+            moves (np.ndarray): int array (K, 2) of 0 indexed moves, a row of -1 passes on that board
+            players (str or np.ndarray): player moving, see player_codes
+        RETURNS:
+            (np.ndarray): int array (K,) with the number of pieces flipped on each board
+        RAISES:
+            ValueError: if a move is not legal on its board, no board is changed
+        '''
+        codes = self.player_codes(players)
+        opp_codes = 3 - codes
+        moves = np.asarray(moves)
+        count, size = self.cells.shape[0], self.dimensions[0]
+
+        index = np.arange(count)
+        active = moves[:, 0] >= 0
+        mi = np.where(active, moves[:, 0], 0)
+        mj = np.where(active, moves[:, 1], 0)
+
+        #first find how far each direction flips on every board without changing anything
+        #a run of opponent pieces closed by an own piece at step k flips the pieces at steps 1 to k - 1
+        lengths = []
+        for di, dj in DIRECTIONS:
+            closing = np.zeros(count, dtype=np.int64)
+            run = active & (self.cells[index, mi, mj] == 0)
+            for k in range(1, size):
+                y = mi + k * di
+                x = mj + k * dj
+                inside = run & (y >= 0) & (y < size) & (x >= 0) & (x < size)
+                values = self.cells[index, np.clip(y, 0, size - 1), np.clip(x, 0, size - 1)]
+                if(k > 1):
+                    closing[inside & (values == codes)] = k
+                run = inside & (values == opp_codes)
+                if(not run.any()):
+                    break
+            lengths.append(np.maximum(closing - 1, 0))
+
+        flipped = sum(lengths)
+        illegal = active & (flipped == 0)
+        if(illegal.any()):
+            k = int(np.argmax(illegal))
+            raise ValueError(f'Illegal move {tuple(moves[k])} on board {k}')
+
+        for (di, dj), length in zip(DIRECTIONS, lengths):
+            for k in range(1, int(length.max(initial=0)) + 1):
+                sel = length >= k
+                self.cells[index[sel], mi[sel] + k * di, mj[sel] + k * dj] = codes[sel]
+
+        self.cells[index[active], mi[active], mj[active]] = codes[active]
+        return flipped
+
+    def get_piece_counts(self):
+        '''
+        Counts the pieces on every board
+
+        RETURNS:
+            (np.ndarray): int array (K, 2) with the O count followed by the X count, like get_piece_count
+        '''
+        return np.stack(((self.cells == CODES['O']).sum(axis=(1, 2)), (self.cells == CODES['X']).sum(axis=(1, 2))), axis=1)
+
+    def get_available_moves(self, k, player):
+        '''
+        Gets the moves on one board
+
+        ARGS:
+            k (int): index of the board
+            player (str): 'X' or 'O'
+        RETURNS:
+            [(int, int)]: the moves (1 indexed) in the same order as Board.get_available_moves
+        '''
+        dirs = legal_move_dirs(self.cells[k:k + 1], np.array([CODES[player]], dtype=np.int8))
+        return [(int(i) + 1, int(j) + 1) for i, j in zip(*np.nonzero(dirs[0].any(axis=0)))]
+
+    def to_board(self, k, backend='grid'):
+        '''
+        Builds a Board in the position of one of the boards
+
+        ARGS:
+            k (int): index of the board
+            backend (str): backend for the new board
+        RETURNS:
+            (Board): board with the same pieces, counts and hash
+        '''
+        size = self.dimensions[0]
+        brd = Board(size, backend=backend)
+        for i in range(size):
+            for j in range(size):
+                brd.set_piece(i, j, VALUES[self.cells[k, i, j]])
+        brd.count_pieces()
+        return brd
+
+    def play_random(self, rng, start='O'):
+        '''
+        Plays uniformly random moves on every board until all of the games are over
+
+        Passing and the end of the game follow gameLoop: a player with no moves passes, and a game ends when both
+        players pass in a row or either player has no pieces.
+
+        ARGS:
+            rng (np.random.Generator): source of randomness
+            start (str): 'O' or 'X' for which player moves first
+        RETURNS:
+            (np.ndarray): int array (K, 2) of final O and X counts
+        '''
+        count = len(self)
+        players = self.player_codes(start)
+        skipped = np.zeros(count, dtype=bool)
+        done = np.zeros(count, dtype=bool)
+
+        while(not done.all()):
+            mask, dirs = self.legal_moves(players)
+            has_moves = mask.any(axis=(1, 2))
+            counts = self.get_piece_counts()
+
+            skip = ~done & ~has_moves & ~skipped
+            done |= ~skip & ((~has_moves & skipped) | (counts[:, 0] == 0) | (counts[:, 1] == 0))
+
+            moves = random_moves(mask, rng)
+            moves[done | skip] = -1
+            self.apply_moves(moves, players)
+
+            skipped = skip
+            players = np.where(done, players, 3 - players).astype(np.int8)
+
+        return self.get_piece_counts()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,260 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from board import Board
+
+
+#board sizes benchmarked unless others are asked for
+DEFAULT_SIZES = [8, 16, 32, 64]
+
+
+def make_position(size, seed):
+    '''
+    Plays seeded random moves from the starting position to get a midgame position
+
+    The moves come from get_available_moves which returns the same moves on every backend,
+    so the position is the same whichever backend is being benchmarked.
+
+    ARGS:
+        size (int): size of the board
+        seed (int): seed for the random moves
+    RETURNS:
+        ([(str, (int, int))], str): moves played as (player, 0 indexed position) and the player to move next
+    '''
+    brd = Board(size, backend='bitboard')
+    rng = random.Random(seed)
+    player = 'O'
+    history = []
+
+    #about a third of the board gets filled, stopping early if neither player can move
+    while(len(history) < size * size // 3):
+        moves = brd.get_available_moves(player)
+        if(not moves):
+            player = 'O' if player == 'X' else 'X'
+            if(not brd.has_any_move(player)):
+                break
+            continue
+
+        move = rng.choice(moves)
+        brd.make_move((move[0] - 1, move[1] - 1), player)
+        history.append((player, (move[0] - 1, move[1] - 1)))
+        player = 'O' if player == 'X' else 'X'
+
+    return history, player
+
+def setup_board(size, history, options):
+    '''
+    Builds a board and replays a list of moves onto it
+
+    ARGS:
+        size (int): size of the board
+        history ([(str, (int, int))]): moves from make_position
+        options (dict): keyword arguments for the Board constructor (backend, track_mobility, ...)
+    RETURNS:
+        (Board): board in the position after the moves
+    '''
+    brd = Board(size, **options)
+    for player, pos in history:
+        brd.make_move(pos, player)
+    brd.undo_stack.clear()
+    return brd
+
+def time_calls(func, repeat, number):
+    '''
+    Times a function called many times in a row
+
+    ARGS:
+        func (function()): function to time
+        repeat (int): number of timed rounds
+        number (int): calls per round
+    RETURNS:
+        ({str: number}): fastest and median seconds per call over the rounds and the total number of calls
+    '''
+    times = []
+    for r in range(repeat):
+        start = time.perf_counter()
+        for n in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return {'min': min(times), 'median': statistics.median(times), 'calls': repeat * number}
+
+def time_with_setup(setup, func, repeat):
+    '''
+    Times a function which needs a fresh state for every call, the setup is not timed
+
+    ARGS:
+        setup (function(int)): called with the call number, returns the argument for func
+        func (function(arg)): function to time
+        repeat (int): number of calls
+    RETURNS:
+        ({str: number}): fastest and median seconds per call and the number of calls
+    '''
+    times = []
+    for r in range(repeat):
+        arg = setup(r)
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'calls': repeat}
+
+def random_playout(size, seed, options):
+    '''
+    Plays a full random game with the same pass and game over rules as gameLoop
+
+    ARGS:
+        size (int): size of the board
+        seed (int): seed for the random moves
+        options (dict): keyword arguments for the Board constructor
+    '''
+    brd = Board(size, **options)
+    rng = random.Random(seed)
+    player = 'O'
+    turn_skipped = False
+
+    while(1):
+        moves = brd.get_available_moves(player)
+        if(not moves):
+            if(turn_skipped):
+                break
+            turn_skipped = True
+        else:
+            turn_skipped = False
+            move = rng.choice(moves)
+            brd.add_piece((move[0] - 1, move[1] - 1), player)
+        player = 'O' if player == 'X' else 'X'
+
+def run_size(size, options, seed, repeat, playouts):
+    '''
+    Runs every benchmark for one board size
+
+    ARGS:
+        size (int): size of the board
+        options (dict): keyword arguments for the Board constructor
+        seed (int): seed for the position and playouts
+        repeat (int): timed rounds for each benchmark
+        playouts (int): number of full random games to time
+    RETURNS:
+        ({str: {str: number}}): timings keyed by benchmark name
+    '''
+    history, player = make_position(size, seed)
+    brd = setup_board(size, history, options)
+
+    #calls per round so that every size does a similar amount of work
+    number = max(1, 4096 // (size * size))
+
+    results = {}
+    results['get_available_moves'] = time_calls(lambda: brd.get_available_moves(player), repeat, number)
+
+    empties = [(i, j) for i in range(size) for j in range(size) if not brd.get_piece(i, j)]
+    def check_empties():
+        for i, j in empties:
+            brd.is_valid_move(i, j, player)
+    timing = time_calls(check_empties, repeat, number)
+    results['is_valid_move'] = {'min': timing['min'] / len(empties), 'median': timing['median'] / len(empties),
+                                'calls': timing['calls'] * len(empties)}
+
+    results['count_pieces'] = time_calls(brd.count_pieces, repeat, number)
+
+    #add_piece changes the board so every call gets a fresh copy of the position, cycling through the legal moves
+    moves = brd.get_available_moves(player)
+    def fresh_board(r):
+        fresh = setup_board(size, history, options)
+        fresh.get_available_moves(player)
+        return (fresh, moves[r % len(moves)])
+    def add(arg):
+        fresh, move = arg
+        fresh.add_piece((move[0] - 1, move[1] - 1), player)
+    if(moves):
+        results['add_piece'] = time_with_setup(fresh_board, add, repeat * number)
+
+    results['playout'] = time_with_setup(lambda r: seed + r, lambda game_seed: random_playout(size, game_seed, options), playouts)
+
+    return results
+
+def compare(results, baseline, threshold):
+    '''
+    Compares timings against a stored baseline
+
+    ARGS:
+        results ({str: {str: number}}): new timings keyed by benchmark
+        baseline ({str: {str: number}}): stored timings keyed by benchmark
+        threshold (float): allowed slowdown as a fraction, 0.1 allows 10%
+    RETURNS:
+        ([str]): a line for every benchmark slower than the baseline by more than the threshold
+    '''
+    regressions = []
+    for key, timing in sorted(results.items()):
+        if(key not in baseline):
+            continue
+        old = baseline[key]['min']
+        new = timing['min']
+        if(old > 0 and new > old * (1 + threshold)):
+            regressions.append(f'{key}: {old * 1e6:.1f}us -> {new * 1e6:.1f}us ({(new / old - 1) * 100:+.0f}%)')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Board hot paths on fixed seeded positions')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='board sizes to benchmark')
+    parser.add_argument('--backend', default='grid', help='board backend to benchmark')
+    parser.add_argument('--track-mobility', action='store_true', help='benchmark with the mobility tracker on')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the positions and playouts')
+    parser.add_argument('--repeat', type=int, default=5, help='timed rounds for each benchmark')
+    parser.add_argument('--playouts', type=int, default=3, help='full random games timed for each size')
+    parser.add_argument('-o', '--output', help='write the results to this json file')
+    parser.add_argument('--baseline', help='json file from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown against the baseline (0.1 = 10%%)')
+    args = parser.parse_args()
+
+    #results are keyed by label/size/benchmark so a baseline only gets compared with the same configuration
+    options = {'backend': args.backend}
+    label = args.backend
+    if(args.track_mobility):
+        options['track_mobility'] = True
+        label += '+mobility'
+
+    #building a board up front reports an unknown backend or an unsupported option before anything is timed
+    try:
+        Board(4, **options)
+    except ValueError as e:
+        parser.error(str(e))
+
+    results = {}
+    for size in args.sizes:
+        for name, timing in run_size(size, options, args.seed, args.repeat, args.playouts).items():
+            key = f'{label}/{size}/{name}'
+            results[key] = timing
+            print(f'{key:<40} {timing["min"] * 1e6:>14.1f}us min {timing["median"] * 1e6:>14.1f}us median')
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'options': options,
+        },
+        'results': results,
+    }
+
+    if(args.output):
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    #exit with an error when anything got slower than the baseline allows so it can gate changes
+    if(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        if(regressions):
+            sys.exit(1)
+        print('No regressions against the baseline')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,638 @@
+from board import Board
+from piece import Piece, Grid_Point
+from zobrist import get_keys
+
+
+#index of the opposite direction for each direction in the shift table (right <-> left, up right <-> down left, ...)
+OPPOSITE = (1, 0, 3, 2, 7, 6, 5, 4)
+
+#cache of the direction shift tables for each board size, built once per size
+_shift_tables = {}
+
+def get_shift_table(size):
+    '''
+    Gets the shift table for a board size
+
+    Square (i, j) is stored at bit i * size + j. Moving one step in a direction is a shift by the offset
+    of that direction followed by a mask which removes the bits that wrapped around onto the other edge.
+
+    ARGS:
+        size (int): size of the square board
+    RETURNS:
+        [(int, int)]: list of (offset, mask) pairs in the direction order used by Board.is_valid_move (1-8)
+    '''
+    if(size in _shift_tables):
+        return _shift_tables[size]
+
+    full = (1 << (size * size)) - 1
+
+    #build the masks for every square outside of the first and last column
+    not_first_col = 0
+    not_last_col = 0
+    for i in range(size):
+        for j in range(size):
+            if(j != 0):
+                not_first_col |= 1 << (i * size + j)
+            if(j != size - 1):
+                not_last_col |= 1 << (i * size + j)
+
+    #moving right can never land on the first column and moving left can never land on the last
+    table = [
+        (1, not_first_col),             #1: right
+        (-1, not_last_col),             #2: left
+        (-size, full),                  #3: up
+        (size, full),                   #4: down
+        (-size + 1, not_first_col),     #5: up right
+        (-size - 1, not_last_col),      #6: up left
+        (size + 1, not_first_col),      #7: down right
+        (size - 1, not_last_col),       #8: down left
+    ]
+
+    _shift_tables[size] = table
+    return table
+
+def shift(bits, offset, mask):
+    '''
+    Moves every bit of a bitboard one step in a direction
+
+    ARGS:
+        bits (int): bitboard to shift
+        offset, mask (int, int): a pair out of get_shift_table
+    RETURNS:
+        (int): the shifted bitboard
+    '''
+    if(offset > 0):
+        return (bits << offset) & mask
+    return (bits >> -offset) & mask
+
+def iter_bits(bits):
+    '''
+    Generator over the set bits of a bitboard from the lowest square up (row major order)
+
+    ARGS:
+        bits (int): bitboard
+    YIELDS:
+        (int): index of each set bit
+    '''
+    while(bits):
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class BitBoard(Board):
+    '''
+    Board backend which stores the board state as one integer per player
+
+    Bit i * size + j is set in bits[player] when player owns the piece at i, j. Move generation and flipping
+    are done with shift and mask operations over whole rows of the board at once instead of per square walks.
+    Results from the public Board methods are identical to the grid backend.
+
+    Attributes:
+
+    bits {str: int}: bitboard for each player, keyed by 'X' and 'O'
+    grid_values [[pieces]]: built on access from bits, changes to it are not stored back into the board
+    piece_dirs[[[int]]]: flip directions from the last get_available_moves call, [] on empty squares which are not
+                         moves and None on occupied ones, like the grid backend
+    O_num int: number of O pieces
+    X_num int: number of X pieces
+    dimensions (int, int): dimensions of the board
+    debug bool: if true, add_piece checks the piece counts against a full recount after every move
+    undo_stack [(int, str, int)]: one entry per move played with make_move as (square, player, flipped bits)
+    hash_key int: zobrist hash of the pieces on the board, the same value the grid backend has for the position
+    '''
+    backend = 'bitboard'
+
+    def __init__(self, size, backend='bitboard', debug=False, track_mobility=False):
+        '''
+        BitBoard constructor
+
+        ARGS:
+            size (int): size of the square board
+            backend (str): always 'bitboard', accepted so Board(size, backend='bitboard') can construct this class
+            debug (bool): turns on the consistency checks
+            track_mobility (bool): must be false, only the grid and compact backends track mobility
+        '''
+        if(track_mobility):
+            raise ValueError('mobility tracking is not supported by the bitboard backend')
+
+        self.dimensions = (size, size)
+        self.debug = debug
+
+        self.O_num = 2
+        self.X_num = 2
+
+        #shift table and mask of all squares on the board for this size
+        self.shifts = get_shift_table(size)
+        self.full = (1 << (size * size)) - 1
+
+        #create the starting 4 pieces
+        half = size // 2
+        self.bits = {
+            'O': (1 << ((half - 1) * size + half - 1)) | (1 << (half * size + half)),
+            'X': (1 << (half * size + half - 1)) | (1 << ((half - 1) * size + half)),
+        }
+
+        #piece_dirs only holds lists for the empty squares of the last get_available_moves call
+        self.piece_dirs = [[None] * size for i in range(size)]
+        self.dirs_filled = []
+
+        self.undo_stack = []
+
+        #zobrist hash of the starting pieces
+        self.keys = get_keys(size)
+        self.hash_key = 0
+        for player in ('O', 'X'):
+            for square in iter_bits(self.bits[player]):
+                self.hash_key ^= self.keys[player][square]
+
+    @property
+    def grid_values(self):
+        '''
+        2d list of pieces and None built from the bitboards
+
+        RETURNS:
+            [[pieces]]: pieces for the current board state, same layout as the grid backend
+        '''
+        size = self.dimensions[0]
+        grid = [[None] * size for i in range(size)]
+        for player in ('O', 'X'):
+            for square in iter_bits(self.bits[player]):
+                i, j = divmod(square, size)
+                grid[i][j] = Piece(i, j, player)
+        return grid
+
+    def get_available_moves(self, player):
+        '''
+        returns all availabe moves for a player
+
+        ARGS:
+            player (str): either 'X' or 'O' depending on which player's turn it is
+        RETURNS:
+            [(int, int)]: a list of tuples containing all possible moves (1 indexed)
+        '''
+        size = self.dimensions[0]
+
+        #a move found by shifting in one direction flips pieces in the opposite direction from the placed piece
+        dir_moves = list(self.direction_moves(player))
+        all_moves = 0
+        for moves in dir_moves:
+            all_moves |= moves
+
+        #clear the directions from the previous call
+        for i, j in self.dirs_filled:
+            self.piece_dirs[i][j] = None
+        self.dirs_filled = []
+
+        #every empty square gets a list like is_valid_move gives on the grid, which is empty unless it's a move
+        possible_moves = []
+        for square in iter_bits(self.full & ~(self.bits['O'] | self.bits['X'])):
+            i, j = divmod(square, size)
+            if(all_moves >> square & 1):
+                self.piece_dirs[i][j] = [d + 1 for d in range(8) if dir_moves[OPPOSITE[d]] >> square & 1]
+                possible_moves.append((i + 1, j + 1))
+            else:
+                self.piece_dirs[i][j] = []
+            self.dirs_filled.append((i, j))
+
+        return possible_moves
+
+    def direction_moves(self, player):
+        '''
+        Generator over the moves found by shifting in each direction
+
+        A move is an empty square at the end of a run of opponent pieces which starts next to one of player's pieces.
+
+        ARGS:
+            player (str): either 'X' or 'O'
+        YIELDS:
+            (int): bitboard of the moves found in each direction of the shift table, in order
+        '''
+        own = self.bits[player]
+        opp = self.bits['X' if player == 'O' else 'O']
+        empty = self.full & ~(own | opp)
+
+        for offset, mask in self.shifts:
+            run = shift(own, offset, mask) & opp
+            while(run):
+                grown = run | (shift(run, offset, mask) & opp)
+                if(grown == run):
+                    break
+                run = grown
+            yield shift(run, offset, mask) & empty
+
+    def move_bits(self, player):
+        '''
+        Gets every move of a player as one bitboard
+
+        ARGS:
+            player (str): either 'X' or 'O'
+        RETURNS:
+            (int): bitboard with a bit set on each available move
+        '''
+        all_moves = 0
+        for moves in self.direction_moves(player):
+            all_moves |= moves
+        return all_moves
+
+    def iter_moves(self, player):
+        '''
+        Generator over the available moves for a player, leaving piece_dirs alone
+
+        ARGS:
+            player (str): either 'X' or 'O'
+        YIELDS:
+            (int, int): each possible move (1 indexed), in the same order as get_available_moves
+        '''
+        size = self.dimensions[0]
+        for square in iter_bits(self.move_bits(player)):
+            i, j = divmod(square, size)
+            yield (i + 1, j + 1)
+
+    def has_any_move(self, player):
+        '''
+        Checks whether a player has any move, stopping at the first direction with one
+
+        ARGS:
+            player (str): either 'X' or 'O'
+        RETURNS:
+            (bool): True if player has a move
+        '''
+        for moves in self.direction_moves(player):
+            if(moves):
+                return True
+        return False
+
+    def mobility_count(self, player):
+        '''
+        Counts the moves a player has
+
+        ARGS:
+            player (str): either 'X' or 'O'
+        RETURNS:
+            (int): number of available moves
+        '''
+        return self.move_bits(player).bit_count()
+
+    def flip_bits(self, square, player):
+        '''
+        Finds the pieces that would get flipped if player placed a piece on a square
+
+        ARGS:
+            square (int): bit index of the square (i * size + j)
+            player (str): 'X' or 'O' for which player is placing
+        RETURNS:
+            (int): bitboard of the pieces that would get flipped
+        '''
+        own = self.bits[player]
+        opp = self.bits['X' if player == 'O' else 'O']
+        start = 1 << square
+
+        flips = 0
+        for offset, mask in self.shifts:
+            line = 0
+            x = shift(start, offset, mask)
+            while(x & opp):
+                line |= x
+                x = shift(x, offset, mask)
+            if(x & own):
+                flips |= line
+        return flips
+
+    def get_flips(self, i, j, player):
+        '''
+        Finds the pieces that would get flipped if player placed a piece at a position
+
+        ARGS:
+            i, j (int, int): position of the move
+            player (str): 'X' or 'O' for which player is placing
+        RETURNS:
+            [(int, int)]: positions of the pieces that would get flipped, empty if the move is not valid
+        '''
+        size = self.dimensions[0]
+        if(self.get_piece(i, j)):
+            return []
+        return [divmod(square, size) for square in iter_bits(self.flip_bits(i * size + j, player))]
+
+    def make_move(self, pos, player):
+        '''
+        Plays a move and pushes the flipped bits onto the undo stack so unmake_move can take it back
+
+        ARGS:
+            pos ((int, int) or Grid_Point): position of the move, 0 indexed tuple or grid_point
+            player (str): 'X' or 'O' for which player is moving
+        RETURNS:
+            (int): number of pieces that were flipped
+        RAISES:
+            ValueError: if the move is not valid for player
+        '''
+        offset = 0
+        if(isinstance(pos, Grid_Point)):
+            offset = 1
+        i = pos[0] - offset
+        j = pos[1] - offset
+        square = i * self.dimensions[0] + j
+
+        flips = 0
+        if(not (self.bits['O'] | self.bits['X']) >> square & 1):
+            flips = self.flip_bits(square, player)
+        if(not flips):
+            raise ValueError(f'Illegal move {(i, j)} for player {player}')
+
+        self.bits['O'] ^= flips
+        self.bits['X'] ^= flips
+        self.bits[player] |= 1 << square
+        self.hash_key ^= self.flip_hash(flips) ^ self.keys[player][square]
+
+        if(self.listener is not None):
+            self.notify_flips(flips, player)
+            self.listener.piece_set(square, None, player)
+
+        flipped = flips.bit_count()
+        self.update_counts(player, flipped)
+
+        self.undo_stack.append((square, player, flips))
+        return flipped
+
+    def unmake_move(self):
+        '''
+        Takes back the last move played with make_move
+
+        RAISES:
+            IndexError: if there is no move to take back
+        '''
+        square, player, flips = self.undo_stack.pop()
+
+        self.bits[player] ^= 1 << square
+        self.bits['O'] ^= flips
+        self.bits['X'] ^= flips
+        self.hash_key ^= self.flip_hash(flips) ^ self.keys[player][square]
+        self.update_counts(player, -flips.bit_count(), -1)
+
+        if(self.listener is not None):
+            self.listener.piece_set(square, player, None)
+            self.notify_flips(flips, 'X' if player == 'O' else 'O')
+
+    def add_piece(self, pos, player):
+        '''
+        Adds a piece for a player to the board to a position
+
+        ARGS:
+            pos ((int, int) or Grid_Point): position for piece to be placed, can be a tuple or grid_point
+            player (str): 'X' or 'O' for which player is placing a piece
+        '''
+        offset = 0
+        if(isinstance(pos, Grid_Point)):
+            offset = 1
+
+        i = pos[0] - offset
+        j = pos[1] - offset
+
+        #flip the pieces and place the new one
+        flipped = self.turn_pieces(i, j, player)
+        self.set_piece(i, j, player)
+
+        self.update_counts(player, flipped)
+
+    def get_piece(self, i, j):
+        '''
+        gets a position's piece's player
+
+        ARGS:
+            i, j (int, int): position at which to get piece
+
+        RETURNS:
+            (str): 'X', 'O', or None depending on which player owns the piece or if there is a piece at all
+        '''
+        square = i * self.dimensions[0] + j
+        if(self.bits['O'] >> square & 1):
+            return 'O'
+        elif(self.bits['X'] >> square & 1):
+            return 'X'
+        return None
+
+    def is_valid_move(self, i, j, player):
+        '''
+        Function which checks if a move is valid
+
+        ARGS:
+            i, j (int, int): position which to check
+            player (str): 'X' or 'O' for which player is checking for valid move
+
+        RETURNS:
+            [int]: directions 1-8 in which pieces would get flipped (see Board.is_valid_move), None if the square is taken
+        '''
+        start = 1 << (i * self.dimensions[0] + j)
+        own = self.bits[player]
+        opp = self.bits['X' if player == 'O' else 'O']
+
+        if((own | opp) & start):
+            return None
+
+        found_directions = []
+        for d, (offset, mask) in enumerate(self.shifts):
+            x = shift(start, offset, mask)
+            opposite_found = False
+            while(x & opp):
+                x = shift(x, offset, mask)
+                opposite_found = True
+            if(x & own and opposite_found):
+                found_directions.append(d + 1)
+
+        return found_directions
+
+    def can_play(self, i, j, player):
+        '''
+        Checks if a move is valid without collecting its flip directions
+
+        ARGS:
+            i, j (int, int): position which to check
+            player (str): 'X' or 'O' for which player is checking for valid move
+        RETURNS:
+            (bool): True if placing a piece at i, j would flip at least one piece
+        '''
+        start = 1 << (i * self.dimensions[0] + j)
+        own = self.bits[player]
+        opp = self.bits['X' if player == 'O' else 'O']
+
+        if((own | opp) & start):
+            return False
+
+        for offset, mask in self.shifts:
+            x = shift(start, offset, mask)
+            if(x & opp):
+                while(x & opp):
+                    x = shift(x, offset, mask)
+                if(x & own):
+                    return True
+
+        return False
+
+    def flip_piece(self, i, j):
+        '''
+        Flips a piece to the opposite player
+
+        ARGS: {Note: function expects a position at which a piece is located}
+            i, j (int, int): position at which to flip piece
+        '''
+        square = i * self.dimensions[0] + j
+        self.bits['O'] ^= 1 << square
+        self.bits['X'] ^= 1 << square
+        self.hash_key ^= self.keys['flip'][square]
+
+        if(self.listener is not None):
+            self.listener.piece_flipped(square, self.get_piece(i, j))
+
+    def set_piece(self, i, j, player):
+        '''
+        Puts a piece for a player at a position, replacing whatever was there, and updates hash_key
+        Nothing gets flipped and the piece counts are not changed
+
+        ARGS:
+            i, j (int, int): position of the piece
+            player (str): 'X' or 'O' for who owns the piece, None to leave the position empty
+        '''
+        square = i * self.dimensions[0] + j
+
+        old = self.get_piece(i, j)
+        if(old):
+            self.bits[old] ^= 1 << square
+            self.hash_key ^= self.keys[old][square]
+
+        if(player):
+            self.bits[player] |= 1 << square
+            self.hash_key ^= self.keys[player][square]
+
+        if(self.listener is not None):
+            self.listener.piece_set(square, old, player)
+
+    def flip_hash(self, flips):
+        '''
+        Gets the change to hash_key from flipping a set of pieces
+
+        ARGS:
+            flips (int): bitboard of the flipped pieces
+        RETURNS:
+            (int): value to xor into hash_key
+        '''
+        change = 0
+        flip_keys = self.keys['flip']
+        for square in iter_bits(flips):
+            change ^= flip_keys[square]
+        return change
+
+    def turn_pieces(self, i, j, player):
+        '''
+        Function to flip needed pieces after a piece is played
+
+        ARGS:
+            i, j (int, int): position at which piece was played
+            player (str): 'X' or 'O' for which player placed the piece
+        RETURNS:
+            (int): number of pieces that were flipped
+        '''
+        flips = self.flip_bits(i * self.dimensions[0] + j, player)
+        self.bits['O'] ^= flips
+        self.bits['X'] ^= flips
+        self.hash_key ^= self.flip_hash(flips)
+
+        if(self.listener is not None):
+            self.notify_flips(flips, player)
+
+        return flips.bit_count()
+
+    def notify_flips(self, flips, player):
+        '''
+        Tells the listener about a set of flipped pieces
+
+        ARGS:
+            flips (int): bitboard of the flipped pieces
+            player (str): player the pieces now belong to
+        '''
+        for square in iter_bits(flips):
+            self.listener.piece_flipped(square, player)
+
+    def get_pieces(self):
+        '''
+        Lists the pieces on the board
+
+        RETURNS:
+            [(int, str)]: square number and owner of every piece, in row major order
+        '''
+        pieces = [(square, 'O') for square in iter_bits(self.bits['O'])]
+        pieces.extend((square, 'X') for square in iter_bits(self.bits['X']))
+        pieces.sort()
+        return pieces
+
+    def get_bits(self):
+        '''
+        Gets the pieces on the board as one bitmask per player
+
+        RETURNS:
+            ({str: int}): copy of bits
+        '''
+        return dict(self.bits)
+
+    def set_position(self, bits):
+        '''
+        Replaces every piece on the board (see Board.set_position)
+
+        ARGS:
+            bits ({str: int}): bitmask of the pieces of 'O' and 'X'
+        '''
+        self.bits = {'O': bits['O'], 'X': bits['X']}
+        self.hash_key = 0
+        for player in ('O', 'X'):
+            for square in iter_bits(self.bits[player]):
+                self.hash_key ^= self.keys[player][square]
+
+    def set_dirs(self, piece_dirs):
+        '''
+        Replaces piece_dirs and the list of squares it has directions for
+
+        ARGS:
+            piece_dirs ([[[int]]]): grid of direction lists and None
+        '''
+        self.piece_dirs = piece_dirs
+        self.dirs_filled = [(i, j) for i, row in enumerate(piece_dirs) for j, dirs in enumerate(row) if dirs is not None]
+
+    def copy(self, dirs=True):
+        '''
+        Builds an independent board in the same position without going through the constructor
+
+        ARGS:
+            dirs (bool): copy piece_dirs too, otherwise the copy needs a get_available_moves call before add_piece
+        RETURNS:
+            (BitBoard): the copy, with an empty undo stack and no listener
+        '''
+        size = self.dimensions[0]
+        board = object.__new__(BitBoard)
+        board.dimensions = self.dimensions
+        board.debug = self.debug
+        board.O_num = self.O_num
+        board.X_num = self.X_num
+        board.shifts = self.shifts
+        board.full = self.full
+        board.bits = dict(self.bits)
+        board.undo_stack = []
+        board.keys = self.keys
+        board.hash_key = self.hash_key
+
+        if(dirs):
+            board.piece_dirs = [row[:] for row in self.piece_dirs]
+            board.dirs_filled = list(self.dirs_filled)
+        else:
+            board.piece_dirs = [[None] * size for i in range(size)]
+            board.dirs_filled = []
+        return board
+
+    def count_pieces(self):
+        '''
+        counts the number of pieces for each player and stores in member O_num and X_num
+        '''
+        self.O_num = self.bits['O'].bit_count()
+        self.X_num = self.bits['X'].bit_count()
+
+
+if __name__ == "__main__":
+    pass
@@ -1,4 +1,182 @@
+import struct
+
 from piece import Piece, Grid_Point
+from zobrist import get_keys, SIDE_KEY
+
+#(row, col) step for each flip direction used by is_valid_move, index 0 is direction 1
+#1: right, 2: left, 3: up, 4: down, 5: up right, 6: up left, 7: down right, 8: down left
+DIRECTIONS = ((0, 1), (0, -1), (-1, 0), (1, 0), (-1, 1), (-1, -1), (1, 1), (1, -1))
+
+#cache of the ray tables for each board size, built once per size
+_ray_tables = {}
+
+def get_rays(size):
+    '''
+    Gets the ray table for a board size
+
+    rays[i][j][d - 1] is a tuple of the positions met walking from i, j in direction d (see DIRECTIONS),
+    in order and stopping at the edge of the board, so walks along it never need a bounds check.
+    The position tuples are shared between rays to keep the table small on large boards.
+
+    ARGS:
+        size (int): size of the square board
+    RETURNS:
+        [[((int, int))]]: 2d list of 8 rays for every position
+    '''
+    if(size in _ray_tables):
+        return _ray_tables[size]
+
+    points = [[(i, j) for j in range(size)] for i in range(size)]
+
+    rays = []
+    for i in range(size):
+        rays.append([])
+        for j in range(size):
+            square_rays = []
+            for di, dj in DIRECTIONS:
+                ray = []
+                y = i + di
+                x = j + dj
+                while(0 <= y < size and 0 <= x < size):
+                    ray.append(points[y][x])
+                    y += di
+                    x += dj
+                square_rays.append(tuple(ray))
+            rays[i].append(tuple(square_rays))
+
+    _ray_tables[size] = rays
+    return rays
+
+#the 8 symmetries of a square board are numbered by bits: 1 transposes, 2 flips the rows and 4 flips the columns,
+#applied in that order. INVERSE_SYMMETRY[sym] is the symmetry which undoes sym
+INVERSE_SYMMETRY = (0, 1, 2, 5, 4, 3, 6, 7)
+
+#cache of the square permutations and permuted zobrist keys for each board size
+_symmetry_tables = {}
+_symmetry_keys = {}
+
+def transform_square(i, j, size, sym):
+    '''
+    Moves a position by one of the 8 symmetries of the board
+
+    ARGS:
+        i, j (int, int): 0 indexed position
+        size (int): size of the square board
+        sym (int): symmetry number 0 to 7, 0 leaves the position where it is
+    RETURNS:
+        (int, int): the position on the transformed board
+    '''
+    if(sym & 1):
+        i, j = j, i
+    if(sym & 2):
+        i = size - 1 - i
+    if(sym & 4):
+        j = size - 1 - j
+    return i, j
+
+def get_symmetries(size):
+    '''
+    Gets the square permutations of the 8 symmetries for a board size
+
+    ARGS:
+        size (int): size of the square board
+    RETURNS:
+        ((int)): tables[sym][i * size + j] is the square i, j moves to under sym
+    '''
+    if(size in _symmetry_tables):
+        return _symmetry_tables[size]
+
+    tables = []
+    for sym in range(8):
+        table = []
+        for i in range(size):
+            for j in range(size):
+                y, x = transform_square(i, j, size, sym)
+                table.append(y * size + x)
+        tables.append(tuple(table))
+
+    _symmetry_tables[size] = tuple(tables)
+    return _symmetry_tables[size]
+
+def get_symmetry_keys(size):
+    '''
+    Gets the zobrist keys of each symmetry for a board size
+
+    Looking a piece up in the table for sym gives the key of the square it moves to, so the hash of a transformed
+    position can be found without building the transformed board.
+
+    ARGS:
+        size (int): size of the square board
+    RETURNS:
+        [{str: [int]}]: keys[sym][player][square], like get_keys for each symmetry
+    '''
+    if(size in _symmetry_keys):
+        return _symmetry_keys[size]
+
+    keys = get_keys(size)
+    tables = []
+    for table in get_symmetries(size):
+        tables.append({player: [keys[player][square] for square in table] for player in ('O', 'X')})
+
+    _symmetry_keys[size] = tables
+    return tables
+
+#header of Board.to_bytes: magic, board size, O and X piece counts and flags, followed by a bitmask of the O pieces
+#and one of the X pieces, then piece_dirs when the STATE_DIRS flag is set (see pack_dirs)
+STATE_HEADER = struct.Struct('<4sHIIB')
+STATE_MAGIC = b'RVBS'
+STATE_DIRS = 1
+
+#direction list for each packed direction byte, bit d - 1 is set for direction d
+_dir_lists = [[d + 1 for d in range(8) if mask >> d & 1] for mask in range(256)]
+
+def pack_dirs(piece_dirs, size):
+    '''
+    Packs a piece_dirs grid into bytes
+
+    A bitmask of the squares which are not None is followed by one byte per square with bit d - 1 set for each
+    direction d, so None, an empty list and every direction list come back exactly.
+
+    ARGS:
+        piece_dirs ([[[int]]]): grid of direction lists and None
+        size (int): size of the square board
+    RETURNS:
+        (bytes): packed grid
+    '''
+    present = 0
+    masks = bytearray(size * size)
+    for i in range(size):
+        row = piece_dirs[i]
+        for j in range(size):
+            if(row[j] is not None):
+                square = i * size + j
+                present |= 1 << square
+                for d in row[j]:
+                    masks[square] |= 1 << (d - 1)
+    return present.to_bytes((size * size + 7) // 8, 'little') + bytes(masks)
+
+def unpack_dirs(data, offset, size):
+    '''
+    Unpacks a piece_dirs grid written by pack_dirs
+
+    ARGS:
+        data (bytes): buffer holding the packed grid
+        offset (int): where the packed grid starts in data
+        size (int): size of the square board
+    RETURNS:
+        ([[[int]]]): grid of direction lists and None
+    '''
+    length = (size * size + 7) // 8
+    present = int.from_bytes(data[offset:offset + length], 'little')
+    masks = data[offset + length:offset + length + size * size]
+
+    piece_dirs = [[None] * size for i in range(size)]
+    while(present):
+        low = present & -present
+        square = low.bit_length() - 1
+        present ^= low
+        piece_dirs[square // size][square % size] = _dir_lists[masks[square]][:]
+    return piece_dirs
 
 #
 class Board:
@@ -12,50 +190,143 @@ class Board:
     O_num int: number of O pieces
     X_num int: number of X pieces
     dimensions (int, int): dimensions of the board
+    backend str: name of the storage backend the board uses ('grid' for this class)
+    debug bool: if true, add_piece checks the piece counts against a full recount after every move
+    undo_stack [tuple]: one entry per move played with make_move, holding what unmake_move needs to take it back
+    hash_key int: zobrist hash of the pieces on the board, kept up to date by every change to the board (see zobrist.py)
+    rays [[((int, int))]]: positions along each direction from every position, see get_rays
+    track_mobility bool: if true, the moves of both players are kept up to date after every change instead of rescanned
+    listener object: if set, told about every change to the board through piece_set(square, old, player) and
+                     piece_flipped(square, player), see pattern.PatternEvaluator. None by default
+    mobility_dirs {str: [[[int]]]}: with track_mobility, is_valid_move's result for every position for 'O' and 'X'
+    legal_moves {str: {(int, int)}}: with track_mobility, the positions (0 indexed) each player can move to
 
     Methods:
 
     get_available_moves(player): returns a list of all available moves for a player and updates the piece_dirs list
+    iter_moves(player): generator over the available moves for a player which leaves piece_dirs alone
+    has_any_move(player): returns whether a player has a move, stopping at the first one found
+    mobility_count(player): returns the number of moves a player has without building their flip directions
     add_piece(pos, player): adds a piece at a position. Updates board state, flips pieces, and updates counts
     get_piece(i, j): returns the player string ('X' or 'O') for who owns a piece at a position i, j
     is_valid_move(i, j, player): returns None if its an invalid move for player. Otherwise returns a list of ints representing directions in which pieces would be flipped
+    can_play(i, j, player): returns whether placing a piece at i, j would flip anything, stopping at the first direction that does
     flip_piece(i, j): flips a piece to the other player
+    set_piece(i, j, player): puts a piece for player at a position (or removes it if player is None) without flipping anything
     count_pieces(): updates O_num and X_num attributes based on current piece count on board
+    update_counts(player, flipped): updates O_num and X_num after a placement without rescanning the board
+    check_counts(): debug check that O_num and X_num match a full recount
     get_piece_count(): returns a tuple containing the O and X piece counts
+    get_flips(i, j, player): returns the positions of the pieces a move would flip
+    make_move(pos, player): plays a move like add_piece and records it on the undo stack
+    unmake_move(): takes back the last move played with make_move
+    update_mobility(changed): re-evaluates the moves affected by changed positions when tracking mobility
+    check_mobility(): debug check that the tracked moves match a full rescan
+    get_pieces(): returns the square number and owner of every piece on the board
+    symmetry_hashes(player): returns the zobrist hash of the position under each of the 8 symmetries
+    canonical_hash(player): returns the hash shared by all 8 rotations and reflections of the position
+    canonical_form(player): returns a copy of the board turned into the frame of its canonical hash
+    transformed(sym): returns a copy of the board with a symmetry applied
+    transform_move(move, sym), inverse_move(move, sym): map moves between a board's frame and a transformed frame
+    get_bits(): returns a bitmask of the squares each player owns
+    set_position(bits): replaces every piece on the board from bitmasks
+    to_bytes(dirs), from_bytes(data, backend): pack the position into bytes and build a board back from them
+    copy(dirs): returns an independent board in the same position, much faster than copy.deepcopy
+
+    Backends:
+
+    Board(size, backend=...) picks the storage used for the board state. 'grid' (default) is this class,
+    'bitboard' is bitboard.BitBoard which keeps one integer per player, 'compact' is compact.CompactBoard
+    which keeps one byte per cell and 'sparse' is sparse.SparseBoard which keeps only the occupied cells and
+    generates moves from the empty squares next to them. Every backend returns the same results from the public
+    methods above.
     '''
-    def __init__(self, size):
+    backend = 'grid'
+    track_mobility = False
+    listener = None
+
+    def __new__(cls, size=8, backend='grid', *args, **kwargs):
+        '''
+        Picks the class implementing the requested backend when a plain Board is constructed
+
+        ARGS:
+            size (int): size of the square board (passed on to __init__)
+            backend (str): name of the storage backend, see get_backend
+        '''
+        if(cls is Board):
+            cls = get_backend(backend)
+        return super().__new__(cls)
+
+    def __init__(self, size, backend='grid', debug=False, track_mobility=False):
         '''
         Board constructor
 
         ARGS: 
             size (int): size of the square board
+            backend (str): storage backend, 'grid' for this class (see class docstring)
+            debug (bool): turns on the consistency checks
+            track_mobility (bool): keep both players' moves up to date incrementally instead of rescanning the board
         '''
 
         self.dimensions = (size, size)
+        self.debug = debug
 
         #variables for holding the number of each piece on the board
         self.O_num = 2
         self.X_num = 2
 
         #grid values array contains the info for every cell, its either an X piece, an O piece, or None
-        self.grid_values = []
+        self.grid_values = self.create_grid(size)
 
         #piece_dirs holds the directions in which pieces would get flipped if a piece was placed here for the current player
         self.piece_dirs = []
 
-        #initialize both lists as empty
+        #initialize as empty
         for i in range(size):
-            self.grid_values.append([])
             self.piece_dirs.append([])
             for j in range(size):
-                self.grid_values[i].append(None)
                 self.piece_dirs[i].append(None)
 
+        #moves played with make_move, as (i, j, player, flipped positions)
+        self.undo_stack = []
+
+        #squares along each direction from every position, shared by all boards of this size
+        self.rays = get_rays(size)
+
+        #zobrist keys for this size and the hash of the empty board
+        self.keys = get_keys(size)
+        self.hash_key = 0
+
         #create the starting 4 pieces
-        self.grid_values[size//2 - 1][size//2 - 1] = Piece(size//2 - 1, size//2 - 1, 'O')
-        self.grid_values[size//2][size//2] = Piece(size//2, size//2, 'O')
-        self.grid_values[size//2][size//2 - 1] = Piece(size//2, size//2 - 1, 'X')
-        self.grid_values[size//2 - 1][size//2] = Piece(size//2 - 1, size//2, 'X')
+        self.set_piece(size//2 - 1, size//2 - 1, 'O')
+        self.set_piece(size//2, size//2, 'O')
+        self.set_piece(size//2, size//2 - 1, 'X')
+        self.set_piece(size//2 - 1, size//2, 'X')
+
+        #start the mobility tracker off with a full scan of the starting position
+        self.track_mobility = track_mobility
+        if(track_mobility):
+            self.mobility_dirs = {}
+            self.legal_moves = {}
+            for player in ('O', 'X'):
+                self.mobility_dirs[player] = [[self.is_valid_move(i, j, player) for j in range(size)] for i in range(size)]
+                self.legal_moves[player] = {(i, j) for i in range(size) for j in range(size) if self.mobility_dirs[player][i][j]}
+
+    def create_grid(self, size):
+        '''
+        Creates the empty storage for grid_values, backends with a different cell storage override this
+
+        ARGS:
+            size (int): size of the square board
+        RETURNS:
+            [[None]]: 2d list with None for every cell
+        '''
+        grid = []
+        for i in range(size):
+            grid.append([])
+            for j in range(size):
+                grid[i].append(None)
+        return grid
 
     def __str__(self):
         '''
@@ -102,6 +373,13 @@ class Board:
         RETURNS:
             [(int, int)]: a list of tuples containing all possible moves (1 indexed)
         '''
+        #the tracker already has the directions for every position, piece_dirs becomes the player's grid of them
+        if(self.track_mobility):
+            if(self.debug):
+                self.check_mobility()
+            self.piece_dirs = self.mobility_dirs[player]
+            return [(i + 1, j + 1) for i, j in sorted(self.legal_moves[player])]
+
         possible_moves = []
 
         #loop through entire board
@@ -117,6 +395,59 @@ class Board:
 
         return possible_moves
 
+    def iter_moves(self, player):
+        '''
+        Generator over the available moves for a player, found one at a time
+
+        Nothing is stored in piece_dirs and each square only gets checked until one direction flips, so a caller
+        which stops early only pays for the squares it looked at.
+
+        ARGS:
+            player (str): either 'X' or 'O' depending on which player's turn it is
+        YIELDS:
+            (int, int): each possible move (1 indexed), in the same order as get_available_moves
+        '''
+        if(self.track_mobility):
+            for i, j in sorted(self.legal_moves[player]):
+                yield (i + 1, j + 1)
+            return
+
+        size = self.dimensions[0]
+        for i in range(size):
+            for j in range(size):
+                if(self.can_play(i, j, player)):
+                    yield (i + 1, j + 1)
+
+    def has_any_move(self, player):
+        '''
+        Checks whether a player has any move, for pass and game over checks
+
+        ARGS:
+            player (str): either 'X' or 'O'
+        RETURNS:
+            (bool): True as soon as one move is found
+        '''
+        if(self.track_mobility):
+            return bool(self.legal_moves[player])
+
+        for move in self.iter_moves(player):
+            return True
+        return False
+
+    def mobility_count(self, player):
+        '''
+        Counts the moves a player has without building their flip directions
+
+        ARGS:
+            player (str): either 'X' or 'O'
+        RETURNS:
+            (int): number of available moves, the length get_available_moves would return
+        '''
+        if(self.track_mobility):
+            return len(self.legal_moves[player])
+
+        return sum(1 for move in self.iter_moves(player))
+
     def add_piece(self, pos, player):
         '''
         Adds a piece for a player to the board to a position
@@ -133,14 +464,22 @@ class Board:
         if(isinstance(pos, Grid_Point)):
             offset = 1
         
+        #the tracker needs to know which positions are about to change
+        if(self.track_mobility):
+            changed = self.get_flips(pos[0] - offset, pos[1] - offset, player)
+
         #flip all pieces needed due to placement and the position
-        self.turn_pieces(pos[0] - offset, pos[1] - offset, player)
+        flipped = self.turn_pieces(pos[0] - offset, pos[1] - offset, player)
 
         #add the piece to grid values
-        self.grid_values[pos[0] - offset][pos[1] - offset] = Piece(pos[0] - offset, pos[1] - offset, player)
+        self.set_piece(pos[0] - offset, pos[1] - offset, player)
 
-        #recount pieces as the board state has changed
-        self.count_pieces()
+        #update the counts by the placed piece and the flipped ones
+        self.update_counts(player, flipped)
+
+        if(self.track_mobility):
+            changed.append((pos[0] - offset, pos[1] - offset))
+            self.update_mobility(changed)
 
     def get_piece(self, i, j):
         '''
@@ -178,7 +517,7 @@ class Board:
         '''
 
         #if there is already a piece there, return None as its not a valid move
-        if(self.grid_values[i][j]):
+        if(self.get_piece(i, j)):
             return None
 
         #list for holding directions in which proper move was found
@@ -193,111 +532,49 @@ class Board:
         else:
             opposite_player = 'X'
 
-        #check all 8 directions for if a move is valid and which directions would get flipped pieces
-
-        #check R
-        x = j + 1
-        opposite_found = False
-
-        #loop until index reaches an edge or a piece is not the opposing_player's piece
-        while(x < self.dimensions[0] and self.get_piece(i, x) == opposite_player):
-            x += 1
-            opposite_found = True
-
-        #if index is still in range, the piece stopped on is the current players piece, and at least one opponent piece was found in the direction
-        #append that direction to the return list
-        if(x < self.dimensions[0] and self.get_piece(i, x) == player and opposite_found):
-            found_directions.append(1)
-
-        #check L
-        x = j - 1
-        opposite_found = False
-
-        while(x >= 0 and self.get_piece(i, x) == opposite_player):
-            x -= 1
-            opposite_found = True
-
-        if(x >= 0 and self.get_piece(i, x) == player and opposite_found):
-            found_directions.append(2)
+        #walk along the precomputed ray in each direction past the opponent's pieces
+        #a direction is valid if at least one opponent piece was passed and the walk stopped on a player piece before the edge
+        get_piece = self.get_piece
+        for d, ray in enumerate(self.rays[i][j], 1):
+            opposite_found = False
+            for y, x in ray:
+                piece = get_piece(y, x)
+                if(piece != opposite_player):
+                    if(piece == player and opposite_found):
+                        found_directions.append(d)
+                    break
+                opposite_found = True
 
+        return found_directions
 
-        #check U
-        x = i - 1
-        opposite_found = False
-
-        while(x >= 0 and self.get_piece(x, j) == opposite_player):
-            x -= 1
-            opposite_found = True
-
-        if(x >= 0 and self.get_piece(x, j) == player and opposite_found):
-            found_directions.append(3)
-
-
-        #check D
-        x = i + 1
-        opposite_found = False
-
-        while(x < self.dimensions[0] and self.get_piece(x, j) == opposite_player):
-            x += 1
-            opposite_found = True
-
-        if(x < self.dimensions[0] and self.get_piece(x, j) == player and opposite_found):
-            found_directions.append(4)
-
-
-        #check UR
-
-        x = j + 1
-        y = i - 1
-        opposite_found = False
-
-        while(x < self.dimensions[0] and y >= 0 and self.get_piece(y, x) == opposite_player):
-            x += 1
-            y -= 1
-            opposite_found = True
-
-        if(x < self.dimensions[0] and y >= 0 and self.get_piece(y, x) == player and opposite_found):
-            found_directions.append(5)
-
-        #check UL
-        x = j - 1
-        y = i - 1
-        opposite_found = False
-
-        while(x >= 0 and y >= 0 and self.get_piece(y, x) == opposite_player):
-            x -= 1
-            y -= 1
-            opposite_found = True
-
-        if(x >= 0 and y >= 0 and self.get_piece(y, x) == player and opposite_found):
-            found_directions.append(6)
-
-        #check DR
-        x = j + 1
-        y = i + 1
-        opposite_found = False
-
-        while(x < self.dimensions[0] and y < self.dimensions[0] and self.get_piece(y, x) == opposite_player):
-            x += 1
-            y += 1
-            opposite_found = True
+    def can_play(self, i, j, player):
+        '''
+        Checks if a move is valid without collecting its flip directions
 
-        if(x < self.dimensions[0] and y < self.dimensions[0] and self.get_piece(y, x) == player and opposite_found):
-            found_directions.append(7)
+        ARGS:
+            i, j (int, int): position which to check
+            player (str): 'X' or 'O' for which player is checking for valid move
+        RETURNS:
+            (bool): True if placing a piece at i, j would flip at least one piece
+        '''
+        get_piece = self.get_piece
+        if(get_piece(i, j)):
+            return False
 
-        #check DL
-        x = j - 1
-        y = i + 1
-        opposite_found = False
+        opposite_player = 'O' if player == 'X' else 'X'
 
-        while(x >= 0 and y < self.dimensions[0] and self.get_piece(y, x) == opposite_player):
-            x -= 1
-            y += 1
-            opposite_found = True
+        #same walk as is_valid_move, but the first direction that flips is enough
+        for ray in self.rays[i][j]:
+            opposite_found = False
+            for y, x in ray:
+                piece = get_piece(y, x)
+                if(piece != opposite_player):
+                    if(piece == player and opposite_found):
+                        return True
+                    break
+                opposite_found = True
 
-        if(x >= 0  and y < self.dimensions[0] and self.get_piece(y, x) == player and opposite_found):
-            found_directions.append(8)
-        return found_directions
+        return False
 
     def flip_piece(self, i, j):
         '''
@@ -311,6 +588,36 @@ class Board:
         else:
             self.grid_values[i][j].set_value('X')
 
+        self.hash_key ^= self.keys['flip'][i * self.dimensions[0] + j]
+
+        if(self.listener is not None):
+            self.listener.piece_flipped(i * self.dimensions[0] + j, self.get_piece(i, j))
+
+    def set_piece(self, i, j, player):
+        '''
+        Puts a piece for a player at a position, replacing whatever was there, and updates hash_key
+        Nothing gets flipped and the piece counts are not changed
+
+        ARGS:
+            i, j (int, int): position of the piece
+            player (str): 'X' or 'O' for who owns the piece, None to leave the position empty
+        '''
+        square = i * self.dimensions[0] + j
+
+        #take the old piece out of the hash
+        old = self.get_piece(i, j)
+        if(old):
+            self.hash_key ^= self.keys[old][square]
+
+        if(player):
+            self.grid_values[i][j] = Piece(i, j, player)
+            self.hash_key ^= self.keys[player][square]
+        else:
+            self.grid_values[i][j] = None
+
+        if(self.listener is not None):
+            self.listener.piece_set(square, old, player)
+
     def turn_pieces(self, i, j, player):
         '''
         Function to flip needed pieces after a piece is played
@@ -318,11 +625,16 @@ class Board:
         ARGS: 
             i, j (int, int): position at which piece was played
             player (str): 'X' or 'O' for which player placed the piece
+        RETURNS:
+            (int): number of pieces that were flipped
         '''
 
         #first get the directions pieces need to get flipped in
         dirs = self.piece_dirs[i][j]
 
+        #number of pieces flipped, used by add_piece to update the piece counts
+        flipped = 0
+
         #get the opposite player string representation
         opposite_player = ''
         if(player == 'X'):
@@ -330,75 +642,52 @@ class Board:
         else:
             opposite_player = 'X'
 
-        #if a direction needs to get flipped, keep flipping until a non opposing player piece is found
-
-        #flip right
-        if(1 in dirs):
-            x = j + 1
-            while(self.get_piece(i, x) == opposite_player):
-                self.flip_piece(i, x)
-                x += 1
-
-        #flip left
-        if(2 in dirs):
-            x = j - 1
-            while(self.get_piece(i, x) == opposite_player):
-                self.flip_piece(i, x)
-                x -= 1
-
-        #flip up
-        if(3 in dirs):
-            x = i - 1
-            while(self.get_piece(x, j) == opposite_player):
-                self.flip_piece(x, j)
-                x -= 1
-
-        #flip down
-        if(4 in dirs):
-            x = i + 1
-            while(self.get_piece(x, j) == opposite_player):
-                self.flip_piece(x, j)
-                x += 1
-
-        #flip up_right
-        if(5 in dirs):
-            y = i - 1
-            x = j + 1
-            while(self.get_piece(y, x) == opposite_player):
-                self.flip_piece(y, x)
-                y -= 1
-                x += 1
-
-        #flip up_left
-        if(6 in dirs):
-            y = i - 1
-            x = j - 1
-            while(self.get_piece(y, x) == opposite_player):
+        #if a direction needs to get flipped, keep flipping along its ray until a non opposing player piece is found
+        for d in dirs:
+            for y, x in self.rays[i][j][d - 1]:
+                if(self.get_piece(y, x) != opposite_player):
+                    break
                 self.flip_piece(y, x)
-                y -= 1
-                x -= 1
-
-        #flip down_right
-        if(7 in dirs):
-            y = i + 1
-            x = j + 1
-            while(self.get_piece(y, x) == opposite_player):
-                self.flip_piece(y, x)
-                y += 1
-                x += 1
-
-        #flip down_leftf
-        if(8 in dirs):
-            y = i + 1
-            x = j - 1
-            while(self.get_piece(y, x) == opposite_player):
-                self.flip_piece(y, x)
-                y += 1
-                x -= 1
+                flipped += 1
+
+        return flipped
+
+    def update_counts(self, player, flipped, placed=1):
+        '''
+        updates O_num and X_num after player placed a piece which flipped some opponent pieces
+
+        ARGS:
+            player (str): 'X' or 'O' for which player placed the piece
+            flipped (int): number of pieces that were flipped by the placement
+            placed (int): number of pieces placed, unmake_move passes -1 with a negative flipped to undo a move
+        '''
+        if(player == 'X'):
+            self.X_num += flipped + placed
+            self.O_num -= flipped
+        else:
+            self.O_num += flipped + placed
+            self.X_num -= flipped
+
+        #in debug mode check the counts against a full recount of the board
+        if(self.debug):
+            self.check_counts()
+
+    def check_counts(self):
+        '''
+        consistency check for debug mode, recounts the whole board and compares with O_num and X_num
+
+        RAISES:
+            AssertionError: if the stored counts do not match the board
+        '''
+        stored = (self.O_num, self.X_num)
+        self.count_pieces()
+        if(stored != (self.O_num, self.X_num)):
+            raise AssertionError(f'Piece counts out of sync: stored {stored}, board has {(self.O_num, self.X_num)}')
 
     def count_pieces(self):
         '''
         counts the number of pieces for each player and stores in member O_num and X_num
+        this is a full scan of the board, add_piece keeps the counts up to date without it
         '''
         O_num = 0
         X_num = 0
@@ -414,6 +703,237 @@ class Board:
         self.O_num = O_num
         self.X_num = X_num
 
+    def get_flips(self, i, j, player):
+        '''
+        Finds the pieces that would get flipped if player placed a piece at a position
+        Unlike turn_pieces this does not depend on piece_dirs, so it is safe to use while searching
+
+        ARGS:
+            i, j (int, int): position of the move
+            player (str): 'X' or 'O' for which player is placing
+        RETURNS:
+            [(int, int)]: positions of the pieces that would get flipped, empty if the move is not valid
+        '''
+        dirs = self.is_valid_move(i, j, player)
+        if(not dirs):
+            return []
+
+        flips = []
+        for d in dirs:
+            #a valid direction always ends on a player piece before the end of the ray
+            for y, x in self.rays[i][j][d - 1]:
+                if(self.get_piece(y, x) == player):
+                    break
+                flips.append((y, x))
+        return flips
+
+    def make_move(self, pos, player):
+        '''
+        Plays a move and pushes what it changed onto the undo stack so unmake_move can take it back
+        The board ends up in the same state as after add_piece but piece_dirs is neither used nor updated
+
+        ARGS:
+            pos ((int, int) or Grid_Point): position of the move, 0 indexed tuple or grid_point
+            player (str): 'X' or 'O' for which player is moving
+        RETURNS:
+            (int): number of pieces that were flipped
+        RAISES:
+            ValueError: if the move is not valid for player
+        '''
+        offset = 0
+        if(isinstance(pos, Grid_Point)):
+            offset = 1
+        i = pos[0] - offset
+        j = pos[1] - offset
+
+        flips = self.get_flips(i, j, player)
+        if(not flips):
+            raise ValueError(f'Illegal move {(i, j)} for player {player}')
+
+        for y, x in flips:
+            self.flip_piece(y, x)
+        self.set_piece(i, j, player)
+        self.update_counts(player, len(flips))
+
+        if(self.track_mobility):
+            self.update_mobility(flips + [(i, j)])
+
+        self.undo_stack.append((i, j, player, flips))
+        return len(flips)
+
+    def unmake_move(self):
+        '''
+        Takes back the last move played with make_move, restoring the pieces and counts from before it
+
+        RAISES:
+            IndexError: if there is no move to take back
+        '''
+        i, j, player, flips = self.undo_stack.pop()
+
+        self.set_piece(i, j, None)
+        for y, x in flips:
+            self.flip_piece(y, x)
+        self.update_counts(player, -len(flips), -1)
+
+        if(self.track_mobility):
+            self.update_mobility(flips + [(i, j)])
+
+    def update_mobility(self, changed):
+        '''
+        Re-evaluates the moves of both players that could have been changed by pieces being placed, flipped or removed
+
+        A move's directions only depend on the pieces along its rays up to the first empty position, so the only
+        positions that need checking are the changed ones and, along every ray out of a changed position,
+        the first empty position after a run of pieces.
+
+        ARGS:
+            changed ([(int, int)]): positions that changed
+        '''
+        affected = set()
+        for i, j in changed:
+            affected.add((i, j))
+            for ray in self.rays[i][j]:
+                for y, x in ray:
+                    if(not self.get_piece(y, x)):
+                        affected.add((y, x))
+                        break
+
+        for player in ('O', 'X'):
+            dirs_grid = self.mobility_dirs[player]
+            legal = self.legal_moves[player]
+            for i, j in affected:
+                dirs = self.is_valid_move(i, j, player)
+                dirs_grid[i][j] = dirs
+                if(dirs):
+                    legal.add((i, j))
+                else:
+                    legal.discard((i, j))
+
+    def check_mobility(self):
+        '''
+        consistency check for debug mode, compares the tracked moves of both players with a full rescan
+
+        RAISES:
+            AssertionError: if the tracker disagrees with is_valid_move anywhere on the board
+        '''
+        size = self.dimensions[0]
+        for player in ('O', 'X'):
+            for i in range(size):
+                for j in range(size):
+                    dirs = self.is_valid_move(i, j, player)
+                    if(dirs != self.mobility_dirs[player][i][j] or bool(dirs) != ((i, j) in self.legal_moves[player])):
+                        raise AssertionError(f'Mobility out of sync for {player} at {(i, j)}: tracked {self.mobility_dirs[player][i][j]}, board has {dirs}')
+
+    def get_pieces(self):
+        '''
+        Lists the pieces on the board
+
+        RETURNS:
+            [(int, str)]: square number (i * size + j) and owner of every piece, in row major order
+        '''
+        size = self.dimensions[0]
+        pieces = []
+        for i in range(size):
+            for j in range(size):
+                piece = self.get_piece(i, j)
+                if(piece):
+                    pieces.append((i * size + j, piece))
+        return pieces
+
+    def symmetry_hashes(self, player=None):
+        '''
+        Hashes the position under each of the 8 symmetries without building the transformed boards
+
+        ARGS:
+            player (str): side to move, hashed in the same way as zobrist.position_key, None for the pieces alone
+        RETURNS:
+            [int]: hash of the position transformed by each symmetry, hashes[0] is the board's own hash
+        '''
+        pieces = self.get_pieces()
+        side = SIDE_KEY if player == 'X' else 0
+
+        hashes = []
+        for keys in get_symmetry_keys(self.dimensions[0]):
+            key = side
+            for square, piece in pieces:
+                key ^= keys[piece][square]
+            hashes.append(key)
+        return hashes
+
+    def canonical_hash(self, player=None):
+        '''
+        Hash which is the same for all 8 rotations and reflections of a position, the smallest of symmetry_hashes
+
+        ARGS:
+            player (str): side to move, None for the pieces alone
+        RETURNS:
+            (int, [int]): the hash and every symmetry taking the board into the hash's frame, more than one when
+                          the position is symmetric itself like the starting position
+        '''
+        hashes = self.symmetry_hashes(player)
+        key = min(hashes)
+        return key, [sym for sym in range(8) if hashes[sym] == key]
+
+    def canonical_form(self, player=None):
+        '''
+        Turns the position into its canonical frame
+
+        ARGS:
+            player (str): side to move, None for the pieces alone
+        RETURNS:
+            (Board, int): the transformed board, whose hash is the canonical hash, and the symmetry used
+        '''
+        sym = self.canonical_hash(player)[1][0]
+        return self.transformed(sym), sym
+
+    def transformed(self, sym):
+        '''
+        Builds a copy of the board with a symmetry applied, on the same backend
+
+        ARGS:
+            sym (int): symmetry number 0 to 7
+        RETURNS:
+            (Board): new board holding the transformed position with its counts and hash
+        '''
+        size = self.dimensions[0]
+        table = get_symmetries(size)[sym]
+        pieces = self.get_pieces()
+
+        brd = Board(size, backend=self.backend)
+        for square, piece in brd.get_pieces():
+            brd.set_piece(square // size, square % size, None)
+        for square, piece in pieces:
+            brd.set_piece(table[square] // size, table[square] % size, piece)
+        brd.count_pieces()
+        return brd
+
+    def transform_move(self, move, sym):
+        '''
+        Maps a move on this board to the same move on the board transformed by sym
+
+        ARGS:
+            move ((int, int)): 1 indexed move, None for a pass
+            sym (int): symmetry number 0 to 7
+        RETURNS:
+            ((int, int)): 1 indexed move on the transformed board, None for a pass
+        '''
+        if(move is None):
+            return None
+        i, j = transform_square(move[0] - 1, move[1] - 1, self.dimensions[0], sym)
+        return (i + 1, j + 1)
+
+    def inverse_move(self, move, sym):
+        '''
+        Maps a move on the board transformed by sym back to this board
+
+        ARGS:
+            move ((int, int)): 1 indexed move on the transformed board, None for a pass
+            sym (int): symmetry number 0 to 7
+        RETURNS:
+            ((int, int)): 1 indexed move on this board, None for a pass
+        '''
+        return self.transform_move(move, INVERSE_SYMMETRY[sym])
+
     def get_piece_count(self):
         '''
         returns the a tuple containing the number of pieces for each player
@@ -423,6 +943,200 @@ class Board:
         '''
         return (self.O_num, self.X_num)
 
+    def get_bits(self):
+        '''
+        Gets the pieces on the board as one bitmask per player
+
+        RETURNS:
+            ({str: int}): bit i * size + j set for each piece, keyed by 'O' and 'X'
+        '''
+        size = self.dimensions[0]
+        bits = {'O': 0, 'X': 0}
+        for i, row in enumerate(self.grid_values):
+            for j, piece in enumerate(row):
+                if(piece):
+                    bits[piece.get_value()] |= 1 << (i * size + j)
+        return bits
+
+    def set_position(self, bits):
+        '''
+        Replaces every piece on the board, building the cell storage directly instead of placing pieces one by one
+
+        hash_key is recomputed while the counts, piece_dirs and the mobility tracker are left for the caller to
+        update, and the listener is not told.
+
+        ARGS:
+            bits ({str: int}): bitmask of the pieces of 'O' and 'X', see get_bits
+        '''
+        size = self.dimensions[0]
+        grid = self.create_grid(size)
+
+        hash_key = 0
+        for player in ('O', 'X'):
+            keys = self.keys[player]
+            rest = bits[player]
+            while(rest):
+                low = rest & -rest
+                square = low.bit_length() - 1
+                rest ^= low
+                i, j = divmod(square, size)
+                grid[i][j] = Piece(i, j, player)
+                hash_key ^= keys[square]
+
+        self.grid_values = grid
+        self.hash_key = hash_key
+
+    def set_dirs(self, piece_dirs):
+        '''
+        Replaces piece_dirs, backends which keep track of the filled squares override this
+
+        ARGS:
+            piece_dirs ([[[int]]]): grid of direction lists and None
+        '''
+        self.piece_dirs = piece_dirs
+
+    def to_bytes(self, dirs=False):
+        '''
+        Packs the position into a compact byte string, for handing boards to other processes or storing them
+
+        The same position gives the same bytes on every backend. The undo stack, mobility tracker and listener
+        are not included.
+
+        ARGS:
+            dirs (bool): include piece_dirs so the board can be played on with add_piece straight away
+        RETURNS:
+            (bytes): header, piece bitmasks and optionally piece_dirs (see STATE_HEADER)
+        '''
+        size = self.dimensions[0]
+        length = (size * size + 7) // 8
+        bits = self.get_bits()
+
+        data = STATE_HEADER.pack(STATE_MAGIC, size, self.O_num, self.X_num, STATE_DIRS if dirs else 0)
+        data += bits['O'].to_bytes(length, 'little') + bits['X'].to_bytes(length, 'little')
+        if(dirs):
+            data += pack_dirs(self.piece_dirs, size)
+        return data
+
+    @classmethod
+    def from_bytes(cls, data, backend=None):
+        '''
+        Builds a board from to_bytes' output
+
+        ARGS:
+            data (bytes): packed position
+            backend (str): backend of the new board, defaults to the backend of the class it is called on
+        RETURNS:
+            (Board): board with the packed pieces, counts and piece_dirs
+        RAISES:
+            ValueError: if data is not a packed board
+        '''
+        magic, size, o_num, x_num, flags = STATE_HEADER.unpack_from(data, 0)
+        if(magic != STATE_MAGIC):
+            raise ValueError('Not a packed board state')
+
+        board = Board(size, backend=backend or cls.backend)
+        length = (size * size + 7) // 8
+        offset = STATE_HEADER.size
+        board.set_position({
+            'O': int.from_bytes(data[offset:offset + length], 'little'),
+            'X': int.from_bytes(data[offset + length:offset + 2 * length], 'little'),
+        })
+        board.O_num = o_num
+        board.X_num = x_num
+
+        if(flags & STATE_DIRS):
+            board.set_dirs(unpack_dirs(data, offset + 2 * length, size))
+        else:
+            board.set_dirs([[None] * size for i in range(size)])
+        return board
+
+    def __reduce__(self):
+        '''
+        Pickles the board through to_bytes, so boards sent to worker processes stay small
+
+        RETURNS:
+            (tuple): from_bytes and its arguments
+        '''
+        return (Board.from_bytes, (self.to_bytes(True), self.backend))
+
+    def copy(self, dirs=True):
+        '''
+        Builds an independent board in the same position without going through the constructor
+
+        The copy starts with an empty undo stack and no listener. A board tracking mobility gets its own copy
+        of the tracker.
+
+        ARGS:
+            dirs (bool): copy piece_dirs too, otherwise the copy needs a get_available_moves call before add_piece
+        RETURNS:
+            (Board): the copy, on the same backend
+        '''
+        size = self.dimensions[0]
+        board = object.__new__(type(self))
+        board.dimensions = self.dimensions
+        board.debug = self.debug
+        board.O_num = self.O_num
+        board.X_num = self.X_num
+        board.undo_stack = []
+        board.rays = self.rays
+        board.keys = self.keys
+        board.hash_key = self.hash_key
+        self.copy_grid(board)
+
+        board.track_mobility = self.track_mobility
+        if(self.track_mobility):
+            board.mobility_dirs = {}
+            board.legal_moves = {}
+            for player in ('O', 'X'):
+                board.mobility_dirs[player] = [row[:] for row in self.mobility_dirs[player]]
+                board.legal_moves[player] = set(self.legal_moves[player])
+
+        #with the tracker piece_dirs is one of the players' mobility grids and has to stay that way in the copy
+        if(self.track_mobility and self.piece_dirs is self.mobility_dirs['O']):
+            board.piece_dirs = board.mobility_dirs['O']
+        elif(self.track_mobility and self.piece_dirs is self.mobility_dirs['X']):
+            board.piece_dirs = board.mobility_dirs['X']
+        elif(dirs):
+            board.piece_dirs = [row[:] for row in self.piece_dirs]
+        else:
+            board.piece_dirs = [[None] * size for i in range(size)]
+        return board
+
+    def copy_grid(self, board):
+        '''
+        Gives a board made by copy its own copy of the cell storage, backends with a different cell storage override this
+
+        ARGS:
+            board (Board): the copy
+        '''
+        board.grid_values = [[Piece(i, j, piece.get_value()) if piece else None for j, piece in enumerate(row)]
+                             for i, row in enumerate(self.grid_values)]
+
+
+def get_backend(name):
+    '''
+    Looks up the board class implementing a storage backend
+
+    ARGS:
+        name (str): 'grid', 'bitboard', 'compact' or 'sparse'
+    RETURNS:
+        (type): the Board subclass for that backend
+    '''
+    if(name == 'grid'):
+        return Board
+    elif(name == 'bitboard'):
+        #imported here as bitboard.py subclasses Board
+        from bitboard import BitBoard
+        return BitBoard
+    elif(name == 'compact'):
+        from compact import CompactBoard
+        return CompactBoard
+    elif(name == 'sparse'):
+        from sparse import SparseBoard
+        return SparseBoard
+
+    raise ValueError(f'Unknown board backend: {name}')
+
 
 
 if __name__ == "__main__":
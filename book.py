@@ -0,0 +1,209 @@
+import argparse
+import mmap
+import struct
+
+from board import Board
+from record import GameArchive
+
+
+#file header: magic, board size, number of moves from the start stored and number of entries
+BOOK_HEADER = struct.Struct('<4sHHI')
+BOOK_MAGIC = b'RVBK'
+
+#one entry per (position, move): position key, move square in the key's frame, games and points (2 a win, 1 a tie)
+BOOK_ENTRY = struct.Struct('<QHII')
+
+
+def build_book(records, size=8, depth=20):
+    '''
+    Gathers move statistics from recorded games
+
+    ARGS:
+        records (iterable of GameRecord): games to learn from, games on other board sizes are skipped
+        size (int): board size of the book
+        depth (int): number of moves from the start of each game to take moves from, passes are not counted so
+                     this matches the pieces placed that Book.lookup and AIPlayer check
+    RETURNS:
+        ({(int, int): [int, int]}): [games, points] for the player moving, keyed by (position key, move square)
+    '''
+    stats = {}
+    for record in records:
+        if(record.size != size):
+            continue
+
+        brd = Board(size, backend='bitboard')
+        player = record.start
+        seen = []
+        placed = 0
+        for move in record.moves():
+            if(move is not None):
+                if(placed < depth):
+                    key, syms = brd.canonical_hash(player)
+
+                    #moves which are the same under the position's own symmetries are stored as one
+                    y, x = min(brd.transform_move(move, sym) for sym in syms)
+                    seen.append((key, (y - 1) * size + x - 1, player))
+                brd.make_move((move[0] - 1, move[1] - 1), player)
+                placed += 1
+            player = 'O' if player == 'X' else 'X'
+
+        #the rest of the game was only played out to find the winner
+        o_num, x_num = brd.get_piece_count()
+        for key, square, mover in seen:
+            own, other = (o_num, x_num) if mover == 'O' else (x_num, o_num)
+            entry = stats.setdefault((key, square), [0, 0])
+            entry[0] += 1
+            entry[1] += 2 if own > other else 1 if own == other else 0
+
+    return stats
+
+def write_book(stats, path, size=8, depth=20):
+    '''
+    Writes move statistics to a book file sorted by position key
+
+    ARGS:
+        stats ({(int, int): [int, int]}): output of build_book
+        path (str): file to write
+        size (int): board size of the book
+        depth (int): depth the statistics were gathered to
+    '''
+    with open(path, 'wb') as f:
+        f.write(BOOK_HEADER.pack(BOOK_MAGIC, size, depth, len(stats)))
+        for (key, square), (games, points) in sorted(stats.items()):
+            f.write(BOOK_ENTRY.pack(key, square, games, points))
+
+
+class OpeningBook:
+    '''
+    Move statistics for opening positions, read from a sorted book file through a memory map
+
+    Positions are looked up with a binary search on their key, which is the same for all 8 rotations and
+    reflections of a position (see Board.canonical_hash), and the moves found are mapped back to the board's own frame.
+
+    Attributes:
+        size int: board size of the book
+        depth int: number of moves from the start the book covers, counted as pieces placed beyond the first 4
+        entries int: number of (position, move) entries
+
+    Methods:
+        lookup(board, player): returns the book moves for a position with their game counts and scores
+        choose_move(board, player, min_games): returns the best scoring book move or None
+        close(): closes the file
+    '''
+    def __init__(self, path):
+        '''
+        Constructor
+
+        ARGS:
+            path (str): book file written by write_book
+        RAISES:
+            ValueError: if the file is not an opening book
+        '''
+        self.f = open(path, 'rb')
+        self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.size, self.depth, self.entries = BOOK_HEADER.unpack_from(self.map, 0)
+        if(magic != BOOK_MAGIC):
+            self.close()
+            raise ValueError(f'{path} is not an opening book')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def entry_key(self, n):
+        '''
+        Reads the position key of an entry
+
+        ARGS:
+            n (int): entry number
+        RETURNS:
+            (int): position key
+        '''
+        return BOOK_ENTRY.unpack_from(self.map, BOOK_HEADER.size + n * BOOK_ENTRY.size)[0]
+
+    def lookup(self, board, player):
+        '''
+        Finds the book moves for a position
+
+        ARGS:
+            board (Board): current position
+            player (str): 'X' or 'O' for which player is to move
+        RETURNS:
+            ([((int, int), int, float)]): 1 indexed move, number of games and average score for player
+                                          (1 a win, 0.5 a tie), empty if the position is not in the book
+        '''
+        size = self.size
+        if(board.dimensions[0] != size or sum(board.get_piece_count()) - 4 >= self.depth):
+            return []
+
+        key, syms = board.canonical_hash(player)
+
+        #binary search for the first entry of the position
+        low = 0
+        high = self.entries
+        while(low < high):
+            mid = (low + high) // 2
+            if(self.entry_key(mid) < key):
+                low = mid + 1
+            else:
+                high = mid
+
+        moves = []
+        while(low < self.entries):
+            entry_key, square, games, points = BOOK_ENTRY.unpack_from(self.map, BOOK_HEADER.size + low * BOOK_ENTRY.size)
+            if(entry_key != key):
+                break
+            move = board.inverse_move((square // size + 1, square % size + 1), syms[0])
+            moves.append((move, games, points / (2 * games)))
+            low += 1
+        return moves
+
+    def choose_move(self, board, player, min_games=1):
+        '''
+        Picks the book move with the best score
+
+        ARGS:
+            board (Board): current position
+            player (str): 'X' or 'O' for which player is to move
+            min_games (int): fewest games a move needs to be considered
+        RETURNS:
+            ((int, int)): 1 indexed move, None if no book move has been played often enough
+        '''
+        moves = [entry for entry in self.lookup(board, player) if entry[1] >= min_games]
+        if(not moves):
+            return None
+        return max(moves, key=lambda entry: (entry[2], entry[1]))[0]
+
+    def close(self):
+        '''
+        Closes the file
+        '''
+        self.map.close()
+        self.f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build an opening book from binary game archives')
+    parser.add_argument('archives', nargs='+', help='game archives to read (see record.py)')
+    parser.add_argument('-o', '--output', required=True, help='book file to write')
+    parser.add_argument('--size', type=int, default=8, help='board size of the book')
+    parser.add_argument('--depth', type=int, default=20, help='moves from the start of each game to store, passes not counted')
+    args = parser.parse_args()
+
+    stats = {}
+    for path in args.archives:
+        with GameArchive(path) as archive:
+            for (key, square), (games, points) in build_book(archive, args.size, args.depth).items():
+                entry = stats.setdefault((key, square), [0, 0])
+                entry[0] += games
+                entry[1] += points
+
+    write_book(stats, args.output, args.size, args.depth)
+    print(f'{len(stats)} entries written to {args.output}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+from board import Board
+from piece import Piece
+
+#byte stored for each cell value, an empty cell is 0
+CODES = {'O': 1, 'X': 2}
+
+#cell value for each byte
+VALUES = (None, 'O', 'X')
+
+
+class CompactRow:
+    '''
+    View of one row of a CompactGrid, indexing it gives a Piece or None like a row of the grid backend
+
+    Pieces are created when a cell is read, so changing one does not change the board.
+    '''
+    __slots__ = ('cells', 'start', 'i', 'size')
+
+    def __init__(self, cells, i, size):
+        '''
+        Constructor
+
+        ARGS:
+            cells (bytearray): cell storage of the grid
+            i (int): row index
+            size (int): size of the square board
+        '''
+        self.cells = cells
+        self.start = i * size
+        self.i = i
+        self.size = size
+
+    def __len__(self):
+        '''
+        length method
+
+        RETURNS:
+            int: number of cells in the row
+        '''
+        return self.size
+
+    def __getitem__(self, j):
+        '''
+        Get item method
+
+        ARGS:
+            j (int): column index
+        RETURNS:
+            (Piece): piece in the cell, None if it is empty
+        '''
+        if(j < 0):
+            j += self.size
+        if(not 0 <= j < self.size):
+            raise IndexError('grid column index out of range')
+        value = VALUES[self.cells[self.start + j]]
+        if(value):
+            return Piece(self.i, j, value)
+        return None
+
+    def __setitem__(self, j, piece):
+        '''
+        Set item method
+
+        ARGS:
+            j (int): column index
+            piece (Piece): piece to store in the cell, None to empty it
+        '''
+        if(piece):
+            self.cells[self.start + j] = CODES[piece.get_value()]
+        else:
+            self.cells[self.start + j] = 0
+
+    def __iter__(self):
+        '''
+        iterator method
+
+        YIELDS:
+            (Piece): piece or None for each cell in the row
+        '''
+        for j in range(self.size):
+            yield self[j]
+
+
+class CompactGrid:
+    '''
+    2d view over a flat bytearray with one byte per cell, grid[i][j] reads and writes like the grid backend's lists
+
+    Attributes:
+        cells bytearray: cell i, j is at index i * size + j, 0 for empty, 1 for O and 2 for X
+        size int: size of the square board
+    '''
+    __slots__ = ('cells', 'size')
+
+    def __init__(self, size):
+        '''
+        Constructor
+
+        ARGS:
+            size (int): size of the square board
+        '''
+        self.cells = bytearray(size * size)
+        self.size = size
+
+    def __len__(self):
+        '''
+        length method
+
+        RETURNS:
+            int: number of rows
+        '''
+        return self.size
+
+    def __getitem__(self, i):
+        '''
+        Get item method
+
+        ARGS:
+            i (int): row index
+        RETURNS:
+            (CompactRow): view of the row
+        '''
+        if(i < 0):
+            i += self.size
+        if(not 0 <= i < self.size):
+            raise IndexError('grid row index out of range')
+        return CompactRow(self.cells, i, self.size)
+
+    def __iter__(self):
+        '''
+        iterator method
+
+        YIELDS:
+            (CompactRow): view of each row
+        '''
+        for i in range(self.size):
+            yield CompactRow(self.cells, i, self.size)
+
+
+class CompactBoard(Board):
+    '''
+    Board backend which stores one byte per cell in a flat bytearray instead of a Piece object per occupied cell
+
+    grid_values is a CompactGrid so grid_values[i][j] still gives a Piece or None, but the pieces are only
+    created when something outside the board reads them. Everything inside the board works on the bytes.
+
+    Attributes (on top of Board's):
+        cells bytearray: cell storage shared with grid_values, see CompactGrid
+    '''
+    backend = 'compact'
+
+    def __init__(self, size, backend='compact', debug=False, track_mobility=False):
+        '''
+        CompactBoard constructor
+
+        ARGS:
+            size (int): size of the square board
+            backend (str): always 'compact', accepted so Board(size, backend='compact') can construct this class
+            debug (bool): turns on the consistency checks
+            track_mobility (bool): keep both players' moves up to date incrementally (see Board)
+        '''
+        super().__init__(size, backend, debug, track_mobility)
+
+    def create_grid(self, size):
+        '''
+        Creates the byte storage for the cells
+
+        ARGS:
+            size (int): size of the square board
+        RETURNS:
+            (CompactGrid): empty grid
+        '''
+        grid = CompactGrid(size)
+        self.cells = grid.cells
+        return grid
+
+    def get_piece(self, i, j):
+        '''
+        gets a position's piece's player
+
+        ARGS:
+            i, j (int, int): position at which to get piece
+
+        RETURNS:
+            (str): 'X', 'O', or None depending on which player owns the piece or if there is a piece at all
+        '''
+        return VALUES[self.cells[i * self.dimensions[0] + j]]
+
+    def flip_piece(self, i, j):
+        '''
+        Flips a piece to the opposite player
+
+        ARGS: {Note: function expects a position at which a piece is located}
+            i, j (int, int): position at which to flip piece
+        '''
+        square = i * self.dimensions[0] + j
+
+        #1 and 2 swap when xor'd with 3
+        self.cells[square] ^= 3
+        self.hash_key ^= self.keys['flip'][square]
+
+        if(self.listener is not None):
+            self.listener.piece_flipped(square, VALUES[self.cells[square]])
+
+    def set_piece(self, i, j, player):
+        '''
+        Puts a piece for a player at a position, replacing whatever was there, and updates hash_key
+        Nothing gets flipped and the piece counts are not changed
+
+        ARGS:
+            i, j (int, int): position of the piece
+            player (str): 'X' or 'O' for who owns the piece, None to leave the position empty
+        '''
+        square = i * self.dimensions[0] + j
+
+        old = VALUES[self.cells[square]]
+        if(old):
+            self.hash_key ^= self.keys[old][square]
+
+        if(player):
+            self.cells[square] = CODES[player]
+            self.hash_key ^= self.keys[player][square]
+        else:
+            self.cells[square] = 0
+
+        if(self.listener is not None):
+            self.listener.piece_set(square, old, player)
+
+    def get_bits(self):
+        '''
+        Gets the pieces on the board as one bitmask per player, read straight from the cell bytes
+
+        RETURNS:
+            ({str: int}): bit i * size + j set for each piece, keyed by 'O' and 'X'
+        '''
+        bits = [0, 0, 0]
+        for square, code in enumerate(self.cells):
+            if(code):
+                bits[code] |= 1 << square
+        return {'O': bits[CODES['O']], 'X': bits[CODES['X']]}
+
+    def set_position(self, bits):
+        '''
+        Replaces every piece on the board by writing the cell bytes directly (see Board.set_position)
+
+        ARGS:
+            bits ({str: int}): bitmask of the pieces of 'O' and 'X'
+        '''
+        size = self.dimensions[0]
+        self.grid_values = self.create_grid(size)
+        cells = self.cells
+
+        hash_key = 0
+        for player in ('O', 'X'):
+            keys = self.keys[player]
+            code = CODES[player]
+            rest = bits[player]
+            while(rest):
+                low = rest & -rest
+                square = low.bit_length() - 1
+                rest ^= low
+                cells[square] = code
+                hash_key ^= keys[square]
+        self.hash_key = hash_key
+
+    def copy_grid(self, board):
+        '''
+        Gives a board made by copy its own copy of the cell bytes
+
+        ARGS:
+            board (CompactBoard): the copy
+        '''
+        board.grid_values = board.create_grid(self.dimensions[0])
+        board.cells[:] = self.cells
+
+
+if __name__ == "__main__":
+    pass
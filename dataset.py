@@ -0,0 +1,401 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from board import Board
+from selfplay import play_seeded_game
+
+
+#file holding the settings of a dataset directory, a resumed run has to use the same ones
+MANIFEST = 'dataset.json'
+
+#default number of samples in each shard file
+SHARD_SIZE = 1 << 16
+
+#games played between checkpoints, a crashed run replays at most this many games per producer
+CHECKPOINT_GAMES = 100
+
+
+def sample_dtype(size):
+    '''
+    Gets the record type of one sample
+
+    ARGS:
+        size (int): board size
+    RETURNS:
+        (np.dtype): fixed size record with
+                    planes: one 0/1 plane for the O pieces and one for the X pieces, from Board.grid_values
+                    player: side to move, 0 for O and 1 for X
+                    mask: 1 on every legal move of the side to move, from Board.piece_dirs
+                    outcome: 1 if the side to move won the game, -1 if they lost and 0 for a tie
+                    margin: final piece count of the side to move minus the opponent's
+                    game: seed of the game the position comes from
+                    ply: turn number of the position in its game, passes included
+    '''
+    return np.dtype([
+        ('planes', np.uint8, (2, size, size)),
+        ('player', np.uint8),
+        ('mask', np.uint8, (size, size)),
+        ('outcome', np.int8),
+        ('margin', np.int16),
+        ('game', np.uint64),
+        ('ply', np.uint16),
+    ])
+
+def game_samples(result, backend='grid'):
+    '''
+    Replays a finished game and labels every position where the side to move has a move
+
+    Positions where the side to move passes have an empty mask and are left out.
+
+    ARGS:
+        result (GameResult): game to replay
+        backend (str): board backend to replay on
+    RETURNS:
+        (np.ndarray): one sample_dtype record per position, in the order they were played
+    '''
+    size = result.size
+    o_num, x_num = result.counts
+    samples = np.zeros(sum(1 for player, move in result.moves if move is not None), dtype=sample_dtype(size))
+
+    planes = samples['planes']
+    mask = samples['mask']
+
+    brd = Board(size, backend=backend)
+    n = 0
+    for ply, (player, move) in enumerate(result.moves):
+        if(move is None):
+            continue
+
+        for i, row in enumerate(brd.grid_values):
+            for j, piece in enumerate(row):
+                if(piece):
+                    planes[n, 0 if piece.get_value() == 'O' else 1, i, j] = 1
+
+        #get_available_moves fills in piece_dirs for the side to move
+        brd.get_available_moves(player)
+        for i in range(size):
+            for j in range(size):
+                if(brd.piece_dirs[i][j]):
+                    mask[n, i, j] = 1
+
+        margin = o_num - x_num if player == 'O' else x_num - o_num
+        samples['player'][n] = 0 if player == 'O' else 1
+        samples['outcome'][n] = (margin > 0) - (margin < 0)
+        samples['margin'][n] = margin
+        samples['game'][n] = result.seed
+        samples['ply'][n] = ply
+
+        brd.add_piece((move[0] - 1, move[1] - 1), player)
+        n += 1
+
+    return samples
+
+def shard_path(directory, producer, shard):
+    '''
+    Gets the file a shard is written to
+
+    ARGS:
+        directory (str): dataset directory
+        producer (int): number of the producer writing the shard
+        shard (int): shard number within the producer
+    RETURNS:
+        (str): path of the .npy file
+    '''
+    return os.path.join(directory, f'shard-{producer:03d}-{shard:05d}.npy')
+
+def checkpoint_path(directory, producer):
+    '''
+    Gets the file a producer keeps its progress in
+
+    ARGS:
+        directory (str): dataset directory
+        producer (int): producer number
+    RETURNS:
+        (str): path of the json file
+    '''
+    return os.path.join(directory, f'producer-{producer:03d}.json')
+
+def read_checkpoint(directory, producer):
+    '''
+    Reads the progress of a producer
+
+    ARGS:
+        directory (str): dataset directory
+        producer (int): producer number
+    RETURNS:
+        ({str: int}): next game to play, shard being written, samples in that shard, total samples and games
+                      played, the producer's first game and nothing written for a producer that has not started
+    '''
+    path = checkpoint_path(directory, producer)
+    if(not os.path.exists(path)):
+        return {'next_game': producer, 'shard': 0, 'rows': 0, 'samples': 0, 'games': 0}
+    with open(path) as f:
+        return json.load(f)
+
+def write_checkpoint(directory, producer, state):
+    '''
+    Saves the progress of a producer, replacing the old checkpoint in one step so a crash never leaves half a file
+
+    ARGS:
+        directory (str): dataset directory
+        producer (int): producer number
+        state ({str: int}): progress as returned by read_checkpoint
+    '''
+    path = checkpoint_path(directory, producer)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+class ShardWriter:
+    '''
+    Writes samples of one producer into fixed size shard files through memory maps
+
+    Only the shard being filled is mapped, so memory use does not grow with the size of the dataset. Rows past
+    the checkpointed count of a shard are not part of the dataset: a resumed run writes over them.
+
+    Attributes:
+        directory str: dataset directory
+        producer int: producer number, each producer writes its own shards
+        dtype np.dtype: record type of the samples
+        shard_size int: samples in each shard file
+        state {str: int}: progress of the producer, see read_checkpoint
+        shard np.memmap: the shard being filled, None until the first write
+
+    Methods:
+        write(samples): appends samples, moving to a new shard whenever one fills up
+        checkpoint(next_game): flushes the shard and saves the progress
+        close(): releases the memory map
+    '''
+    def __init__(self, directory, producer, dtype, shard_size, state):
+        '''
+        Constructor
+
+        ARGS:
+            directory (str): dataset directory
+            producer (int): producer number
+            dtype (np.dtype): record type of the samples
+            shard_size (int): samples in each shard file
+            state ({str: int}): progress to continue from, see read_checkpoint
+        '''
+        self.directory = directory
+        self.producer = producer
+        self.dtype = dtype
+        self.shard_size = shard_size
+        self.state = state
+        self.shard = None
+
+    def open_shard(self):
+        '''
+        Maps the shard named in state, reopening it if it was partly written by an earlier run
+        '''
+        path = shard_path(self.directory, self.producer, self.state['shard'])
+        if(self.state['rows']):
+            self.shard = np.lib.format.open_memmap(path, mode='r+')
+        else:
+            self.shard = np.lib.format.open_memmap(path, mode='w+', dtype=self.dtype, shape=(self.shard_size,))
+
+    def write(self, samples):
+        '''
+        Appends samples
+
+        ARGS:
+            samples (np.ndarray): sample_dtype records
+        '''
+        state = self.state
+        start = 0
+        while(start < len(samples)):
+            if(state['rows'] == self.shard_size):
+                self.close()
+                state['shard'] += 1
+                state['rows'] = 0
+            if(self.shard is None):
+                self.open_shard()
+
+            count = min(len(samples) - start, self.shard_size - state['rows'])
+            self.shard[state['rows']:state['rows'] + count] = samples[start:start + count]
+            state['rows'] += count
+            start += count
+        state['samples'] += len(samples)
+
+    def checkpoint(self, next_game):
+        '''
+        Flushes the shard to disk and then saves the progress, so the checkpoint never covers unwritten samples
+
+        ARGS:
+            next_game (int): first game which is not in the written samples
+        '''
+        if(self.shard is not None):
+            self.shard.flush()
+        self.state['next_game'] = next_game
+        write_checkpoint(self.directory, self.producer, self.state)
+
+    def close(self):
+        '''
+        Releases the memory map
+        '''
+        if(self.shard is not None):
+            self.shard.flush()
+        self.shard = None
+
+
+def produce(task):
+    '''
+    Plays and writes the games of one producer, run in a worker process
+
+    Producer p of n plays games p, p + n, p + 2n, ... below games, game k with seed seed + k, and picks up from its
+    checkpoint so a stopped run can be started again with the same arguments.
+
+    ARGS:
+        task (tuple): (directory, producer, producers, games, settings) with settings from the manifest
+    RETURNS:
+        ({str: int}): final progress of the producer
+    '''
+    directory, producer, producers, games, settings = task
+    size = settings['size']
+    names = {'O': settings['player_o'], 'X': settings['player_x']}
+
+    state = read_checkpoint(directory, producer)
+    writer = ShardWriter(directory, producer, sample_dtype(size), settings['shard_size'], state)
+
+    next_game = state['next_game']
+    for k in range(next_game, games, producers):
+        result = play_seeded_game((settings['seed'] + k, size, settings['start'], settings['backend'], names, settings['time']))
+        writer.write(game_samples(result, settings['backend']))
+        state['games'] += 1
+
+        next_game = k + producers
+        if(state['games'] % CHECKPOINT_GAMES == 0):
+            writer.checkpoint(next_game)
+
+    writer.checkpoint(next_game)
+    writer.close()
+    return state
+
+def load_settings(directory, settings):
+    '''
+    Writes the manifest of a new dataset or checks a resumed run against it
+
+    ARGS:
+        directory (str): dataset directory, created if needed
+        settings ({str: value}): settings of this run, everything that changes the samples or where they are written
+    RAISES:
+        ValueError: if the directory holds a dataset made with different settings
+    '''
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MANIFEST)
+    if(os.path.exists(path)):
+        with open(path) as f:
+            existing = json.load(f)
+        if(existing != settings):
+            raise ValueError(f'{directory} holds a dataset made with different settings: {existing}')
+        return
+
+    with open(path, 'w') as f:
+        json.dump(settings, f, indent=4)
+
+def generate(directory, games, size=8, names=None, start='O', backend='grid', time_limit=0.1, producers=None,
+             shard_size=SHARD_SIZE, seed=0):
+    '''
+    Generates a dataset, or carries on with one, using a pool of producer processes
+
+    The games each producer plays and the order they are written in only depend on the settings, so a run gives the
+    same samples however often it is stopped and resumed. A resumed run may ask for more games than before.
+
+    ARGS:
+        directory (str): dataset directory
+        games (int): total number of games the dataset should hold
+        size (int): board size
+        names ({str: str}): player type for 'O' and 'X' (see game.make_player), random for both by default
+        start (str): 'O' or 'X' for which player moves first
+        backend (str): board backend to play on
+        time_limit (float): seconds per move for search players
+        producers (int): producer processes, each writing its own shards, defaults to the number of cores
+        shard_size (int): samples in each shard file
+        seed (int): seed of the first game
+    RETURNS:
+        ({str: int}): games and samples in the dataset
+    '''
+    if(names is None):
+        names = {'O': 'random', 'X': 'random'}
+    if(producers is None):
+        producers = multiprocessing.cpu_count()
+
+    settings = {
+        'size': size,
+        'player_o': names['O'],
+        'player_x': names['X'],
+        'start': start,
+        'backend': backend,
+        'time': time_limit,
+        'producers': producers,
+        'shard_size': shard_size,
+        'seed': seed,
+    }
+    load_settings(directory, settings)
+
+    tasks = [(directory, producer, producers, games, settings) for producer in range(producers)]
+    if(producers <= 1):
+        states = [produce(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(producers) as pool:
+            states = pool.map(produce, tasks, 1)
+
+    return {
+        'games': sum(state['games'] for state in states),
+        'samples': sum(state['samples'] for state in states),
+    }
+
+def open_dataset(directory):
+    '''
+    Maps the shards of a dataset for reading
+
+    ARGS:
+        directory (str): dataset directory
+    RETURNS:
+        ([np.memmap]): read only view of the written samples of every shard, producer by producer
+    '''
+    with open(os.path.join(directory, MANIFEST)) as f:
+        settings = json.load(f)
+
+    shards = []
+    for producer in range(settings['producers']):
+        state = read_checkpoint(directory, producer)
+        for shard in range(state['shard'] + 1):
+            rows = state['rows'] if shard == state['shard'] else settings['shard_size']
+            if(rows):
+                shards.append(np.load(shard_path(directory, producer, shard), mmap_mode='r')[:rows])
+    return shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play headless games and write labelled positions to sharded .npy files')
+    parser.add_argument('directory', help='dataset directory, an existing dataset is carried on with')
+    parser.add_argument('-n', '--games', type=int, default=1000, help='total number of games in the dataset')
+    parser.add_argument('--size', type=int, default=8, help='board size')
+    parser.add_argument('--start', choices=['O', 'X'], default='O', help='player that moves first')
+    parser.add_argument('--backend', default='grid', help='board backend to play on')
+    parser.add_argument('-O', '--player-o', default='random', help='player type for O (random, ai or mcts)')
+    parser.add_argument('-X', '--player-x', default='random', help='player type for X (random, ai or mcts)')
+    parser.add_argument('--time', type=float, default=0.1, help='seconds per move for ai and mcts players')
+    parser.add_argument('-p', '--producers', type=int, default=None, help='producer processes (default: one per core)')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='samples in each shard file')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    args = parser.parse_args()
+
+    names = {'O': args.player_o, 'X': args.player_x}
+
+    start = time.perf_counter()
+    totals = generate(args.directory, args.games, args.size, names, args.start, args.backend, args.time,
+                      args.producers, args.shard_size, args.seed)
+    totals['seconds'] = time.perf_counter() - start
+    print(json.dumps(totals, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import time
+
+from ai import SearchTimeout, other_player
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from zobrist import position_key
+
+#largest number of empty squares solve accepts by default
+MAX_EMPTIES = 20
+
+#with more empty squares than this moves get ordered by the opponent's mobility, below it parity order is cheaper
+FASTEST_FIRST_EMPTIES = 7
+
+
+class EndgameSolver:
+    '''
+    Exact solver for positions near the end of the game
+
+    Searches every line to the end of the game with alpha-beta on the final disc difference. Passing and the end
+    of the game follow gameLoop: a player with no moves passes and the game ends when both players have no moves.
+    Empty squares are kept in a list ordered by parity, squares in quadrants with an odd number of empty squares
+    first, and with enough squares left moves are ordered fastest first (fewest replies for the opponent).
+    Results go in the solver's own transposition table so they never mix with heuristic search scores.
+
+    Attributes:
+        max_empties int: largest number of empty squares accepted
+        table TranspositionTable: exact results for positions solved so far
+        nodes int: number of nodes searched by the last solve
+        elapsed float: seconds spent on the last solve
+
+    Methods:
+        solve(board, player, deadline): returns the exact final disc difference for player and the best move
+        choose_move(board, player): returns the best move so the solver can be used as a player
+        get_stats(): returns a dict with the statistics of the last solve
+    '''
+    def __init__(self, max_empties=MAX_EMPTIES, table_size=1 << 16):
+        '''
+        Constructor
+
+        ARGS:
+            max_empties (int): largest number of empty squares accepted
+            table_size (int): number of buckets in the transposition table
+        '''
+        self.max_empties = max_empties
+        self.table = TranspositionTable(table_size)
+
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.deadline = None
+
+    def solve(self, board, player, deadline=None):
+        '''
+        Solves a position exactly
+
+        ARGS:
+            board (Board): position to solve, returned unchanged
+            player (str): 'X' or 'O' for which player is to move
+            deadline (float): time.perf_counter() value to give up at, None for no limit
+        RETURNS:
+            (int, (int, int)): final disc difference (player's pieces minus the opponent's) with best play and
+                               the move that reaches it, 1 indexed, or None if player has to pass or the game is over
+        RAISES:
+            ValueError: if the board has more than max_empties empty squares
+            SearchTimeout: if the deadline passes before the position is solved
+        '''
+        start = time.perf_counter()
+        self.deadline = deadline
+        self.nodes = 0
+
+        size = board.dimensions[0]
+        empties = [(i, j) for i in range(size) for j in range(size) if not board.get_piece(i, j)]
+        if(len(empties) > self.max_empties):
+            raise ValueError(f'{len(empties)} empty squares is more than the solver accepts ({self.max_empties})')
+
+        try:
+            score, move = self.search(board, player, empties, -size * size, size * size, False)
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+        if(move is None):
+            return score, None
+        return score, (move[0] + 1, move[1] + 1)
+
+    def choose_move(self, board, player):
+        '''
+        Picks the move with the best exact result
+
+        ARGS:
+            board (Board): current position
+            player (str): 'X' or 'O' for which player is moving
+        RETURNS:
+            ((int, int)): the best move in the same 1 indexed form as get_available_moves, None if player has no moves
+        '''
+        move = self.solve(board, player)[1]
+
+        #leave piece_dirs filled for player so the move can go straight into add_piece
+        board.get_available_moves(player)
+        return move
+
+    def search(self, board, player, empties, alpha, beta, passed):
+        '''
+        Alpha-beta search to the end of the game
+
+        ARGS:
+            board (Board): current position
+            player (str): player to move
+            empties ([(int, int)]): empty squares of the position
+            alpha, beta (int, int): search window
+            passed (bool): whether the previous player passed
+        RETURNS:
+            (int, (int, int)): final disc difference for player and the best move (0 indexed, None for a pass)
+        '''
+        self.nodes += 1
+        if(self.deadline is not None and self.nodes & 127 == 0 and time.perf_counter() > self.deadline):
+            raise SearchTimeout
+
+        key = position_key(board, player)
+        entry = self.table.probe(key)
+        table_move = None
+        if(entry):
+            stored_depth, stored_score, bound, table_move = entry
+            if(bound == EXACT):
+                return stored_score, table_move
+            elif(bound == LOWER):
+                alpha = max(alpha, stored_score)
+            else:
+                beta = min(beta, stored_score)
+            if(alpha >= beta):
+                return stored_score, table_move
+
+        opponent = other_player(player)
+        moves = self.order_moves(board, player, empties, table_move)
+
+        #no moves is a pass, or the end of the game if the opponent just passed too
+        if(not moves):
+            if(passed or not empties):
+                o_num, x_num = board.get_piece_count()
+                score = o_num - x_num if player == 'O' else x_num - o_num
+                return score, None
+            score = -self.search(board, opponent, empties, -beta, -alpha, True)[0]
+            return score, None
+
+        original_alpha = alpha
+        best_score = None
+        best_move = None
+        for move in moves:
+            board.make_move(move, player)
+            remaining = [square for square in empties if square != move]
+            try:
+                #moves after the first only need proving worse than the best so far, which a null window does
+                #cheaply, and the rare move that turns out better gets searched again with the full window
+                if(best_score is None):
+                    score = -self.search(board, opponent, remaining, -beta, -alpha, False)[0]
+                else:
+                    score = -self.search(board, opponent, remaining, -alpha - 1, -alpha, False)[0]
+                    if(alpha < score < beta):
+                        score = -self.search(board, opponent, remaining, -beta, -score, False)[0]
+            finally:
+                board.unmake_move()
+
+            if(best_score is None or score > best_score):
+                best_score = score
+                best_move = move
+                if(score > alpha):
+                    alpha = score
+                    if(alpha >= beta):
+                        break
+
+        if(best_score <= original_alpha):
+            bound = UPPER
+        elif(best_score >= beta):
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(key, len(empties), best_score, bound, best_move)
+
+        return best_score, best_move
+
+    def order_moves(self, board, player, empties, first=None):
+        '''
+        Finds the legal moves among the empty squares in search order
+
+        ARGS:
+            board (Board): current position
+            player (str): player to move
+            empties ([(int, int)]): empty squares of the position
+            first ((int, int)): move to put first, usually the best move from the transposition table
+        RETURNS:
+            [(int, int)]: legal moves (0 indexed) with first, then parity order or fastest first
+        '''
+        size = board.dimensions[0]
+        half = size // 2
+
+        #count the empty squares in each quadrant, squares in odd quadrants go first
+        region_counts = {}
+        for i, j in empties:
+            region = (i >= half, j >= half)
+            region_counts[region] = region_counts.get(region, 0) + 1
+
+        def parity(square):
+            return 0 if region_counts[(square[0] >= half, square[1] >= half)] % 2 else 1
+
+        moves = [square for square in empties if board.is_valid_move(square[0], square[1], player)]
+        moves.sort(key=parity)
+
+        #fastest first: count the opponent's replies after each move, fewest first
+        if(len(empties) > FASTEST_FIRST_EMPTIES and len(moves) > 1):
+            opponent = other_player(player)
+            replies = {}
+            for move in moves:
+                board.make_move(move, player)
+                replies[move] = board.mobility_count(opponent)
+                board.unmake_move()
+            moves.sort(key=lambda move: replies[move])
+
+        if(first in moves):
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def get_stats(self):
+        '''
+        Statistics for the last solve
+
+        RETURNS:
+            ({str: number}): nodes searched, seconds taken, nodes per second and the transposition table statistics
+        '''
+        nps = self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+        return {'nodes': self.nodes, 'time': self.elapsed, 'nps': nps, 'table': self.table.get_stats()}
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,188 @@
+import random
+
+from board import Board
+
+
+class GameResult:
+    '''
+    Outcome of a finished game
+
+    Attributes:
+        size int: size of the board the game was played on
+        winner str: 'O', 'X' or None for a tie
+        counts (int, int): final number of O pieces followed by X pieces
+        moves [(str, (int, int))]: every turn in order as (player, move), move is 1 indexed or None for a pass
+        seed int: seed the game was played with, None if it was not seeded
+    '''
+    def __init__(self, size, winner, counts, moves, seed=None):
+        '''
+        Constructor
+
+        ARGS:
+            size (int): size of the board
+            winner (str): 'O', 'X' or None for a tie
+            counts ((int, int)): final O and X piece counts
+            moves ([(str, (int, int))]): turns played as (player, move or None)
+            seed (int): seed the game was played with
+        '''
+        self.size = size
+        self.winner = winner
+        self.counts = counts
+        self.moves = moves
+        self.seed = seed
+
+    def __repr__(self):
+        '''
+        representation method
+
+        RETURNS:
+            str: summary of the result
+        '''
+        return f'GameResult(winner={self.winner}, counts={self.counts}, turns={len(self.moves)}, seed={self.seed})'
+
+    def to_dict(self):
+        '''
+        Converts the result to plain types for json output
+
+        RETURNS:
+            (dict): the attributes of the result
+        '''
+        return {
+            'size': self.size,
+            'winner': self.winner,
+            'counts': list(self.counts),
+            'moves': [[player, list(move) if move else None] for player, move in self.moves],
+            'seed': self.seed,
+        }
+
+
+class RandomPlayer:
+    '''
+    Player which picks a uniformly random legal move, seeded so games can be replayed
+
+    Methods:
+        choose_move(board, player): returns a random move for player (1 indexed) or None if they have to pass
+    '''
+    def __init__(self, seed=None):
+        '''
+        Constructor
+
+        ARGS:
+            seed (int): seed for the move choices
+        '''
+        self.rng = random.Random(seed)
+
+    def choose_move(self, board, player):
+        '''
+        Picks a random legal move
+
+        ARGS:
+            board (Board): current position
+            player (str): 'X' or 'O' for which player is moving
+        RETURNS:
+            ((int, int)): a move from get_available_moves, None if player has no moves
+        '''
+        moves = board.get_available_moves(player)
+        if(not moves):
+            return None
+        return self.rng.choice(moves)
+
+
+def make_player(name, seed=None, time_limit=1.0):
+    '''
+    Creates a player from its name, used to build players inside worker processes
+
+    ARGS:
+        name (str): 'random', 'ai' or 'mcts'
+        seed (int): seed for players which make random choices
+        time_limit (float): seconds per move for search players
+    RETURNS:
+        (player): object with a choose_move(board, player) method
+    '''
+    if(name == 'random'):
+        return RandomPlayer(seed)
+    elif(name == 'ai'):
+        #imported here so random games don't need the search modules
+        from ai import AIPlayer
+        return AIPlayer(time_limit)
+    elif(name == 'mcts'):
+        from mcts import MCTSPlayer
+        return MCTSPlayer(time_limit, seed=seed)
+
+    raise ValueError(f'Unknown player type: {name}')
+
+def play_game(players, size=8, start='O', backend='grid', seed=None, opening=None):
+    '''
+    Plays a full game without any input or output
+
+    The turn order, pass rule and end of game checks are the same as gameLoop in main.py.
+
+    ARGS:
+        players ({str: player}): player object for 'O' and 'X', each with a choose_move(board, player) method
+        size (int): size of the board
+        start (str): 'O' or 'X' for which player moves first
+        backend (str): board backend to play on
+        seed (int): recorded in the result
+        opening ([(int, int)]): 1 indexed moves played for both sides before the players take over, None for a pass
+    RETURNS:
+        (GameResult): the winner, final counts and every turn played, opening included
+    RAISES:
+        ValueError: if a player or the opening makes an illegal move
+    '''
+    brd = Board(size, backend=backend)
+    current_player = start
+    moves = []
+
+    #variable for checking if both players have skipped their turns in order to terminate if neither player has moves
+    turn_skipped = False
+
+    for move in opening or []:
+        if(move is not None):
+            if(tuple(move) not in brd.get_available_moves(current_player)):
+                raise ValueError(f'Illegal opening move {move} for player {current_player}')
+            brd.add_piece((move[0] - 1, move[1] - 1), current_player)
+            move = tuple(move)
+        turn_skipped = move is None
+        moves.append((current_player, move))
+        current_player = 'O' if current_player == 'X' else 'X'
+
+    while(1):
+        o_num, x_num = brd.get_piece_count()
+        has_move = brd.has_any_move(current_player)
+
+        #skip the turn of a player with no moves unless the other player just skipped too
+        if(not has_move and not turn_skipped):
+            turn_skipped = True
+            moves.append((current_player, None))
+            current_player = 'O' if current_player == 'X' else 'X'
+            continue
+
+        #game over if both players skipped or either player has no pieces left
+        elif((not has_move and turn_skipped) or o_num == 0 or x_num == 0):
+            break
+
+        turn_skipped = False
+        possible_moves = brd.get_available_moves(current_player)
+
+        move = players[current_player].choose_move(brd, current_player)
+        if(move not in possible_moves):
+            raise ValueError(f'Player {current_player} chose an illegal move {move}')
+
+        #moves are 1 indexed while add_piece takes 0 indexed tuples
+        brd.add_piece((move[0] - 1, move[1] - 1), current_player)
+        moves.append((current_player, move))
+
+        current_player = 'O' if current_player == 'X' else 'X'
+
+    if(o_num > x_num):
+        winner = 'O'
+    elif(x_num > o_num):
+        winner = 'X'
+    else:
+        winner = None
+
+    return GameResult(size, winner, (o_num, x_num), moves, seed)
+
+
+if __name__ == "__main__":
+    pass
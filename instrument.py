@@ -0,0 +1,150 @@
+import functools
+import json
+import time
+
+
+#Board methods counted and timed by default
+BOARD_METHODS = ('get_available_moves', 'is_valid_move', 'turn_pieces', 'count_pieces', 'add_piece')
+
+#upper bounds in milliseconds of the turn latency histogram buckets, slower turns go in a last open bucket
+TURN_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Instrumentation:
+    '''
+    Opt-in call counters and timers for Board methods plus per-turn latency histograms
+
+    instrument(board) wraps the methods of one board object, so boards which are never instrumented run the
+    class methods untouched and pay nothing. Times are cumulative and inclusive: add_piece's time includes the
+    turn_pieces call it makes.
+
+    Attributes:
+        calls {str: int}: calls of each wrapped method
+        seconds {str: float}: total seconds spent in each wrapped method
+        turns {str: [int]}: histogram of turn latencies for each player, one count per TURN_BUCKETS bucket plus one
+        turn_seconds {str: float}: total seconds of the turns of each player
+
+    Methods:
+        instrument(board, methods): starts counting and timing methods of a board
+        uninstrument(board): puts the board's methods back
+        record_turn(player, seconds): adds a turn to a player's latency histogram
+        to_dict(): returns everything recorded as plain types
+        write_json(path): writes to_dict() to a file
+    '''
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.calls = {}
+        self.seconds = {}
+        self.turns = {}
+        self.turn_seconds = {}
+
+    def wrap(self, name, method):
+        '''
+        Builds a counting and timing wrapper around a bound method
+
+        ARGS:
+            name (str): name the method is recorded under
+            method (function): bound method to wrap
+        RETURNS:
+            (function): the wrapper
+        '''
+        calls = self.calls
+        seconds = self.seconds
+        calls.setdefault(name, 0)
+        seconds.setdefault(name, 0.0)
+        perf_counter = time.perf_counter
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                seconds[name] += perf_counter() - start
+                calls[name] += 1
+
+        return wrapper
+
+    def instrument(self, board, methods=BOARD_METHODS):
+        '''
+        Starts counting and timing methods of a board
+
+        The wrappers are set on the board object itself, calls the board makes to its own methods are counted too.
+
+        ARGS:
+            board (Board): board to instrument
+            methods ((str)): names of the methods to wrap
+        '''
+        for name in methods:
+            if(name not in board.__dict__):
+                setattr(board, name, self.wrap(name, getattr(board, name)))
+
+    def uninstrument(self, board, methods=BOARD_METHODS):
+        '''
+        Puts the class methods of a board back
+
+        ARGS:
+            board (Board): instrumented board
+            methods ((str)): names of the wrapped methods
+        '''
+        for name in methods:
+            board.__dict__.pop(name, None)
+
+    def record_turn(self, player, seconds):
+        '''
+        Adds a turn to a player's latency histogram
+
+        ARGS:
+            player (str): player or other label the turn is recorded under
+            seconds (float): how long the turn took
+        '''
+        histogram = self.turns.setdefault(player, [0] * (len(TURN_BUCKETS) + 1))
+        milliseconds = seconds * 1000
+        bucket = 0
+        while(bucket < len(TURN_BUCKETS) and milliseconds > TURN_BUCKETS[bucket]):
+            bucket += 1
+        histogram[bucket] += 1
+        self.turn_seconds[player] = self.turn_seconds.get(player, 0.0) + seconds
+
+    def to_dict(self):
+        '''
+        Gets everything recorded as plain types for json output
+
+        RETURNS:
+            (dict): 'methods' with calls, total seconds and mean microseconds per method and 'turns' with the turn
+                    count, total seconds and histogram (keyed by bucket upper bound in ms) for each player
+        '''
+        methods = {}
+        for name, calls in self.calls.items():
+            methods[name] = {
+                'calls': calls,
+                'seconds': self.seconds[name],
+                'mean_us': self.seconds[name] / calls * 1e6 if calls else 0.0,
+            }
+
+        labels = [f'<={bound}ms' for bound in TURN_BUCKETS] + [f'>{TURN_BUCKETS[-1]}ms']
+        turns = {}
+        for player, histogram in self.turns.items():
+            turns[player] = {
+                'count': sum(histogram),
+                'seconds': self.turn_seconds[player],
+                'histogram': dict(zip(labels, histogram)),
+            }
+
+        return {'methods': methods, 'turns': turns}
+
+    def write_json(self, path):
+        '''
+        Writes everything recorded to a json file
+
+        ARGS:
+            path (str): file to write
+        '''
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+
+if __name__ == "__main__":
+    pass
@@ -1,14 +1,30 @@
+import argparse
+import cProfile
+import time
+
 from board import Board
+from sparse import SPARSE_SIZE
 from piece import Grid_Point
+from ai import AIPlayer
+from instrument import Instrumentation
 
 #variable controlling board size
 size = 8
 current_player = 'O'
+
+#players the computer plays for ('', 'O', 'X' or 'OX') and its time budget per move in seconds
+computer_players = ''
+computer_time = 1.0
+
+#Instrumentation recording board method timings and turn latencies, None when instrumentation is off
+instrumentation = None
 def main():
     #create board and current player string
     selection = 0
     global size
     global current_player
+    global computer_players
+    global computer_time
 
     #loop until player starts game
     while(selection != '1'):
@@ -56,15 +72,42 @@ def main():
             else:
                 current_player = inp
 
+            inp = input("Please enter which players the computer plays: none, O, X or both (default none): ").upper()
+            if(inp == 'O' or inp == 'X'):
+                computer_players = inp
+            elif(inp == 'BOTH'):
+                computer_players = 'OX'
+            else:
+                computer_players = ''
+
+            if(computer_players):
+                inp = input("Please enter the computer's time per move in seconds (default 1): ")
+                try:
+                    computer_time = float(inp)
+                    if(computer_time <= 0):
+                        raise ValueError
+                except ValueError:
+                    print("Invalid time entered, set to default of 1")
+                    computer_time = 1.0
+
         else:
             print("Unknown selection, please choose again \n")
             pass
 
         input("Input any key to continue: ")
 
-    #create the board
+    #create the board, the computer's search is much faster on the bitboard backend
+    #and large boards without the computer only keep their occupied cells
     global brd
-    brd = Board(size)
+    if(computer_players):
+        brd = Board(size, backend='bitboard')
+    elif(size >= SPARSE_SIZE):
+        brd = Board(size, backend='sparse')
+    else:
+        brd = Board(size)
+
+    if(instrumentation):
+        instrumentation.instrument(brd)
 
     #enter the main game loop
     gameLoop()
@@ -73,6 +116,10 @@ def gameLoop():
     global current_player 
     global brd
     
+    #only allocate the search (and its transposition table) when the computer plays
+    computer = None
+    if(computer_players):
+        computer = AIPlayer(computer_time)
     
     #variable for checking if both players have skipped their turns in order to terminate if neither player has moves
     turn_skipped = False
@@ -86,11 +133,11 @@ def gameLoop():
         #get the current piece count
         o_num, x_num = brd.get_piece_count()
 
-        #get all possible moves for the current player
-        possible_moves = brd.get_available_moves(current_player)
+        #check whether the current player can move at all, which stops at the first move found
+        has_move = brd.has_any_move(current_player)
 
         #if a player has no possible moves and the previous player did not skip their turn, skip the current_players turn
-        if(not possible_moves and not turn_skipped):
+        if(not has_move and not turn_skipped):
             turn_skipped = True
             print("\nTurn Skipped!\n")
             if current_player == 'X':
@@ -101,7 +148,7 @@ def gameLoop():
             continue
 
         #if the previous player has skipped their turn or either play has 0 pieces, the game is over so check who wins
-        elif((not possible_moves and turn_skipped) or o_num == 0 or x_num == 0):
+        elif((not has_move and turn_skipped) or o_num == 0 or x_num == 0):
             print(f'Current Score: {o_num} O\'s, {x_num} X\'s \n')
             if(o_num < x_num):
                 print('Player X wins!')
@@ -116,6 +163,9 @@ def gameLoop():
         #resset turn skipped to false if a player has a legal move
         turn_skipped = False
 
+        #get all possible moves for the current player, this also fills in the flip directions add_piece uses
+        possible_moves = brd.get_available_moves(current_player)
+
         #print out the player, current score, and possible moves
         print(f'Current Score: {o_num} O\'s, {x_num} X\'s \n')
 
@@ -126,6 +176,16 @@ def gameLoop():
 
         desired_position = ()
         allowed = False
+        turn_start = time.perf_counter()
+
+        #let the computer pick the move if it plays for the current player
+        if(current_player in computer_players):
+            move = computer.choose_move(brd, current_player)
+            stats = computer.get_stats()
+            print(f'Computer plays {move}: searched {stats["nodes"]} nodes to depth {stats["depth"]} in {stats["time"]:.2f}s ({stats["nps"]:.0f} nodes/s)\n')
+
+            desired_position = Grid_Point(move[0] - 1, move[1] - 1)
+            allowed = True
 
         #get a legal input for a position
         while(not allowed):
@@ -156,6 +216,9 @@ def gameLoop():
         #add the current player's piece to their desired position. Also handles flipping pieces
         brd.add_piece(desired_position, current_player)
 
+        if(instrumentation):
+            instrumentation.record_turn(current_player, time.perf_counter() - turn_start)
+
         #switch the current player
         if current_player == 'X':
             current_player = 'O'
@@ -166,5 +229,32 @@ def gameLoop():
 
 
 
+def run():
+    global instrumentation
+
+    parser = argparse.ArgumentParser(description='Play Reversi in the terminal')
+    parser.add_argument('--stats', metavar='PATH', help='count and time board operations and turns, written to this json file on exit')
+    parser.add_argument('--profile', metavar='PATH', help='run under cProfile and dump the stats to this file for pstats')
+    args = parser.parse_args()
+
+    if(args.stats):
+        instrumentation = Instrumentation()
+
+    profiler = None
+    if(args.profile):
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    #the game ends with quit(), so the output is written on the way out
+    try:
+        main()
+    finally:
+        if(profiler):
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if(instrumentation):
+            instrumentation.write_json(args.stats)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run()
\ No newline at end of file
@@ -0,0 +1,389 @@
+import math
+import multiprocessing
+import random
+import time
+
+from ai import other_player
+from board import Board
+from zobrist import position_key
+
+
+def encode_position(board):
+    '''
+    Packs the pieces on a board to send to a worker process
+
+    ARGS:
+        board (Board): board to encode
+    RETURNS:
+        (bytes): the position from Board.to_bytes, which holds the board size
+    '''
+    return board.to_bytes()
+
+def decode_position(cells, backend='bitboard'):
+    '''
+    Builds a board from encode_position's output
+
+    ARGS:
+        cells (bytes): packed position
+        backend (str): backend for the new board
+    RETURNS:
+        (Board): board with the encoded pieces
+    '''
+    return Board.from_bytes(cells, backend)
+
+def random_playout(board, player, rng, guided=False):
+    '''
+    Plays random moves until the game is over and takes them back again, following gameLoop's pass and game over rules
+
+    ARGS:
+        board (Board): position to play out from, returned unchanged
+        player (str): 'X' or 'O' for which player moves first
+        rng (random.Random): source of randomness
+        guided (bool): if true, a corner is always taken when one is available
+    RETURNS:
+        (str): winner 'O' or 'X', None for a tie
+    '''
+    last = board.dimensions[0]
+    corners = ((1, 1), (1, last), (last, 1), (last, last))
+    played = 0
+    turn_skipped = False
+
+    while(1):
+        moves = board.get_available_moves(player)
+        if(not moves):
+            if(turn_skipped):
+                break
+            turn_skipped = True
+        else:
+            turn_skipped = False
+            move = None
+            if(guided):
+                for corner in corners:
+                    if(corner in moves):
+                        move = corner
+                        break
+            if(move is None):
+                move = rng.choice(moves)
+            board.make_move((move[0] - 1, move[1] - 1), player)
+            played += 1
+        player = other_player(player)
+
+    o_num, x_num = board.get_piece_count()
+    for n in range(played):
+        board.unmake_move()
+
+    if(o_num > x_num):
+        return 'O'
+    elif(x_num > o_num):
+        return 'X'
+    return None
+
+def playout_task(task):
+    '''
+    Runs one playout in a worker process
+
+    ARGS:
+        task (tuple): (cells, player, seed, guided) with the position from encode_position
+    RETURNS:
+        (str): winner 'O' or 'X', None for a tie
+    '''
+    cells, player, seed, guided = task
+    return random_playout(decode_position(cells), player, random.Random(seed), guided)
+
+
+class Node:
+    '''
+    Node of the search tree, one per position reached
+
+    Attributes:
+        move (int, int): 0 indexed move leading here from the parent, None for a pass or the root
+        player str: 'X' or 'O' for which player is to move in this position
+        parent Node: node this one was reached from, None for the root
+        children {move: Node}: nodes expanded so far
+        untried [(int, int)]: moves not expanded yet, [None] when player has to pass
+        visits int: playouts through this node
+        wins float: playouts through this node won by the parent's player to move (ties count half)
+        key int: zobrist hash of the position with the side to move
+    '''
+    __slots__ = ('move', 'player', 'parent', 'children', 'untried', 'visits', 'wins', 'key')
+
+    def __init__(self, board, player, move=None, parent=None):
+        '''
+        Constructor, works out the moves for the position the board is in
+
+        ARGS:
+            board (Board): board in this node's position
+            player (str): player to move
+            move ((int, int)): move leading here
+            parent (Node): node this one was reached from
+        '''
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = {}
+        self.visits = 0
+        self.wins = 0.0
+        self.key = position_key(board, player)
+
+        #a player with no moves passes unless the opponent has none either, which ends the game
+        self.untried = [(i - 1, j - 1) for i, j in board.get_available_moves(player)]
+        if(not self.untried and board.has_any_move(other_player(player))):
+            self.untried = [None]
+
+    def select_child(self, exploration):
+        '''
+        Picks the child with the best UCT score
+
+        ARGS:
+            exploration (float): weight of the exploration term
+        RETURNS:
+            (Node): chosen child
+        '''
+        log_visits = math.log(self.visits)
+        best = None
+        best_score = -1.0
+        for child in self.children.values():
+            score = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            if(score > best_score):
+                best = child
+                best_score = score
+        return best
+
+
+class MCTSPlayer:
+    '''
+    Computer player which searches with Monte Carlo tree search using UCT
+
+    Positions are walked with Board.get_available_moves, make_move and unmake_move. Playouts follow the same pass
+    and game over rules as gameLoop and can run in a pool of worker processes, in which case a batch of leaves is
+    picked at a time with a virtual loss on their paths so the batch spreads over the tree. The subtree for the
+    position reached is kept between moves.
+
+    Attributes:
+        time_limit float: seconds allowed per move
+        max_playouts int: playouts allowed per move, None for no limit
+        workers int: worker processes for playouts, 1 runs them in this process
+        exploration float: UCT exploration weight
+        guided bool: playouts always take an available corner
+        playouts int: playouts run for the last move
+        reused int: playouts kept from earlier searches in the root for the last move
+        elapsed float: seconds spent on the last move
+
+    Methods:
+        choose_move(board, player): returns the best move found for player (1 indexed) or None if they have to pass
+        get_stats(): returns a dict with the search statistics of the last move
+        close(): shuts down the worker processes
+    '''
+    def __init__(self, time_limit=1.0, max_playouts=None, workers=1, exploration=1.4, guided=False, seed=None):
+        '''
+        Constructor
+
+        ARGS:
+            time_limit (float): seconds allowed per move
+            max_playouts (int): playouts allowed per move, None for no limit
+            workers (int): worker processes for playouts
+            exploration (float): UCT exploration weight
+            guided (bool): playouts always take an available corner
+            seed (int): seed for the search's random choices
+        '''
+        self.time_limit = time_limit
+        self.max_playouts = max_playouts
+        self.workers = workers
+        self.exploration = exploration
+        self.guided = guided
+        self.rng = random.Random(seed)
+
+        self.root = None
+        self.pool = None
+
+        self.playouts = 0
+        self.reused = 0
+        self.elapsed = 0.0
+
+    def choose_move(self, board, player):
+        '''
+        Searches for the best move for a player
+
+        The board is returned in the state it was given in and piece_dirs is left filled for player,
+        so the move can be played with add_piece straight away.
+
+        ARGS:
+            board (Board): current position
+            player (str): 'X' or 'O' for which player is moving
+        RETURNS:
+            ((int, int)): the chosen move in the same 1 indexed form as get_available_moves, None if player has no moves
+        '''
+        start = time.perf_counter()
+        deadline = start + self.time_limit
+        self.playouts = 0
+
+        self.root = self.find_root(board, player)
+        self.reused = self.root.visits
+
+        #nothing to search with one move or none
+        if(len(self.root.untried) + len(self.root.children) > 1):
+            while(time.perf_counter() < deadline):
+                if(self.max_playouts is not None and self.playouts >= self.max_playouts):
+                    break
+                if(self.workers > 1):
+                    self.search_batch(board)
+                else:
+                    self.search_once(board)
+
+        best_move = None
+        if(self.root.children):
+            best = max(self.root.children.values(), key=lambda child: child.visits)
+            best_move = best.move
+        elif(self.root.untried):
+            best_move = self.root.untried[0]
+
+        #keep the subtree after the chosen move for the next search
+        if(best_move in self.root.children):
+            self.root = self.root.children[best_move]
+            self.root.parent = None
+        else:
+            self.root = None
+
+        #leave piece_dirs as it was for the root position
+        board.get_available_moves(player)
+
+        self.elapsed = time.perf_counter() - start
+        if(best_move is None):
+            return None
+        return (best_move[0] + 1, best_move[1] + 1)
+
+    def find_root(self, board, player):
+        '''
+        Finds the current position in the tree kept from the last search, or starts a new tree
+
+        ARGS:
+            board (Board): current position
+            player (str): player to move
+        RETURNS:
+            (Node): root for the search
+        '''
+        key = position_key(board, player)
+        if(self.root is not None):
+            #the position is the kept root itself or one of its children after the opponent's move or pass
+            if(self.root.key == key):
+                return self.root
+            for child in self.root.children.values():
+                if(child.key == key):
+                    child.parent = None
+                    return child
+        return Node(board, player)
+
+    def select(self, board):
+        '''
+        Walks down the tree from the root, playing the moves on the board, and expands one new node
+
+        ARGS:
+            board (Board): board in the root position
+        RETURNS:
+            ([Node], int): the path from the root to the new leaf and the number of moves played on the board
+        '''
+        node = self.root
+        path = [node]
+        played = 0
+
+        while(not node.untried and node.children):
+            node = node.select_child(self.exploration)
+            if(node.move is not None):
+                board.make_move(node.move, node.parent.player)
+                played += 1
+            path.append(node)
+
+        if(node.untried):
+            move = node.untried.pop(self.rng.randrange(len(node.untried)))
+            if(move is not None):
+                board.make_move(move, node.player)
+                played += 1
+            child = Node(board, other_player(node.player), move, node)
+            node.children[move] = child
+            path.append(child)
+
+        return path, played
+
+    def backpropagate(self, path, winner, add_visit=True):
+        '''
+        Adds a playout result to every node on a path
+
+        ARGS:
+            path ([Node]): nodes from the root to the leaf the playout started from
+            winner (str): 'O', 'X' or None for a tie
+            add_visit (bool): false when the visits were already added as a virtual loss
+        '''
+        for node in path:
+            if(add_visit):
+                node.visits += 1
+            #a node's wins are for the player who chose to move into it
+            if(node.parent is not None):
+                if(winner is None):
+                    node.wins += 0.5
+                elif(winner == node.parent.player):
+                    node.wins += 1
+
+    def search_once(self, board):
+        '''
+        Runs one select, expand, playout and backpropagate iteration in this process
+
+        ARGS:
+            board (Board): board in the root position, returned unchanged
+        '''
+        path, played = self.select(board)
+        winner = random_playout(board, path[-1].player, self.rng, self.guided)
+        for n in range(played):
+            board.unmake_move()
+
+        self.backpropagate(path, winner)
+        self.playouts += 1
+
+    def search_batch(self, board):
+        '''
+        Picks a batch of leaves and runs their playouts in the worker pool
+
+        ARGS:
+            board (Board): board in the root position, returned unchanged
+        '''
+        if(self.pool is None):
+            self.pool = multiprocessing.Pool(self.workers)
+
+        paths = []
+        tasks = []
+        for n in range(self.workers * 4):
+            path, played = self.select(board)
+            tasks.append((encode_position(board), path[-1].player, self.rng.getrandbits(32), self.guided))
+            for m in range(played):
+                board.unmake_move()
+
+            #virtual loss: count the visit now so the next selections in the batch look elsewhere
+            for node in path:
+                node.visits += 1
+            paths.append(path)
+
+        for path, winner in zip(paths, self.pool.map(playout_task, tasks)):
+            self.backpropagate(path, winner, add_visit=False)
+        self.playouts += len(tasks)
+
+    def get_stats(self):
+        '''
+        Statistics for the last move searched
+
+        RETURNS:
+            ({str: number}): playouts run, playouts reused from the kept tree, seconds taken and playouts per second
+        '''
+        pps = self.playouts / self.elapsed if self.elapsed > 0 else 0.0
+        return {'playouts': self.playouts, 'reused': self.reused, 'time': self.elapsed, 'playouts_per_second': pps}
+
+    def close(self):
+        '''
+        Shuts down the worker processes
+        '''
+        if(self.pool is not None):
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+if __name__ == "__main__":
+    pass
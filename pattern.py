@@ -0,0 +1,429 @@
+from board import transform_square
+from compact import CODES
+
+
+#lines longer than this are split into segments of SEGMENT_LENGTH squares starting at each corner
+MAX_LINE = 10
+SEGMENT_LENGTH = 8
+
+#weights used to fill the pattern tables
+CORNER_WEIGHT = 25
+X_SQUARE_WEIGHT = 12
+C_SQUARE_WEIGHT = 8
+STABLE_EDGE_WEIGHT = 4
+EDGE_WEIGHT = 1
+STABLE_DIAGONAL_WEIGHT = 2
+
+#weights of the mobility and frontier terms
+MOBILITY_WEIGHT = 3
+FRONTIER_WEIGHT = 1
+
+#cache of the patterns for each board size and of the tables for each kind of pattern and length
+_patterns = {}
+_pattern_tables = {}
+_neighbours = {}
+
+
+def get_patterns(size):
+    '''
+    Gets the lines of squares scored by the pattern tables for a board size
+
+    Every pattern lists its squares starting from a corner, so the same table serves the pattern at all 4 corners.
+    Edges and diagonals run the full length of the board up to MAX_LINE squares, on larger boards they are
+    SEGMENT_LENGTH square segments from each corner.
+
+    ARGS:
+        size (int): size of the square board
+    RETURNS:
+        [(str, bool, (int))]: kind ('edge', 'corner' or 'diagonal'), whether the line ends in a second corner,
+                              and the square numbers (i * size + j) in order
+    '''
+    if(size in _patterns):
+        return _patterns[size]
+
+    def line(cells, sym):
+        return tuple(y * size + x for y, x in (transform_square(i, j, size, sym) for i, j in cells))
+
+    full = size <= MAX_LINE
+    length = size if full else SEGMENT_LENGTH
+    patterns = []
+
+    #the 3 by 3 block in each corner, symmetries 0, 2, 4 and 6 take the top left corner to each corner
+    block = [(a, b) for a in range(3) for b in range(3)]
+    for sym in (0, 2, 4, 6):
+        patterns.append(('corner', False, line(block, sym)))
+
+    #whole edges need one line per edge, segments one per corner and direction
+    edge = [(0, k) for k in range(length)]
+    for sym in ((0, 1, 6, 7) if full else range(8)):
+        patterns.append(('edge', full, line(edge, sym)))
+
+    diagonal = [(k, k) for k in range(length)]
+    for sym in ((0, 4) if full else (0, 2, 4, 6)):
+        patterns.append(('diagonal', full, line(diagonal, sym)))
+
+    _patterns[size] = patterns
+    return patterns
+
+def get_neighbours(size):
+    '''
+    Gets the squares next to every square for a board size
+
+    ARGS:
+        size (int): size of the square board
+    RETURNS:
+        [(int)]: neighbours[square] holds the square numbers of up to 8 neighbours
+    '''
+    if(size in _neighbours):
+        return _neighbours[size]
+
+    neighbours = []
+    for i in range(size):
+        for j in range(size):
+            neighbours.append(tuple((i + di) * size + j + dj for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                                    if (di or dj) and 0 <= i + di < size and 0 <= j + dj < size))
+
+    _neighbours[size] = neighbours
+    return neighbours
+
+def score_line(kind, codes, full):
+    '''
+    Heuristic score of one arrangement of a pattern, from O's point of view
+
+    Corners are worth CORNER_WEIGHT and an X-square next to an empty corner costs X_SQUARE_WEIGHT (corner patterns).
+    Runs of discs along an edge or diagonal from an owned corner can never be flipped and are worth the stable
+    weights, a C-square next to an empty corner costs C_SQUARE_WEIGHT and other edge discs are worth EDGE_WEIGHT.
+
+    ARGS:
+        kind (str): 'edge', 'corner' or 'diagonal'
+        codes ([int]): cell codes (0 empty, 1 O, 2 X) in pattern order, a corner first
+        full (bool): whether the last square is a corner too
+    RETURNS:
+        (int): score, positive is good for O
+    '''
+    score = 0
+    for code, sign in ((1, 1), (2, -1)):
+        if(kind == 'corner'):
+            if(codes[0] == code):
+                score += sign * CORNER_WEIGHT
+            elif(codes[0] == 0 and codes[4] == code):
+                score -= sign * X_SQUARE_WEIGHT
+            continue
+
+        ends = [(0, 1)]
+        if(full):
+            ends.append((len(codes) - 1, -1))
+
+        stable = set()
+        for corner, step in ends:
+            if(codes[corner] == code):
+                k = corner + step
+                while(0 <= k < len(codes) and codes[k] == code):
+                    stable.add(k)
+                    k += step
+            elif(codes[corner] == 0 and kind == 'edge' and codes[corner + step] == code):
+                score -= sign * C_SQUARE_WEIGHT
+
+        if(kind == 'edge'):
+            corners = {end[0] for end in ends}
+            others = sum(1 for k, value in enumerate(codes) if value == code and k not in stable and k not in corners)
+            score += sign * (STABLE_EDGE_WEIGHT * len(stable) + EDGE_WEIGHT * others)
+        else:
+            score += sign * STABLE_DIAGONAL_WEIGHT * len(stable)
+
+    return score
+
+def get_pattern_table(kind, length, full):
+    '''
+    Gets the table of scores for every arrangement of a pattern
+
+    ARGS:
+        kind (str): 'edge', 'corner' or 'diagonal'
+        length (int): number of squares in the pattern
+        full (bool): whether the last square is a corner too
+    RETURNS:
+        [int]: table[index] is score_line for the arrangement whose base 3 digits (first square lowest) are index
+    '''
+    key = (kind, length, full)
+    if(key in _pattern_tables):
+        return _pattern_tables[key]
+
+    table = []
+    codes = [0] * length
+    for index in range(3 ** length):
+        table.append(score_line(kind, codes, full))
+
+        #count up in base 3
+        k = 0
+        while(k < length):
+            codes[k] += 1
+            if(codes[k] < 3):
+                break
+            codes[k] = 0
+            k += 1
+
+    _pattern_tables[key] = table
+    return table
+
+
+class PatternEvaluator:
+    '''
+    Static evaluation from pattern table lookups, kept up to date as the board changes
+
+    The evaluator attaches itself to a board as its listener, so every placed, removed or flipped piece updates
+    the base 3 index of the patterns through that square along with the counts behind the mobility and frontier
+    terms. Scoring a position is then one table lookup per pattern. Mobility is the exact move count when the
+    board tracks mobility, otherwise potential mobility: the empty squares next to an opponent's piece. Frontier
+    discs are pieces next to an empty square. A board has one listener, so attaching to a board takes over from
+    any earlier listener, and the evaluator follows one board at a time.
+
+    Can be passed as the evaluate function of ai.AIPlayer.
+
+    Attributes:
+        board Board: board the evaluator is attached to, None before the first call
+        indices [int]: base 3 index of every pattern in get_patterns order
+        mobility_weight int: weight of the mobility difference
+        frontier_weight int: weight of the frontier difference
+        debug bool: if true, every evaluation checks the incremental state against a full rescan
+
+    Methods:
+        attach(board): scans a board and starts following its changes
+        detach(): stops following the board
+        piece_set(square, old, player), piece_flipped(square, player): listener calls made by the board
+        check(): debug check that the incremental state matches a full rescan
+    '''
+    def __init__(self, mobility_weight=MOBILITY_WEIGHT, frontier_weight=FRONTIER_WEIGHT, debug=False):
+        '''
+        Constructor
+
+        ARGS:
+            mobility_weight (int): weight of the mobility difference
+            frontier_weight (int): weight of the frontier difference
+            debug (bool): turns on the consistency checks
+        '''
+        self.mobility_weight = mobility_weight
+        self.frontier_weight = frontier_weight
+        self.debug = debug
+        self.board = None
+
+    def __call__(self, board, player):
+        '''
+        Scores a position from a player's point of view
+
+        ARGS:
+            board (Board): board to score, attached to on the first call
+            player (str): 'X' or 'O' for which player the score is for
+        RETURNS:
+            (int): higher is better for player
+        '''
+        if(board.listener is not self):
+            self.attach(board)
+        if(self.debug):
+            self.check()
+
+        score = 0
+        for table, index in zip(self.tables, self.indices):
+            score += table[index]
+
+        if(board.track_mobility):
+            mobility = len(board.legal_moves['O']) - len(board.legal_moves['X'])
+        else:
+            mobility = self.potential[1] - self.potential[2]
+        score += self.mobility_weight * mobility - self.frontier_weight * (self.frontier[1] - self.frontier[2])
+
+        if(player == 'X'):
+            return -score
+        return score
+
+    def scan(self, board):
+        '''
+        Works out the evaluator's state for a board from scratch
+
+        ARGS:
+            board (Board): board to scan
+        RETURNS:
+            (tuple): (cells, indices, empty neighbour counts, adjacency counts, potential mobility, frontier)
+        '''
+        size = board.dimensions[0]
+        neighbours = get_neighbours(size)
+
+        cells = [0] * (size * size)
+        for square, piece in board.get_pieces():
+            cells[square] = CODES[piece]
+
+        indices = []
+        for kind, full, squares in get_patterns(size):
+            indices.append(sum(cells[square] * 3 ** k for k, square in enumerate(squares)))
+
+        #adjacent[code][square] counts the neighbours of square holding a piece with that code
+        empty_neighbours = [sum(1 for n in neighbours[square] if not cells[n]) for square in range(size * size)]
+        adjacent = [None, [0] * (size * size), [0] * (size * size)]
+        for square in range(size * size):
+            for n in neighbours[square]:
+                if(cells[n]):
+                    adjacent[cells[n]][square] += 1
+
+        #potential[code] counts the empty squares next to the opponent, frontier[code] the pieces next to an empty square
+        potential = [0, 0, 0]
+        frontier = [0, 0, 0]
+        for square in range(size * size):
+            if(not cells[square]):
+                for code in (1, 2):
+                    if(adjacent[3 - code][square]):
+                        potential[code] += 1
+            elif(empty_neighbours[square]):
+                frontier[cells[square]] += 1
+
+        return cells, indices, empty_neighbours, adjacent, potential, frontier
+
+    def attach(self, board):
+        '''
+        Scans a board and starts following its changes
+
+        ARGS:
+            board (Board): board to follow
+        '''
+        self.detach()
+
+        size = board.dimensions[0]
+        patterns = get_patterns(size)
+        self.tables = [get_pattern_table(kind, len(squares), full) for kind, full, squares in patterns]
+
+        #every square lists the patterns through it with the power of 3 of its place in them
+        self.terms = [[] for square in range(size * size)]
+        for number, (kind, full, squares) in enumerate(patterns):
+            for k, square in enumerate(squares):
+                self.terms[square].append((number, 3 ** k))
+
+        self.neighbours = get_neighbours(size)
+        self.cells, self.indices, self.empty_neighbours, self.adjacent, self.potential, self.frontier = self.scan(board)
+
+        self.board = board
+        board.listener = self
+
+    def detach(self):
+        '''
+        Stops following the board
+        '''
+        if(self.board is not None and self.board.listener is self):
+            self.board.listener = None
+        self.board = None
+
+    def piece_set(self, square, old, player):
+        '''
+        Listener call for a piece placed, removed or replaced
+
+        ARGS:
+            square (int): square number of the change
+            old (str): piece there before, None if it was empty
+            player (str): piece there now, None if it is empty
+        '''
+        old_code = CODES[old] if old else 0
+        new_code = CODES[player] if player else 0
+        if(old_code == new_code):
+            return
+        if(old_code and new_code):
+            self.piece_flipped(square, player)
+            return
+
+        indices = self.indices
+        for number, power in self.terms[square]:
+            indices[number] += (new_code - old_code) * power
+
+        cells = self.cells
+        empty_neighbours = self.empty_neighbours
+        potential = self.potential
+        frontier = self.frontier
+
+        if(new_code):
+            adjacent = self.adjacent[new_code]
+
+            #the square is no longer an empty square next to anyone's pieces
+            if(self.adjacent[1][square]):
+                potential[2] -= 1
+            if(self.adjacent[2][square]):
+                potential[1] -= 1
+
+            for n in self.neighbours[square]:
+                empty_neighbours[n] -= 1
+                if(not empty_neighbours[n] and cells[n]):
+                    frontier[cells[n]] -= 1
+                if(not cells[n] and not adjacent[n]):
+                    potential[3 - new_code] += 1
+                adjacent[n] += 1
+
+            cells[square] = new_code
+            if(empty_neighbours[square]):
+                frontier[new_code] += 1
+        else:
+            adjacent = self.adjacent[old_code]
+
+            if(empty_neighbours[square]):
+                frontier[old_code] -= 1
+            cells[square] = 0
+
+            for n in self.neighbours[square]:
+                adjacent[n] -= 1
+                if(not cells[n] and not adjacent[n]):
+                    potential[3 - old_code] -= 1
+                if(not empty_neighbours[n] and cells[n]):
+                    frontier[cells[n]] += 1
+                empty_neighbours[n] += 1
+
+            if(self.adjacent[1][square]):
+                potential[2] += 1
+            if(self.adjacent[2][square]):
+                potential[1] += 1
+
+    def piece_flipped(self, square, player):
+        '''
+        Listener call for a piece flipped to the other player
+
+        ARGS:
+            square (int): square number of the piece
+            player (str): player the piece belongs to now
+        '''
+        new_code = CODES[player]
+        old_code = 3 - new_code
+
+        #the digit goes from 1 to 2 or 2 to 1
+        change = new_code - old_code
+        indices = self.indices
+        for number, power in self.terms[square]:
+            indices[number] += change * power
+
+        self.cells[square] = new_code
+        if(self.empty_neighbours[square]):
+            self.frontier[old_code] -= 1
+            self.frontier[new_code] += 1
+
+        cells = self.cells
+        potential = self.potential
+        old_adjacent = self.adjacent[old_code]
+        new_adjacent = self.adjacent[new_code]
+        for n in self.neighbours[square]:
+            old_adjacent[n] -= 1
+            if(not cells[n]):
+                if(not old_adjacent[n]):
+                    potential[new_code] -= 1
+                if(not new_adjacent[n]):
+                    potential[old_code] += 1
+            new_adjacent[n] += 1
+
+    def check(self):
+        '''
+        Checks the incremental state against a full rescan of the board
+
+        RAISES:
+            AssertionError: if anything is out of sync
+        '''
+        expected = self.scan(self.board)
+        actual = (self.cells, self.indices, self.empty_neighbours, self.adjacent, self.potential, self.frontier)
+        names = ('cells', 'indices', 'empty neighbours', 'adjacency', 'potential mobility', 'frontier')
+        for name, want, have in zip(names, expected, actual):
+            if(want != have):
+                raise AssertionError(f'Pattern evaluator {name} out of sync with the board')
+
+
+if __name__ == "__main__":
+    pass
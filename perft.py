@@ -0,0 +1,242 @@
+import argparse
+import multiprocessing
+import sys
+import time
+
+from ai import other_player
+from board import Board
+from mcts import encode_position, decode_position
+
+
+#leaf counts from the starting position of an 8 by 8 board, passes count as a move
+REFERENCE_8 = {
+    1: 4,
+    2: 12,
+    3: 56,
+    4: 244,
+    5: 1396,
+    6: 8200,
+    7: 55092,
+    8: 390216,
+    9: 3005288,
+    10: 24571284,
+    11: 212258800,
+    12: 1939886636,
+}
+
+
+def perft(board, player, depth, passed=False, use_add_piece=False):
+    '''
+    Counts the positions reached after a number of turns
+
+    A player with no moves passes, which uses up a turn, and when both players have to pass in a row the game is
+    over and the position counts as a leaf however many turns are left, the same rules as gameLoop.
+
+    ARGS:
+        board (Board): position to count from, returned unchanged
+        player (str): 'X' or 'O' for which player is to move
+        depth (int): number of turns to play
+        passed (bool): whether the previous player passed
+        use_add_piece (bool): play moves with add_piece on copies of the board instead of make_move and unmake_move,
+                              which checks add_piece but is much slower
+    RETURNS:
+        (int): number of leaf positions
+    '''
+    if(depth == 0):
+        return 1
+
+    moves = board.get_available_moves(player)
+    if(not moves):
+        if(passed):
+            return 1
+        return perft(board, other_player(player), depth - 1, True, use_add_piece)
+
+    #the last turn only needs the moves counted
+    if(depth == 1):
+        return len(moves)
+
+    opponent = other_player(player)
+    total = 0
+    for move in moves:
+        if(use_add_piece):
+            child = board.copy(False)
+            child.get_available_moves(player)
+            child.add_piece((move[0] - 1, move[1] - 1), player)
+            total += perft(child, opponent, depth - 1, False, True)
+        else:
+            board.make_move((move[0] - 1, move[1] - 1), player)
+            total += perft(board, opponent, depth - 1, False, False)
+            board.unmake_move()
+    return total
+
+def divide(board, player, depth, use_add_piece=False):
+    '''
+    Splits a perft count by the first move
+
+    ARGS:
+        board (Board): position to count from, returned unchanged
+        player (str): 'X' or 'O' for which player is to move
+        depth (int): number of turns to play, at least 1
+        use_add_piece (bool): see perft
+    RETURNS:
+        ({(int, int): int}): leaf count under each 1 indexed first move, a pass is keyed by None
+    '''
+    moves = board.get_available_moves(player)
+    opponent = other_player(player)
+
+    if(not moves):
+        return {None: perft(board, opponent, depth - 1, True, use_add_piece)}
+
+    counts = {}
+    for move in moves:
+        board.make_move((move[0] - 1, move[1] - 1), player)
+        counts[move] = perft(board, opponent, depth - 1, False, use_add_piece)
+        board.unmake_move()
+    return counts
+
+def perft_task(task):
+    '''
+    Counts one subtree in a worker process
+
+    ARGS:
+        task (tuple): (cells, backend, player, depth, passed, use_add_piece) with the position from encode_position
+    RETURNS:
+        (int): leaf count of the subtree
+    '''
+    cells, backend, player, depth, passed, use_add_piece = task
+    return perft(decode_position(cells, backend), player, depth, passed, use_add_piece)
+
+def split_tasks(board, player, depth, split_depth, passed, use_add_piece, tasks, leaves):
+    '''
+    Walks the first turns of the tree and collects the subtrees below them as tasks
+
+    ARGS:
+        board (Board): position to split from, returned unchanged
+        player (str): player to move
+        depth (int): turns left to count
+        split_depth (int): turns to walk before handing subtrees out
+        passed (bool): whether the previous player passed
+        use_add_piece (bool): see perft
+        tasks (list): subtree tasks are appended here
+        leaves (list): one entry per leaf met while walking, for trees shallower than the split
+    '''
+    if(depth == 0 or split_depth == 0):
+        if(depth == 0):
+            leaves.append(1)
+        else:
+            tasks.append((encode_position(board), board.backend, player, depth, passed, use_add_piece))
+        return
+
+    moves = board.get_available_moves(player)
+    opponent = other_player(player)
+    if(not moves):
+        if(passed):
+            leaves.append(1)
+        else:
+            split_tasks(board, opponent, depth - 1, split_depth - 1, True, use_add_piece, tasks, leaves)
+        return
+
+    for move in moves:
+        board.make_move((move[0] - 1, move[1] - 1), player)
+        split_tasks(board, opponent, depth - 1, split_depth - 1, False, use_add_piece, tasks, leaves)
+        board.unmake_move()
+
+def parallel_perft(board, player, depth, workers=None, split_depth=2, use_add_piece=False):
+    '''
+    Runs perft with the subtrees below the first turns spread across a process pool
+
+    ARGS:
+        board (Board): position to count from, returned unchanged
+        player (str): 'X' or 'O' for which player is to move
+        depth (int): number of turns to play
+        workers (int): number of worker processes, defaults to the number of cores
+        split_depth (int): turns walked before handing subtrees to the workers, more gives smaller tasks
+        use_add_piece (bool): see perft
+    RETURNS:
+        (int): number of leaf positions, the same as perft gives
+    '''
+    if(workers is None):
+        workers = multiprocessing.cpu_count()
+
+    tasks = []
+    leaves = []
+    split_tasks(board, player, depth, split_depth, False, use_add_piece, tasks, leaves)
+
+    if(workers <= 1):
+        return len(leaves) + sum(perft_task(task) for task in tasks)
+
+    with multiprocessing.Pool(workers) as pool:
+        return len(leaves) + sum(pool.imap_unordered(perft_task, tasks))
+
+def check_backends(size, depth, backends, player='O'):
+    '''
+    Compares divide results from the starting position between backends
+
+    ARGS:
+        size (int): size of the board
+        depth (int): number of turns to play
+        backends ([str]): backends to compare, the first is the one the others are checked against
+        player (str): player to move first
+    RETURNS:
+        ([str]): a line for every first move whose count differs from the first backend's
+    '''
+    expected = divide(Board(size, backend=backends[0]), player, depth)
+    mismatches = []
+    for backend in backends[1:]:
+        counts = divide(Board(size, backend=backend), player, depth)
+        for move in sorted(set(expected) | set(counts), key=str):
+            if(expected.get(move) != counts.get(move)):
+                mismatches.append(f'{backend} {move}: {counts.get(move)} (expected {expected.get(move)} from {backends[0]})')
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description='Count positions reachable from the start to check and time move generation')
+    parser.add_argument('depth', type=int, help='number of turns to play')
+    parser.add_argument('--size', type=int, default=8, help='board size')
+    parser.add_argument('--backend', default='grid', help='board backend to count with')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='worker processes (0 for one per core)')
+    parser.add_argument('--split-depth', type=int, default=2, help='turns walked before handing subtrees to the workers')
+    parser.add_argument('--divide', action='store_true', help='print the count under each first move')
+    parser.add_argument('--add-piece', action='store_true', help='play moves with add_piece on copies instead of make_move')
+    parser.add_argument('--check-backends', nargs='+', metavar='BACKEND', help='also compare divide counts with these backends')
+    args = parser.parse_args()
+
+    brd = Board(args.size, backend=args.backend)
+    workers = args.workers or None
+
+    start = time.perf_counter()
+    if(args.divide):
+        counts = divide(brd, 'O', args.depth, args.add_piece)
+        for move, count in counts.items():
+            print(f'{move}: {count}')
+        nodes = sum(counts.values())
+    else:
+        nodes = parallel_perft(brd, 'O', args.depth, workers, args.split_depth, args.add_piece)
+    elapsed = time.perf_counter() - start
+
+    nps = nodes / elapsed if elapsed > 0 else 0.0
+    print(f'perft({args.depth}) = {nodes} in {elapsed:.2f}s ({nps:.0f} leaves/s)')
+
+    failed = False
+    if(args.size == 8 and args.depth in REFERENCE_8):
+        if(nodes == REFERENCE_8[args.depth]):
+            print('matches the reference count')
+        else:
+            print(f'MISMATCH: reference count is {REFERENCE_8[args.depth]}')
+            failed = True
+
+    if(args.check_backends):
+        mismatches = check_backends(args.size, args.depth, [args.backend] + args.check_backends)
+        for line in mismatches:
+            print('MISMATCH ' + line)
+        if(mismatches):
+            failed = True
+        else:
+            print('backends agree')
+
+    if(failed):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
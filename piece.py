@@ -6,6 +6,8 @@ class Grid_Point:
     Attributes:
         pos (int, int): tuple containing 1 indexed position
     '''
+    #no per instance dict, points and pieces get created for every move and cell looked at
+    __slots__ = ('pos',)
 
     def __init__(self, i, j):
         '''
@@ -69,6 +71,8 @@ class Piece:
         get_value(): returns the val attribute of the piece (owning player)
         set_value(): sets the val attribute of the piece (owning player)
     '''
+    __slots__ = ('pos', 'val')
+
     def __init__(self, i, j, val):
         '''
         Constructor for piece
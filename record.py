@@ -0,0 +1,548 @@
+import array
+import mmap
+import os
+import sys
+
+from board import Board
+
+
+#first bytes of a game archive file
+ARCHIVE_MAGIC = b'RVGA'
+
+#bytes read at a time by the streaming reader
+CHUNK_SIZE = 1 << 16
+
+
+def move_width(size):
+    '''
+    Gets the number of bytes used for each move
+
+    ARGS:
+        size (int): board size
+    RETURNS:
+        (int): 1 for boards up to 16 by 16, 2 for larger boards
+    '''
+    return 1 if size <= 16 else 2
+
+def marker_codes(size):
+    '''
+    Gets the codes used for a pass and for the end of a record
+
+    Moves are stored as the square number i * size + j, which on a 16 by 16 board uses every value of a byte.
+    The 4 centre squares are filled before the first move so they can never be played, and the codes of two of
+    them are used as markers instead.
+
+    ARGS:
+        size (int): board size
+    RETURNS:
+        (int, int): pass code and end of record code
+    '''
+    half = size // 2
+    return (half - 1) * size + half - 1, (half - 1) * size + half
+
+def encode_move(size, move):
+    '''
+    Converts a move to its code
+
+    ARGS:
+        size (int): board size
+        move ((int, int)): 1 indexed move, None for a pass
+    RETURNS:
+        (int): the code
+    '''
+    if(move is None):
+        return marker_codes(size)[0]
+    return (move[0] - 1) * size + move[1] - 1
+
+def find_end(buffer, start, size):
+    '''
+    Finds the end of the moves of a record
+
+    ARGS:
+        buffer (bytes-like): data holding the record
+        start (int): offset of the first move
+        size (int): board size
+    RETURNS:
+        (int): offset of the end marker, -1 if the buffer stops before it
+    '''
+    width = move_width(size)
+    marker = marker_codes(size)[1].to_bytes(width, 'little')
+
+    pos = buffer.find(marker, start)
+    #with 2 byte moves the marker bytes can straddle two moves, only aligned matches count
+    while(pos != -1 and (pos - start) % width):
+        pos = buffer.find(marker, pos + 1)
+    return pos
+
+def parse_record(buffer, offset=0):
+    '''
+    Reads one record out of a buffer
+
+    ARGS:
+        buffer (bytes-like): data holding the record
+        offset (int): offset of the record's header
+    RETURNS:
+        (GameRecord, int): the record and the offset just past it, None and offset if the buffer stops part way through
+    RAISES:
+        ValueError: if the header is not valid
+    '''
+    if(len(buffer) < offset + 2):
+        return None, offset
+
+    size = buffer[offset]
+    start = chr(buffer[offset + 1])
+    if(size < 4 or start not in ('O', 'X')):
+        raise ValueError(f'Invalid record header at offset {offset}')
+
+    end = find_end(buffer, offset + 2, size)
+    if(end == -1):
+        return None, offset
+
+    data = bytes(buffer[offset + 2:end])
+    if(move_width(size) == 1):
+        codes = data
+    else:
+        codes = array.array('H', data)
+        if(sys.byteorder == 'big'):
+            codes.byteswap()
+
+    return GameRecord(size, start, codes), end + move_width(size)
+
+
+class GameRecord:
+    '''
+    A game stored as the starting player and the move codes
+
+    Every turn, passes included, is a code so the player of each move follows from the starting player.
+    The binary form is the board size and starting player in 2 header bytes, one code per turn (1 byte, or 2
+    little endian bytes on boards larger than 16) and an end marker (see marker_codes).
+
+    Attributes:
+        size int: size of the board
+        start str: 'O' or 'X' for which player moved first
+        codes [int]: one code per turn, bytes or array('H') as read
+
+    Methods:
+        from_moves(size, start, moves): builds a record from 1 indexed moves
+        from_result(result): builds a record from a game.GameResult
+        moves(): yields the moves, 1 indexed or None for a pass
+        to_bytes(): gives the binary form
+        replay(backend): plays the record on a board one turn at a time
+    '''
+    __slots__ = ('size', 'start', 'codes')
+
+    def __init__(self, size, start, codes):
+        '''
+        Constructor
+
+        ARGS:
+            size (int): size of the board
+            start (str): 'O' or 'X' for which player moved first
+            codes ([int]): one code per turn
+        '''
+        self.size = size
+        self.start = start
+        self.codes = codes
+
+    def __len__(self):
+        '''
+        length method
+
+        RETURNS:
+            int: number of turns, passes included
+        '''
+        return len(self.codes)
+
+    def __repr__(self):
+        '''
+        representation method
+
+        RETURNS:
+            str: summary of the record
+        '''
+        return f'GameRecord(size={self.size}, start={self.start}, turns={len(self.codes)})'
+
+    @classmethod
+    def from_moves(cls, size, start, moves):
+        '''
+        Builds a record from a list of moves
+
+        ARGS:
+            size (int): size of the board
+            start (str): 'O' or 'X' for which player moved first
+            moves ([(int, int)]): 1 indexed moves, None for a pass
+        RETURNS:
+            (GameRecord): the record
+        '''
+        codes = [encode_move(size, move) for move in moves]
+        if(move_width(size) == 1):
+            return cls(size, start, bytes(codes))
+        return cls(size, start, array.array('H', codes))
+
+    @classmethod
+    def from_result(cls, result):
+        '''
+        Builds a record from a finished game
+
+        ARGS:
+            result (GameResult): game from game.play_game
+        RETURNS:
+            (GameRecord): the record, starting with the first player in result.moves
+        '''
+        start = result.moves[0][0] if result.moves else 'O'
+        return cls.from_moves(result.size, start, [move for player, move in result.moves])
+
+    def moves(self):
+        '''
+        Generator over the moves of the record
+
+        YIELDS:
+            (int, int): 1 indexed move, None for a pass
+        '''
+        size = self.size
+        pass_code = marker_codes(size)[0]
+        for code in self.codes:
+            if(code == pass_code):
+                yield None
+            else:
+                yield (code // size + 1, code % size + 1)
+
+    def to_bytes(self):
+        '''
+        Gives the binary form of the record
+
+        RETURNS:
+            (bytes): header, move codes and end marker
+        '''
+        width = move_width(self.size)
+        header = bytes((self.size, ord(self.start)))
+        end = marker_codes(self.size)[1].to_bytes(width, 'little')
+        if(width == 1):
+            return header + bytes(self.codes) + end
+
+        codes = array.array('H', self.codes)
+        if(sys.byteorder == 'big'):
+            codes.byteswap()
+        return header + codes.tobytes() + end
+
+    def replay(self, backend='grid'):
+        '''
+        Plays the record on a new board, one turn at a time
+
+        The same board object is yielded every turn, already holding the position after that turn.
+
+        ARGS:
+            backend (str): backend for the board
+        YIELDS:
+            (Board, str, (int, int)): the board, the player who moved and their 1 indexed move or None for a pass
+        RAISES:
+            ValueError: if the record holds an illegal move
+        '''
+        brd = Board(self.size, backend=backend)
+        player = self.start
+        for move in self.moves():
+            if(move is not None):
+                brd.make_move((move[0] - 1, move[1] - 1), player)
+            yield brd, player, move
+            player = 'O' if player == 'X' else 'X'
+
+
+def read_records(f):
+    '''
+    Generator over the records in a binary stream, reading it a chunk at a time
+
+    ARGS:
+        f (file): stream opened in binary mode, positioned at the first record
+    YIELDS:
+        (GameRecord): each record in the stream
+    RAISES:
+        ValueError: if the stream ends part way through a record
+    '''
+    buffer = bytearray()
+    offset = 0
+    while(1):
+        chunk = f.read(CHUNK_SIZE)
+        buffer += chunk
+
+        record, next_offset = parse_record(buffer, offset)
+        while(record is not None):
+            yield record
+            offset = next_offset
+            record, next_offset = parse_record(buffer, offset)
+
+        if(not chunk):
+            break
+
+        #drop the records already read so the buffer only holds the one in progress
+        del buffer[:offset]
+        offset = 0
+
+    if(offset < len(buffer)):
+        raise ValueError('Stream ends part way through a record')
+
+
+class RecordWriter:
+    '''
+    Writes one record to a binary stream a move at a time
+
+    Methods:
+        write_move(move): writes the next turn
+        close(): writes the end marker, the record is incomplete until this is called
+    '''
+    def __init__(self, f, size, start='O', on_close=None):
+        '''
+        Constructor, writes the header straight away
+
+        ARGS:
+            f (file): stream opened in binary mode
+            size (int): size of the board
+            start (str): 'O' or 'X' for which player moves first
+            on_close (function()): called once the end marker is written
+        RAISES:
+            ValueError: if the size does not fit in the header
+        '''
+        if(size < 4 or size > 255):
+            raise ValueError(f'Board size {size} can not be recorded, sizes go from 4 to 255')
+
+        self.f = f
+        self.size = size
+        self.width = move_width(size)
+        self.turns = 0
+        self.closed = False
+        self.on_close = on_close
+
+        f.write(bytes((size, ord(start))))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write_move(self, move):
+        '''
+        Writes the next turn
+
+        ARGS:
+            move ((int, int)): 1 indexed move, None for a pass
+        '''
+        self.f.write(encode_move(self.size, move).to_bytes(self.width, 'little'))
+        self.turns += 1
+
+    def close(self):
+        '''
+        Finishes the record with the end marker
+        '''
+        if(not self.closed):
+            self.f.write(marker_codes(self.size)[1].to_bytes(self.width, 'little'))
+            self.closed = True
+            if(self.on_close is not None):
+                self.on_close()
+
+
+class GameArchive:
+    '''
+    Append only file of game records which can be read at random through an offset index
+
+    The data file is ARCHIVE_MAGIC followed by records one after another. The offset of every record is kept in
+    a second file (the data file's path with '.idx' added) of little endian 8 byte integers. If the index is
+    missing or behind the data file, the missing offsets are found by scanning. Reads go through a memory map of
+    the data file so records are only parsed when asked for.
+
+    Attributes:
+        path str: path of the data file
+        offsets array: offset of every record in the data file
+
+    Methods:
+        append(record): adds a record and returns its number
+        writer(size, start): returns a RecordWriter which appends a record a move at a time
+        close(): closes the files
+    '''
+    def __init__(self, path, mode='r'):
+        '''
+        Constructor, opens or creates an archive
+
+        ARGS:
+            path (str): path of the data file
+            mode (str): 'r' to read, 'a' to read and append (the files are created if needed)
+        RAISES:
+            ValueError: if the file is not a game archive
+        '''
+        self.path = path
+        self.index_path = path + '.idx'
+        self.mode = mode
+        self.map = None
+
+        if(mode == 'a' and not os.path.exists(path)):
+            with open(path, 'wb') as f:
+                f.write(ARCHIVE_MAGIC)
+            with open(self.index_path, 'wb'):
+                pass
+
+        self.f = open(path, 'r+b' if mode == 'a' else 'rb')
+        if(self.f.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC):
+            self.f.close()
+            raise ValueError(f'{path} is not a game archive')
+
+        self.offsets = array.array('Q')
+        if(os.path.exists(self.index_path)):
+            with open(self.index_path, 'rb') as f:
+                self.offsets.frombytes(f.read())
+            if(sys.byteorder == 'big'):
+                self.offsets.byteswap()
+        self.catch_up()
+
+        self.index = open(self.index_path, 'ab') if mode == 'a' else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        '''
+        length method
+
+        RETURNS:
+            int: number of records
+        '''
+        return len(self.offsets)
+
+    def __getitem__(self, k):
+        '''
+        Reads a record
+
+        ARGS:
+            k (int): record number
+        RETURNS:
+            (GameRecord): the record
+        '''
+        offset = self.offsets[k]
+        return parse_record(self.get_map(), offset)[0]
+
+    def __iter__(self):
+        '''
+        Generator over every record in order
+        '''
+        for k in range(len(self.offsets)):
+            yield self[k]
+
+    def get_map(self):
+        '''
+        Gets a memory map of the data file, mapping it again if it has grown
+
+        RETURNS:
+            (mmap): read only map of the data file
+        '''
+        self.f.flush()
+        length = os.fstat(self.f.fileno()).st_size
+        if(self.map is None or len(self.map) != length):
+            if(self.map is not None):
+                self.map.close()
+            self.map = mmap.mmap(self.f.fileno(), length, access=mmap.ACCESS_READ)
+        return self.map
+
+    def catch_up(self):
+        '''
+        Scans the end of the data file for records the index is missing
+
+        A record left incomplete by an interrupted write is cut off so appending can carry on after the last
+        complete record.
+        '''
+        buffer = self.get_map()
+        offset = self.offsets[-1] if self.offsets else len(ARCHIVE_MAGIC)
+        if(self.offsets):
+            offset = parse_record(buffer, offset)[1]
+
+        record, next_offset = parse_record(buffer, offset)
+        while(record is not None):
+            self.offsets.append(offset)
+            offset = next_offset
+            record, next_offset = parse_record(buffer, offset)
+
+        if(offset < len(buffer) and self.mode == 'a'):
+            self.map.close()
+            self.map = None
+            self.f.truncate(offset)
+
+        #rewrite the index if it was missing offsets
+        if(self.mode == 'a'):
+            with open(self.index_path, 'wb') as f:
+                f.write(self.offsets_bytes(self.offsets))
+
+    def offsets_bytes(self, offsets):
+        '''
+        Converts offsets to the index file's form
+
+        ARGS:
+            offsets (array): offsets to convert
+        RETURNS:
+            (bytes): little endian 8 byte integers
+        '''
+        offsets = array.array('Q', offsets)
+        if(sys.byteorder == 'big'):
+            offsets.byteswap()
+        return offsets.tobytes()
+
+    def add_offset(self, offset):
+        '''
+        Records the offset of a newly written record in the index
+
+        ARGS:
+            offset (int): offset of the record
+        RETURNS:
+            (int): number of the record
+        '''
+        self.offsets.append(offset)
+        self.index.write(self.offsets_bytes([offset]))
+        self.index.flush()
+        return len(self.offsets) - 1
+
+    def append(self, record):
+        '''
+        Adds a record to the end of the archive
+
+        ARGS:
+            record (GameRecord): record to add
+        RETURNS:
+            (int): number of the new record
+        '''
+        offset = self.f.seek(0, os.SEEK_END)
+        self.f.write(record.to_bytes())
+        self.f.flush()
+        return self.add_offset(offset)
+
+    def writer(self, size, start='O'):
+        '''
+        Starts a record which is written a move at a time, it is added to the index when the writer is closed
+
+        ARGS:
+            size (int): size of the board
+            start (str): 'O' or 'X' for which player moves first
+        RETURNS:
+            (RecordWriter): writer appending to the archive
+        '''
+        offset = self.f.seek(0, os.SEEK_END)
+
+        def add_record():
+            self.f.flush()
+            self.add_offset(offset)
+
+        return RecordWriter(self.f, size, start, add_record)
+
+    def close(self):
+        '''
+        Closes the files
+        '''
+        if(self.map is not None):
+            self.map.close()
+            self.map = None
+        if(self.index is not None):
+            self.index.close()
+            self.index = None
+        self.f.close()
+
+
+if __name__ == "__main__":
+    pass
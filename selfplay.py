@@ -0,0 +1,125 @@
+import argparse
+import json
+import multiprocessing
+import time
+
+from game import play_game, make_player
+from record import GameArchive, GameRecord
+
+
+def play_seeded_game(task):
+    '''
+    Plays one game in a worker process, every random choice comes from the game's seed
+
+    ARGS:
+        task (tuple): (seed, size, start, backend, player names {str: str}, time_limit)
+    RETURNS:
+        (GameResult): result of the game
+    '''
+    seed, size, start, backend, names, time_limit = task
+
+    #each side gets its own seed derived from the game seed so the two players don't share a random stream
+    players = {
+        'O': make_player(names['O'], seed * 2, time_limit),
+        'X': make_player(names['X'], seed * 2 + 1, time_limit),
+    }
+    return play_game(players, size, start, backend, seed)
+
+def run_games(games, size=8, start='O', backend='grid', names=None, time_limit=1.0, workers=None, seed=0):
+    '''
+    Plays a batch of games spread across a process pool
+
+    Game k is played with seed seed + k, so a batch gives the same results however many workers run it.
+
+    ARGS:
+        games (int): number of games to play
+        size (int): size of the board
+        start (str): 'O' or 'X' for which player moves first
+        backend (str): board backend to play on
+        names ({str: str}): player type for 'O' and 'X' (see game.make_player), random for both by default
+        time_limit (float): seconds per move for search players
+        workers (int): number of worker processes, defaults to the number of cores
+        seed (int): seed of the first game
+    RETURNS:
+        ([GameResult]): results in game order
+    '''
+    if(names is None):
+        names = {'O': 'random', 'X': 'random'}
+    if(workers is None):
+        workers = multiprocessing.cpu_count()
+
+    tasks = [(seed + k, size, start, backend, names, time_limit) for k in range(games)]
+
+    #play in the current process when there's only one worker to save the pool start up time
+    if(workers <= 1):
+        return [play_seeded_game(task) for task in tasks]
+
+    #large chunks keep the inter process overhead down while still balancing the load between workers
+    chunksize = max(1, games // (workers * 8))
+    with multiprocessing.Pool(workers) as pool:
+        results = list(pool.imap_unordered(play_seeded_game, tasks, chunksize))
+
+    results.sort(key=lambda result: result.seed)
+    return results
+
+def summarize(results, elapsed):
+    '''
+    Aggregates the results of a batch of games
+
+    ARGS:
+        results ([GameResult]): finished games
+        elapsed (float): seconds the batch took
+    RETURNS:
+        ({str: number}): game count, win rates for each player, tie rate, average final counts and games per second
+    '''
+    games = len(results)
+    o_wins = sum(1 for result in results if result.winner == 'O')
+    x_wins = sum(1 for result in results if result.winner == 'X')
+
+    return {
+        'games': games,
+        'O_win_rate': o_wins / games if games else 0.0,
+        'X_win_rate': x_wins / games if games else 0.0,
+        'tie_rate': (games - o_wins - x_wins) / games if games else 0.0,
+        'avg_O_count': sum(result.counts[0] for result in results) / games if games else 0.0,
+        'avg_X_count': sum(result.counts[1] for result in results) / games if games else 0.0,
+        'seconds': elapsed,
+        'games_per_second': games / elapsed if elapsed > 0 else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Play a batch of headless Reversi games across a process pool')
+    parser.add_argument('-n', '--games', type=int, default=100, help='number of games to play')
+    parser.add_argument('--size', type=int, default=8, help='board size')
+    parser.add_argument('--start', choices=['O', 'X'], default='O', help='player that moves first')
+    parser.add_argument('--backend', default='grid', help='board backend (grid or bitboard)')
+    parser.add_argument('-O', '--player-o', default='random', help='player type for O (random, ai or mcts)')
+    parser.add_argument('-X', '--player-x', default='random', help='player type for X (random, ai or mcts)')
+    parser.add_argument('--time', type=float, default=0.1, help='seconds per move for ai and mcts players')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--results', help='write every game result to this file as json lines')
+    parser.add_argument('--archive', help='append every game to this binary game archive')
+    args = parser.parse_args()
+
+    names = {'O': args.player_o, 'X': args.player_x}
+
+    start = time.perf_counter()
+    results = run_games(args.games, args.size, args.start, args.backend, names, args.time, args.workers, args.seed)
+    summary = summarize(results, time.perf_counter() - start)
+
+    if(args.results):
+        with open(args.results, 'w') as f:
+            for result in results:
+                f.write(json.dumps(result.to_dict()) + '\n')
+
+    if(args.archive):
+        with GameArchive(args.archive, 'a') as archive:
+            for result in results:
+                archive.append(GameRecord.from_result(result))
+
+    print(json.dumps(summary, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import random
+import secrets
+import statistics
+import threading
+import time
+
+from board import Board
+from ai import AIPlayer
+from mcts import encode_position, decode_position
+
+
+#seconds a session may go without a request before it is removed, and how often sessions are checked
+IDLE_TIMEOUT = 600.0
+SWEEP_INTERVAL = 30.0
+
+#largest board and longest computer move time a client can ask for
+MAX_SIZE = 32
+MAX_TIME = 10.0
+
+#longest request line in bytes, a connection sending a longer one gets an error and is closed
+MAX_LINE = 1 << 16
+
+#computer player of the executor thread or process running search_move
+_searchers = threading.local()
+
+
+def search_move(task):
+    '''
+    Runs the computer's search for one move, in an executor thread or process
+
+    Only the encoded position goes in and the move comes out, so the search never touches a session's board. Each
+    worker keeps a single AIPlayer whose time limit is set for every move, so its transposition table (keyed by
+    position, not time) carries over between moves instead of being allocated for every search, and clients can't
+    make a worker hold more than one of them.
+
+    ARGS:
+        task (tuple): (cells, backend, player, time_limit) with the position from encode_position
+    RETURNS:
+        ((int, int)): the chosen move, 1 indexed
+    '''
+    cells, backend, player, time_limit = task
+
+    computer = getattr(_searchers, 'player', None)
+    if(computer is None):
+        computer = _searchers.player = AIPlayer(time_limit)
+    computer.time_limit = time_limit
+    return computer.choose_move(decode_position(cells, backend), player)
+
+
+class GameSession:
+    '''
+    One game hosted by the server, with the same turn, pass and game over rules as gameLoop
+
+    Attributes:
+        game_id str: id clients use to refer to the game
+        board Board: the game's board
+        current_player str: player to move
+        computer_players str: players the computer plays for ('', 'O', 'X' or 'OX')
+        computer_time float: seconds per computer move
+        turn_skipped bool: whether the previous player passed
+        over bool: whether the game has finished
+        moves [(str, (int, int))]: every turn played as (player, 1 indexed move or None for a pass)
+        last_active float: time.monotonic() of the last request for the game
+        lock asyncio.Lock: held while a request for the game runs so requests for it never interleave
+
+    Methods:
+        settle(): plays passes until the player to move has a move or the game is over
+        play(move): plays a move for the player to move
+        get_state(): returns the game state as plain types
+    '''
+    def __init__(self, size=8, start='O', backend='bitboard', computer_players='', computer_time=1.0):
+        '''
+        Constructor
+
+        ARGS:
+            size (int): size of the board
+            start (str): 'O' or 'X' for which player moves first
+            backend (str): board backend
+            computer_players (str): players the computer plays for
+            computer_time (float): seconds per computer move
+        '''
+        self.game_id = secrets.token_hex(8)
+        self.board = Board(size, backend=backend)
+        self.current_player = start
+        self.computer_players = computer_players
+        self.computer_time = computer_time
+
+        self.turn_skipped = False
+        self.over = False
+        self.moves = []
+
+        self.last_active = time.monotonic()
+        self.lock = asyncio.Lock()
+
+        self.settle()
+
+    def settle(self):
+        '''
+        Skips the turn of a player with no moves and ends the game when neither player can move
+        '''
+        while(not self.over):
+            o_num, x_num = self.board.get_piece_count()
+            has_move = self.board.has_any_move(self.current_player)
+
+            if(not has_move and not self.turn_skipped):
+                self.turn_skipped = True
+                self.moves.append((self.current_player, None))
+                self.current_player = 'O' if self.current_player == 'X' else 'X'
+                continue
+
+            if((not has_move and self.turn_skipped) or o_num == 0 or x_num == 0):
+                self.over = True
+            break
+
+    def play(self, move):
+        '''
+        Plays a move for the player to move
+
+        ARGS:
+            move ((int, int)): 1 indexed move
+        RAISES:
+            ValueError: if the game is over or the move is not legal
+        '''
+        if(self.over):
+            raise ValueError('The game is over')
+
+        move = tuple(move)
+        if(move not in self.board.get_available_moves(self.current_player)):
+            raise ValueError(f'Illegal move {move} for player {self.current_player}')
+
+        self.board.add_piece((move[0] - 1, move[1] - 1), self.current_player)
+        self.moves.append((self.current_player, move))
+
+        self.turn_skipped = False
+        self.current_player = 'O' if self.current_player == 'X' else 'X'
+        self.settle()
+
+    def get_state(self):
+        '''
+        Gets the game state as plain types for the protocol
+
+        RETURNS:
+            (dict): board rows ('O', 'X' or '.' per cell), player to move, counts, legal moves, winner and turn count
+        '''
+        size = self.board.dimensions[0]
+        o_num, x_num = self.board.get_piece_count()
+
+        winner = None
+        if(self.over and o_num != x_num):
+            winner = 'O' if o_num > x_num else 'X'
+
+        return {
+            'game': self.game_id,
+            'board': [''.join(self.board.get_piece(i, j) or '.' for j in range(size)) for i in range(size)],
+            'player': self.current_player,
+            'counts': [o_num, x_num],
+            'moves': [] if self.over else [list(move) for move in self.board.get_available_moves(self.current_player)],
+            'over': self.over,
+            'winner': winner,
+            'turns': len(self.moves),
+        }
+
+
+class GameServer:
+    '''
+    asyncio server hosting many games over a line based json protocol
+
+    Every request is one line holding a json object with a 'cmd' and its arguments, and gets one json line back
+    with 'ok' set, plus any 'id' the request carried. Commands:
+        new: size, start, backend, computer ('', 'O', 'X' or 'OX') and time, all optional, starts a game
+        state: game, returns the game's state
+        move: game, row and col (1 indexed), plays a move and any computer moves after it
+        close: game, removes the game
+        ping: checks the connection
+    Games are kept by id, not by connection, so any connection can play any game it knows the id of.
+    Computer moves are searched in an executor on a copy of the position so the event loop keeps serving other
+    games, and games idle for longer than idle_timeout are removed.
+
+    Attributes:
+        sessions {str: GameSession}: games being hosted, keyed by id
+        executor Executor: runs the computer's searches
+        idle_timeout float: seconds a game may go without a request before it is removed
+        max_sessions int: most games hosted at once
+
+    Methods:
+        handle_request(request): runs one request and returns the response
+        serve_tcp(host, port), serve_unix(path): start listening
+        expire_sessions(): removes idle games
+        close(): stops the idle game checks and the executor
+    '''
+    def __init__(self, executor=None, idle_timeout=IDLE_TIMEOUT, max_sessions=10000):
+        '''
+        Constructor
+
+        ARGS:
+            executor (Executor): runs the computer's searches, a process pool with one worker per core by default
+            idle_timeout (float): seconds a game may go without a request before it is removed
+            max_sessions (int): most games hosted at once
+        '''
+        self.sessions = {}
+        self.executor = executor or concurrent.futures.ProcessPoolExecutor()
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sweeper = None
+
+    def get_session(self, request):
+        '''
+        Looks up the game a request is for
+
+        ARGS:
+            request (dict): request holding a 'game' id
+        RETURNS:
+            (GameSession): the game
+        RAISES:
+            ValueError: if there is no game with that id
+        '''
+        session = self.sessions.get(request.get('game'))
+        if(session is None):
+            raise ValueError(f'Unknown game: {request.get("game")}')
+        session.last_active = time.monotonic()
+        return session
+
+    async def play_computer(self, session):
+        '''
+        Plays the computer's moves until it is a person's turn or the game is over
+
+        ARGS:
+            session (GameSession): game to play in, its lock must be held
+        '''
+        loop = asyncio.get_running_loop()
+        while(not session.over and session.current_player in session.computer_players):
+            task = (encode_position(session.board), session.board.backend, session.current_player, session.computer_time)
+            move = await loop.run_in_executor(self.executor, search_move, task)
+            session.play(move)
+            session.last_active = time.monotonic()
+
+    async def handle_request(self, request):
+        '''
+        Runs one request
+
+        ARGS:
+            request (dict): decoded request line
+        RETURNS:
+            (dict): response, with 'ok' false and an 'error' message if the request failed
+        '''
+        cmd = request.get('cmd')
+
+        if(cmd == 'ping'):
+            return {'ok': True}
+
+        elif(cmd == 'new'):
+            if(len(self.sessions) >= self.max_sessions):
+                raise ValueError('Too many games')
+            size = int(request.get('size', 8))
+            start = request.get('start', 'O')
+            computer = request.get('computer', '')
+            time_limit = float(request.get('time', 1.0))
+            if(size < 4 or size > MAX_SIZE or start not in ('O', 'X') or not set(computer) <= {'O', 'X'}
+               or not 0 < time_limit <= MAX_TIME):
+                raise ValueError('Invalid game settings')
+
+            session = GameSession(size, start, request.get('backend', 'bitboard'), computer, time_limit)
+            self.sessions[session.game_id] = session
+            async with session.lock:
+                await self.play_computer(session)
+                return {'ok': True, 'state': session.get_state()}
+
+        elif(cmd == 'state'):
+            session = self.get_session(request)
+            async with session.lock:
+                return {'ok': True, 'state': session.get_state()}
+
+        elif(cmd == 'move'):
+            session = self.get_session(request)
+            async with session.lock:
+                if(session.current_player in session.computer_players):
+                    raise ValueError(f'Player {session.current_player} is played by the computer')
+                session.play((int(request['row']), int(request['col'])))
+                await self.play_computer(session)
+                return {'ok': True, 'state': session.get_state()}
+
+        elif(cmd == 'close'):
+            session = self.get_session(request)
+            del self.sessions[session.game_id]
+            return {'ok': True}
+
+        raise ValueError(f'Unknown command: {cmd}')
+
+    async def handle_connection(self, reader, writer):
+        '''
+        Serves one connection, answering each request line in order
+
+        ARGS:
+            reader (asyncio.StreamReader): incoming lines
+            writer (asyncio.StreamWriter): outgoing lines
+        '''
+        try:
+            while(1):
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    #the rest of the line is still unread so the stream can't be resynced
+                    response = {'ok': False, 'error': f'Requests must be under {MAX_LINE} bytes'}
+                    writer.write(json.dumps(response).encode() + b'\n')
+                    await writer.drain()
+                    break
+                if(not line):
+                    break
+
+                #echo the id of object requests, on errors too
+                reply = {}
+                try:
+                    request = json.loads(line)
+                    if(not isinstance(request, dict)):
+                        raise ValueError('Requests must be json objects')
+                    if('id' in request):
+                        reply['id'] = request['id']
+                    response = await self.handle_request(request)
+                except (ValueError, KeyError, TypeError, OverflowError) as e:
+                    response = {'ok': False, 'error': str(e)}
+
+                response.update(reply)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            #the server is shutting down with the connection still open
+            pass
+        finally:
+            writer.close()
+
+    def expire_sessions(self):
+        '''
+        Removes the games which have gone without a request for longer than idle_timeout
+
+        RETURNS:
+            (int): number of games removed
+        '''
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = [game_id for game_id, session in self.sessions.items()
+                   if session.last_active < cutoff and not session.lock.locked()]
+        for game_id in expired:
+            del self.sessions[game_id]
+        return len(expired)
+
+    async def sweep(self, interval):
+        '''
+        Removes idle games every interval seconds, runs until cancelled
+
+        ARGS:
+            interval (float): seconds between checks
+        '''
+        while(1):
+            await asyncio.sleep(interval)
+            self.expire_sessions()
+
+    def close(self):
+        '''
+        Stops removing idle games and shuts down the executor
+        '''
+        if(self.sweeper is not None):
+            self.sweeper.cancel()
+            self.sweeper = None
+        self.executor.shutdown()
+
+    def start_sweeper(self, interval=SWEEP_INTERVAL):
+        '''
+        Starts the task which removes idle games, once per server
+
+        ARGS:
+            interval (float): seconds between checks
+        '''
+        if(self.sweeper is None):
+            self.sweeper = asyncio.create_task(self.sweep(interval))
+
+    async def serve_tcp(self, host='127.0.0.1', port=8765):
+        '''
+        Starts listening on a TCP port
+
+        ARGS:
+            host (str): address to listen on
+            port (int): port to listen on, 0 picks a free one
+        RETURNS:
+            (asyncio.Server): the running server
+        '''
+        self.start_sweeper()
+        return await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE)
+
+    async def serve_unix(self, path):
+        '''
+        Starts listening on a Unix socket
+
+        ARGS:
+            path (str): path of the socket
+        RETURNS:
+            (asyncio.Server): the running server
+        '''
+        self.start_sweeper()
+        return await asyncio.start_unix_server(self.handle_connection, path, limit=MAX_LINE)
+
+
+async def load_client(connect, games, size, seed, latencies):
+    '''
+    Client for load testing, plays random moves against the computer over one connection
+
+    ARGS:
+        connect (function()): opens a connection, returns a coroutine giving (reader, writer)
+        games (int): number of games to play
+        size (int): board size
+        seed (int): seed for the random moves
+        latencies ([float]): seconds each request took are appended here
+    '''
+    rng = random.Random(seed)
+    reader, writer = await connect()
+
+    async def request(message):
+        start = time.perf_counter()
+        writer.write(json.dumps(message).encode() + b'\n')
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        if(not response['ok']):
+            raise RuntimeError(response['error'])
+        return response
+
+    for n in range(games):
+        state = (await request({'cmd': 'new', 'size': size, 'computer': 'X', 'time': 0.01}))['state']
+        while(not state['over']):
+            row, col = rng.choice(state['moves'])
+            state = (await request({'cmd': 'move', 'game': state['game'], 'row': row, 'col': col}))['state']
+        await request({'cmd': 'close', 'game': state['game']})
+
+    writer.close()
+    await writer.wait_closed()
+
+async def load_test(connect, clients, games, size):
+    '''
+    Runs many load test clients at once and reports the request latencies
+
+    ARGS:
+        connect (function()): opens a connection to the server, see load_client
+        clients (int): number of concurrent connections
+        games (int): games per connection
+        size (int): board size
+    RETURNS:
+        ({str: number}): requests, seconds, requests per second and latency percentiles in milliseconds
+    '''
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(load_client(connect, games, size, seed, latencies) for seed in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'median_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+async def run(args):
+    if(args.threads):
+        executor = concurrent.futures.ThreadPoolExecutor(args.workers)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(args.workers)
+    server = GameServer(executor, args.idle_timeout)
+
+    if(args.unix):
+        listener = await server.serve_unix(args.unix)
+        connect = lambda: asyncio.open_unix_connection(args.unix)
+        print(f'Serving on {args.unix}')
+    else:
+        listener = await server.serve_tcp(args.host, args.port)
+        host, port = listener.sockets[0].getsockname()[:2]
+        connect = lambda: asyncio.open_connection(host, port)
+        print(f'Serving on {host}:{port}')
+
+    async with listener:
+        if(args.load_test):
+            print(json.dumps(await load_test(connect, args.load_test, args.games, args.size), indent=4))
+        else:
+            await listener.serve_forever()
+
+    server.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Host Reversi games over a line based json protocol')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port to listen on')
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of workers searching computer moves (default: one per core)')
+    parser.add_argument('--threads', action='store_true', help='search computer moves in threads instead of processes')
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT, help='seconds before an idle game is removed')
+    parser.add_argument('--load-test', type=int, metavar='CLIENTS', help='start the server, run this many load test clients against it and exit')
+    parser.add_argument('--games', type=int, default=2, help='games per load test client')
+    parser.add_argument('--size', type=int, default=8, help='board size for load test games')
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,575 @@
+from board import Board, DIRECTIONS
+from piece import Piece
+from zobrist import get_keys
+
+
+#boards at least this big use the sparse backend when no computer plays (see main.py)
+SPARSE_SIZE = 32
+
+
+class SparseRow:
+    '''
+    View of one row of a SparseGrid, row[j] reads and writes like a row of the grid backend's lists
+
+    Attributes:
+        values {int: value}: the grid's dict, keyed by square number i * size + j
+        i int: row index
+        size int: size of the square board
+        pieces bool: if true the values are player strings which are read and written as Piece objects
+        occupied {int: str}: if set, the board's pieces, and cells missing from values read as [] when they are empty
+    '''
+    __slots__ = ('values', 'i', 'size', 'pieces', 'occupied')
+
+    def __init__(self, values, i, size, pieces, occupied=None):
+        '''
+        Constructor
+
+        ARGS:
+            values ({int: value}): dict holding the filled squares
+            i (int): row index
+            size (int): size of the square board
+            pieces (bool): store players and hand out Piece objects
+            occupied ({int: str}): pieces of the board, empty cells missing from values read as [] when given
+        '''
+        self.values = values
+        self.i = i
+        self.size = size
+        self.pieces = pieces
+        self.occupied = occupied
+
+    def __len__(self):
+        '''
+        length method
+
+        RETURNS:
+            int: number of cells in the row
+        '''
+        return self.size
+
+    def __getitem__(self, j):
+        '''
+        Get item method
+
+        ARGS:
+            j (int): column index
+        RETURNS:
+            (value): the value of the cell, a new Piece for a grid of pieces, None (or [] on an empty square when
+                     occupied is set) if the cell is not filled
+        '''
+        if(j < 0):
+            j += self.size
+        if(not 0 <= j < self.size):
+            raise IndexError('grid column index out of range')
+
+        square = self.i * self.size + j
+        value = self.values.get(square)
+        if(self.pieces and value):
+            return Piece(self.i, j, value)
+        if(value is None and self.occupied is not None and square not in self.occupied):
+            return []
+        return value
+
+    def __setitem__(self, j, value):
+        '''
+        Set item method
+
+        ARGS:
+            j (int): column index
+            value (value): value to store, a Piece for a grid of pieces, None to empty the cell
+        '''
+        square = self.i * self.size + j
+        if(value is None):
+            self.values.pop(square, None)
+        elif(self.pieces):
+            self.values[square] = value.get_value()
+        else:
+            self.values[square] = value
+
+    def __iter__(self):
+        '''
+        iterator method
+
+        YIELDS:
+            (value): the value of each cell in the row
+        '''
+        for j in range(self.size):
+            yield self[j]
+
+
+class SparseGrid:
+    '''
+    2d view over a dict holding only the filled cells, grid[i][j] reads and writes like the grid backend's lists
+
+    Attributes:
+        values {int: value}: filled cells keyed by square number i * size + j
+        size int: size of the square board
+        pieces bool: if true the values are player strings which are read and written as Piece objects
+        occupied {int: str}: if set, the board's pieces, and cells missing from values read as [] when they are empty
+    '''
+    __slots__ = ('values', 'size', 'pieces', 'occupied')
+
+    def __init__(self, values, size, pieces, occupied=None):
+        '''
+        Constructor
+
+        ARGS:
+            values ({int: value}): dict holding the filled cells
+            size (int): size of the square board
+            pieces (bool): store players and hand out Piece objects
+            occupied ({int: str}): pieces of the board, empty cells missing from values read as [] when given
+        '''
+        self.values = values
+        self.size = size
+        self.pieces = pieces
+        self.occupied = occupied
+
+    def __len__(self):
+        '''
+        length method
+
+        RETURNS:
+            int: number of rows
+        '''
+        return self.size
+
+    def __getitem__(self, i):
+        '''
+        Get item method
+
+        ARGS:
+            i (int): row index
+        RETURNS:
+            (SparseRow): view of the row
+        '''
+        if(i < 0):
+            i += self.size
+        if(not 0 <= i < self.size):
+            raise IndexError('grid row index out of range')
+        return SparseRow(self.values, i, self.size, self.pieces, self.occupied)
+
+    def __iter__(self):
+        '''
+        iterator method
+
+        YIELDS:
+            (SparseRow): view of each row
+        '''
+        for i in range(self.size):
+            yield SparseRow(self.values, i, self.size, self.pieces, self.occupied)
+
+
+class SparseBoard(Board):
+    '''
+    Board backend for very large boards which keeps only the occupied squares, in a dict
+
+    The board also keeps its frontier: the empty squares next to at least one piece, which are the only squares a
+    move can be played on. Move generation only looks at the frontier and the flip walks step across the board
+    instead of using a ray table, so the cost of a turn does not grow with the area of the board. The memory of the
+    board itself follows the occupied squares, but the zobrist key table (see zobrist.get_keys) still has two keys for
+    every square. It is built once per size and shared by all boards of that size.
+    Results from the public Board methods are identical to the grid backend. Mobility tracking is not supported.
+
+    Attributes (on top of Board's):
+        pieces {int: str}: owner of every occupied square, keyed by square number i * size + j
+        frontier {int}: square numbers of the empty squares next to a piece
+        dirs {int: [int]}: flip directions of the moves found by the last get_available_moves call
+        grid_values SparseGrid: view of pieces, see SparseGrid
+        piece_dirs SparseGrid: view of dirs, which reads [] on the other empty squares once moves have been generated
+    '''
+    backend = 'sparse'
+
+    def __init__(self, size, backend='sparse', debug=False, track_mobility=False):
+        '''
+        SparseBoard constructor
+
+        ARGS:
+            size (int): size of the square board
+            backend (str): always 'sparse', accepted so Board(size, backend='sparse') can construct this class
+            debug (bool): turns on the consistency checks
+            track_mobility (bool): must be false, only the grid and compact backends track mobility
+        '''
+        if(track_mobility):
+            raise ValueError('mobility tracking is not supported by the sparse backend')
+
+        self.dimensions = (size, size)
+        self.debug = debug
+
+        self.O_num = 2
+        self.X_num = 2
+
+        self.pieces = {}
+        self.frontier = set()
+        self.dirs = {}
+        self.grid_values = SparseGrid(self.pieces, size, True)
+        self.piece_dirs = SparseGrid(self.dirs, size, False)
+
+        self.undo_stack = []
+
+        self.keys = get_keys(size)
+        self.hash_key = 0
+
+        #create the starting 4 pieces
+        self.set_piece(size//2 - 1, size//2 - 1, 'O')
+        self.set_piece(size//2, size//2, 'O')
+        self.set_piece(size//2, size//2 - 1, 'X')
+        self.set_piece(size//2 - 1, size//2, 'X')
+
+    def neighbours(self, square):
+        '''
+        Gets the squares around a square
+
+        ARGS:
+            square (int): square number
+        RETURNS:
+            [int]: square numbers of the up to 8 squares touching it
+        '''
+        size = self.dimensions[0]
+        i, j = divmod(square, size)
+        return [(i + di) * size + j + dj for di, dj in DIRECTIONS if 0 <= i + di < size and 0 <= j + dj < size]
+
+    def get_available_moves(self, player):
+        '''
+        returns all availabe moves for a player, checking only the frontier squares
+
+        ARGS:
+            player (str): either 'X' or 'O' depending on which player's turn it is
+        RETURNS:
+            [(int, int)]: a list of tuples containing all possible moves (1 indexed)
+        '''
+        if(self.debug):
+            self.check_frontier()
+
+        size = self.dimensions[0]
+        self.dirs.clear()
+
+        #like the grid, every empty square now has a list of directions, only the moves are stored
+        self.piece_dirs.occupied = self.pieces
+
+        possible_moves = []
+        for square in sorted(self.frontier):
+            i, j = divmod(square, size)
+            dirs = self.is_valid_move(i, j, player)
+            if(dirs):
+                self.dirs[square] = dirs
+                possible_moves.append((i + 1, j + 1))
+
+        return possible_moves
+
+    def iter_moves(self, player):
+        '''
+        Generator over the available moves for a player, found one at a time from the frontier
+
+        ARGS:
+            player (str): either 'X' or 'O'
+        YIELDS:
+            (int, int): each possible move (1 indexed), in the same order as get_available_moves
+        '''
+        size = self.dimensions[0]
+        for square in sorted(self.frontier):
+            i, j = divmod(square, size)
+            if(self.can_play(i, j, player)):
+                yield (i + 1, j + 1)
+
+    def get_piece(self, i, j):
+        '''
+        gets a position's piece's player
+
+        ARGS:
+            i, j (int, int): position at which to get piece
+
+        RETURNS:
+            (str): 'X', 'O', or None depending on which player owns the piece or if there is a piece at all
+        '''
+        return self.pieces.get(i * self.dimensions[0] + j)
+
+    def is_valid_move(self, i, j, player):
+        '''
+        Function which checks if a move is valid
+
+        ARGS:
+            i, j (int, int): position which to check
+            player (str): 'X' or 'O' for which player is checking for valid move
+
+        RETURNS:
+            [int]: directions 1-8 in which pieces would get flipped (see Board.is_valid_move), None if the square is taken
+        '''
+        size = self.dimensions[0]
+        pieces = self.pieces
+        if(i * size + j in pieces):
+            return None
+
+        opposite_player = 'O' if player == 'X' else 'X'
+
+        #step along each direction past the opponent's pieces, checking the edge as there is no ray table
+        found_directions = []
+        for d, (di, dj) in enumerate(DIRECTIONS, 1):
+            y = i + di
+            x = j + dj
+            opposite_found = False
+            while(0 <= y < size and 0 <= x < size):
+                piece = pieces.get(y * size + x)
+                if(piece != opposite_player):
+                    if(piece == player and opposite_found):
+                        found_directions.append(d)
+                    break
+                opposite_found = True
+                y += di
+                x += dj
+
+        return found_directions
+
+    def can_play(self, i, j, player):
+        '''
+        Checks if a move is valid without collecting its flip directions
+
+        ARGS:
+            i, j (int, int): position which to check
+            player (str): 'X' or 'O' for which player is checking for valid move
+        RETURNS:
+            (bool): True if placing a piece at i, j would flip at least one piece
+        '''
+        size = self.dimensions[0]
+        pieces = self.pieces
+        if(i * size + j in pieces):
+            return False
+
+        opposite_player = 'O' if player == 'X' else 'X'
+        for di, dj in DIRECTIONS:
+            y = i + di
+            x = j + dj
+            opposite_found = False
+            while(0 <= y < size and 0 <= x < size):
+                piece = pieces.get(y * size + x)
+                if(piece != opposite_player):
+                    if(piece == player and opposite_found):
+                        return True
+                    break
+                opposite_found = True
+                y += di
+                x += dj
+
+        return False
+
+    def walk(self, i, j, d, player):
+        '''
+        Finds the opponent pieces next to a position in one direction
+
+        ARGS:
+            i, j (int, int): position to walk from
+            d (int): direction 1-8 (see Board.is_valid_move)
+            player (str): player whose opponent's pieces are collected
+        RETURNS:
+            [(int, int)]: positions of the run of opponent pieces, in order, stopping before the first other square
+        '''
+        size = self.dimensions[0]
+        opposite_player = 'O' if player == 'X' else 'X'
+        di, dj = DIRECTIONS[d - 1]
+
+        run = []
+        y = i + di
+        x = j + dj
+        while(0 <= y < size and 0 <= x < size and self.pieces.get(y * size + x) == opposite_player):
+            run.append((y, x))
+            y += di
+            x += dj
+        return run
+
+    def turn_pieces(self, i, j, player):
+        '''
+        Function to flip needed pieces after a piece is played
+
+        ARGS:
+            i, j (int, int): position at which piece was played
+            player (str): 'X' or 'O' for which player placed the piece
+        RETURNS:
+            (int): number of pieces that were flipped
+        '''
+        flipped = 0
+        for d in self.dirs[i * self.dimensions[0] + j]:
+            for y, x in self.walk(i, j, d, player):
+                self.flip_piece(y, x)
+                flipped += 1
+        return flipped
+
+    def get_flips(self, i, j, player):
+        '''
+        Finds the pieces that would get flipped if player placed a piece at a position
+
+        ARGS:
+            i, j (int, int): position of the move
+            player (str): 'X' or 'O' for which player is placing
+        RETURNS:
+            [(int, int)]: positions of the pieces that would get flipped, empty if the move is not valid
+        '''
+        flips = []
+        for d in self.is_valid_move(i, j, player) or []:
+            flips.extend(self.walk(i, j, d, player))
+        return flips
+
+    def flip_piece(self, i, j):
+        '''
+        Flips a piece to the opposite player
+
+        ARGS: {Note: function expects a position at which a piece is located}
+            i, j (int, int): position at which to flip piece
+        '''
+        square = i * self.dimensions[0] + j
+        player = 'O' if self.pieces[square] == 'X' else 'X'
+        self.pieces[square] = player
+        self.hash_key ^= self.keys['flip'][square]
+
+        if(self.listener is not None):
+            self.listener.piece_flipped(square, player)
+
+    def set_piece(self, i, j, player):
+        '''
+        Puts a piece for a player at a position, replacing whatever was there, and updates hash_key and the frontier
+        Nothing gets flipped and the piece counts are not changed
+
+        ARGS:
+            i, j (int, int): position of the piece
+            player (str): 'X' or 'O' for who owns the piece, None to leave the position empty
+        '''
+        square = i * self.dimensions[0] + j
+        pieces = self.pieces
+
+        old = pieces.get(square)
+        if(old):
+            self.hash_key ^= self.keys[old][square]
+
+        if(player):
+            pieces[square] = player
+            self.hash_key ^= self.keys[player][square]
+
+            #a newly filled square leaves the frontier and its empty neighbours join it
+            if(not old):
+                self.frontier.discard(square)
+                for neighbour in self.neighbours(square):
+                    if(neighbour not in pieces):
+                        self.frontier.add(neighbour)
+        elif(old):
+            del pieces[square]
+
+            #the emptied square and its empty neighbours only stay in the frontier if they still touch a piece
+            for empty in [square] + self.neighbours(square):
+                if(empty not in pieces):
+                    if(any(neighbour in pieces for neighbour in self.neighbours(empty))):
+                        self.frontier.add(empty)
+                    else:
+                        self.frontier.discard(empty)
+
+        if(self.listener is not None):
+            self.listener.piece_set(square, old, player)
+
+    def check_frontier(self):
+        '''
+        consistency check for debug mode, rebuilds the frontier from the pieces and compares it with the stored one
+
+        RAISES:
+            AssertionError: if the stored frontier does not match the board
+        '''
+        frontier = set()
+        for square in self.pieces:
+            frontier.update(neighbour for neighbour in self.neighbours(square) if neighbour not in self.pieces)
+        if(frontier != self.frontier):
+            raise AssertionError(f'Frontier out of sync: {len(self.frontier ^ frontier)} squares differ')
+
+    def count_pieces(self):
+        '''
+        counts the number of pieces for each player and stores in member O_num and X_num
+        '''
+        self.X_num = sum(1 for piece in self.pieces.values() if piece == 'X')
+        self.O_num = len(self.pieces) - self.X_num
+
+    def get_pieces(self):
+        '''
+        Lists the pieces on the board
+
+        RETURNS:
+            [(int, str)]: square number and owner of every piece, in row major order
+        '''
+        return sorted(self.pieces.items())
+
+    def get_bits(self):
+        '''
+        Gets the pieces on the board as one bitmask per player
+
+        RETURNS:
+            ({str: int}): bit i * size + j set for each piece, keyed by 'O' and 'X'
+        '''
+        bits = {'O': 0, 'X': 0}
+        for square, piece in self.pieces.items():
+            bits[piece] |= 1 << square
+        return bits
+
+    def set_position(self, bits):
+        '''
+        Replaces every piece on the board and rebuilds the frontier (see Board.set_position)
+
+        ARGS:
+            bits ({str: int}): bitmask of the pieces of 'O' and 'X'
+        '''
+        self.pieces.clear()
+        self.hash_key = 0
+        for player in ('O', 'X'):
+            keys = self.keys[player]
+            rest = bits[player]
+            while(rest):
+                low = rest & -rest
+                square = low.bit_length() - 1
+                rest ^= low
+                self.pieces[square] = player
+                self.hash_key ^= keys[square]
+
+        self.frontier.clear()
+        for square in self.pieces:
+            self.frontier.update(neighbour for neighbour in self.neighbours(square) if neighbour not in self.pieces)
+
+    def set_dirs(self, piece_dirs):
+        '''
+        Replaces piece_dirs, keeping the squares which have directions
+
+        ARGS:
+            piece_dirs ([[[int]]]): grid of direction lists and None
+        '''
+        size = self.dimensions[0]
+        self.dirs.clear()
+        self.piece_dirs.occupied = None
+        for i, row in enumerate(piece_dirs):
+            for j, dirs in enumerate(row):
+                if(dirs is not None):
+                    self.piece_dirs.occupied = self.pieces
+                if(dirs):
+                    self.dirs[i * size + j] = dirs
+
+    def copy(self, dirs=True):
+        '''
+        Builds an independent board in the same position without going through the constructor
+
+        ARGS:
+            dirs (bool): copy piece_dirs too, otherwise the copy needs a get_available_moves call before add_piece
+        RETURNS:
+            (SparseBoard): the copy, with an empty undo stack and no listener
+        '''
+        size = self.dimensions[0]
+        board = object.__new__(SparseBoard)
+        board.dimensions = self.dimensions
+        board.debug = self.debug
+        board.O_num = self.O_num
+        board.X_num = self.X_num
+        board.pieces = dict(self.pieces)
+        board.frontier = set(self.frontier)
+        board.dirs = dict(self.dirs) if dirs else {}
+        board.grid_values = SparseGrid(board.pieces, size, True)
+        occupied = None
+        if(dirs and self.piece_dirs.occupied is not None):
+            occupied = board.pieces
+        board.piece_dirs = SparseGrid(board.dirs, size, False, occupied)
+        board.undo_stack = []
+        board.keys = self.keys
+        board.hash_key = self.hash_key
+        return board
+
+
+if __name__ == "__main__":
+    pass
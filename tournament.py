@@ -0,0 +1,283 @@
+import argparse
+import json
+import math
+import multiprocessing
+import time
+
+from ai import other_player
+from board import Board
+from game import play_game, make_player
+
+
+#score of a game pair for the first player: both lost, a loss and a tie, 1 win each or 2 ties, a win and a tie, both won
+PAIR_SCORES = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+#added to every pair count, which pulls the estimates towards equal strength while there are few pairs so the
+#test cannot stop on a lucky start, and keeps the variance above 0 when every pair so far scored the same
+PAIR_PRIOR = 0.5
+
+
+def collect_openings(board, player, plies, line, seen, openings):
+    '''
+    Walks every move sequence from a position and keeps the first one reaching each position
+
+    ARGS:
+        board (Board): position to walk from, returned unchanged
+        player (str): player to move
+        plies (int): turns left to walk
+        line ([(int, int)]): moves played to reach board, None for a pass
+        seen (set): canonical hashes of the positions kept so far
+        openings ([[(int, int)]]): move sequences of the kept positions are appended here
+    '''
+    moves = board.get_available_moves(player)
+    if(plies == 0 or (not moves and line and line[-1] is None)):
+        key = board.canonical_hash(player)[0]
+        if(key not in seen):
+            seen.add(key)
+            openings.append(list(line))
+        return
+
+    if(not moves):
+        collect_openings(board, other_player(player), plies - 1, line + [None], seen, openings)
+        return
+
+    for move in moves:
+        board.make_move((move[0] - 1, move[1] - 1), player)
+        collect_openings(board, other_player(player), plies - 1, line + [move], seen, openings)
+        board.unmake_move()
+
+def get_openings(size=8, plies=4):
+    '''
+    Gets the fixed openings a match is played from
+
+    Positions which are rotations or reflections of each other are only kept once.
+
+    ARGS:
+        size (int): board size
+        plies (int): turns played from the starting position
+    RETURNS:
+        ([[(int, int)]]): 1 indexed move sequences for both sides from the start with 'O' to move, one per position
+    '''
+    openings = []
+    collect_openings(Board(size, backend='bitboard'), 'O', plies, [], set(), openings)
+    return openings
+
+def elo_to_score(elo):
+    '''
+    Expected score of a player the given number of Elo points stronger than their opponent
+
+    ARGS:
+        elo (float): Elo difference
+    RETURNS:
+        (float): expected score between 0 and 1
+    '''
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def score_to_elo(score):
+    '''
+    Elo difference giving an expected score
+
+    ARGS:
+        score (float): score between 0 and 1
+    RETURNS:
+        (float): Elo difference, infinite for a score of 0 or 1
+    '''
+    if(score <= 0):
+        return -math.inf
+    if(score >= 1):
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+def pair_stats(pairs):
+    '''
+    Mean and variance of the pair scores
+
+    ARGS:
+        pairs ([int]): number of pairs with each of PAIR_SCORES
+    RETURNS:
+        (float, float, float): number of pairs, mean pair score and variance of a pair score, with PAIR_PRIOR added
+    '''
+    counts = [count + PAIR_PRIOR for count in pairs]
+    total = sum(counts)
+    mean = sum(count * score for count, score in zip(counts, PAIR_SCORES)) / total
+    variance = sum(count * (score - mean) ** 2 for count, score in zip(counts, PAIR_SCORES)) / total
+    return total, mean, variance
+
+def sprt_llr(pairs, elo0, elo1):
+    '''
+    Log likelihood ratio of the sequential probability ratio test on game pairs
+
+    Each opening is played with both colours and the pair is scored as one sample, which removes the noise of openings
+    that favour one colour. The ratio uses the normal approximation of the generalized SPRT, testing an Elo difference
+    of elo0 (H0) against elo1 (H1).
+
+    ARGS:
+        pairs ([int]): number of pairs with each of PAIR_SCORES
+        elo0, elo1 (float, float): Elo differences of the two hypotheses
+    RETURNS:
+        (float): log likelihood ratio, large values favour H1
+    '''
+    total, mean, variance = pair_stats(pairs)
+    score0 = elo_to_score(elo0)
+    score1 = elo_to_score(elo1)
+    return total * (score1 - score0) * (2 * mean - score0 - score1) / (2 * variance)
+
+def sprt_bounds(alpha, beta):
+    '''
+    Stopping bounds of the sequential probability ratio test
+
+    ARGS:
+        alpha (float): chance of accepting H1 when H0 is true
+        beta (float): chance of accepting H0 when H1 is true
+    RETURNS:
+        (float, float): H0 is accepted once the ratio falls below the first bound, H1 once it rises above the second
+    '''
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+def elo_estimate(pairs):
+    '''
+    Estimates the Elo difference from the pair scores
+
+    ARGS:
+        pairs ([int]): number of pairs with each of PAIR_SCORES
+    RETURNS:
+        (float, float, float): Elo difference and the ends of its 95% confidence interval
+    '''
+    total, mean, variance = pair_stats(pairs)
+    margin = 1.96 * math.sqrt(variance / total)
+    return score_to_elo(mean), score_to_elo(mean - margin), score_to_elo(mean + margin)
+
+def play_pair(task):
+    '''
+    Plays one opening with both colours in a worker process
+
+    ARGS:
+        task (tuple): (pair seed, opening, player names (str, str), time limits (float, float), size, backend)
+    RETURNS:
+        ([float]): score of the first player in the game where they play 'O' and in the game where they play 'X'
+    '''
+    seed, opening, names, time_limits, size, backend = task
+
+    scores = []
+    for first_colour in ('O', 'X'):
+        colours = (first_colour, other_player(first_colour))
+
+        #each side gets its own seed derived from the pair seed, the same in both games
+        players = {}
+        for side in range(2):
+            players[colours[side]] = make_player(names[side], seed * 2 + side, time_limits[side])
+
+        result = play_game(players, size, 'O', backend, seed, opening)
+        if(result.winner is None):
+            scores.append(0.5)
+        else:
+            scores.append(1.0 if result.winner == first_colour else 0.0)
+    return scores
+
+def run_match(names, size=8, time_limits=(1.0, 1.0), backend='grid', plies=4, max_pairs=500, elo0=0.0, elo1=10.0,
+              alpha=0.05, beta=0.05, workers=None, seed=0):
+    '''
+    Plays a match between two players until the SPRT accepts a hypothesis or the pair limit is reached
+
+    Pair k is played from opening k of get_openings (wrapping around) with seed seed + k. Pairs finish in whatever
+    order the workers get through them and the test is checked after each one, so where a multi process match stops
+    can change from run to run.
+
+    ARGS:
+        names ((str, str)): player types (see game.make_player), results are from the first player's side
+        size (int): board size
+        time_limits ((float, float)): seconds per move for each player if they search
+        backend (str): board backend to play on
+        plies (int): turns in each fixed opening
+        max_pairs (int): pairs to play at most
+        elo0, elo1 (float, float): Elo differences of H0 and H1 for the first player over the second
+        alpha, beta (float, float): error rates of the test, see sprt_bounds
+        workers (int): number of worker processes, defaults to the number of cores
+        seed (int): seed of the first pair
+    RETURNS:
+        ({str: value}): games and the first player's wins, ties and losses, Elo estimate, final ratio, bounds and
+                        result: 'H1' if the first player is at least elo1 stronger, 'H0' if at most elo0 and None
+                        if the pair limit was reached first
+    '''
+    if(workers is None):
+        workers = multiprocessing.cpu_count()
+
+    openings = get_openings(size, plies)
+    lower, upper = sprt_bounds(alpha, beta)
+    tasks = ((seed + k, openings[k % len(openings)], names, time_limits, size, backend) for k in range(max_pairs))
+
+    pairs = [0] * len(PAIR_SCORES)
+    games = [0, 0, 0]
+    llr = 0.0
+    result = None
+
+    #play in the current process when there's only one worker to save the pool start up time
+    pool = None
+    if(workers <= 1):
+        results = map(play_pair, tasks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(play_pair, tasks)
+
+    #the pool is shut down as soon as the test is decided, dropping the pairs still being played
+    try:
+        for scores in results:
+            pairs[PAIR_SCORES.index(sum(scores) / 2)] += 1
+            for score in scores:
+                games[int(2 - score * 2)] += 1
+
+            llr = sprt_llr(pairs, elo0, elo1)
+            if(llr >= upper):
+                result = 'H1'
+                break
+            if(llr <= lower):
+                result = 'H0'
+                break
+    finally:
+        if(pool is not None):
+            pool.terminate()
+
+    elo, elo_low, elo_high = elo_estimate(pairs)
+    return {
+        'pairs': sum(pairs),
+        'games': sum(games),
+        'wins': games[0],
+        'ties': games[1],
+        'losses': games[2],
+        'pair_counts': dict(zip((str(score) for score in PAIR_SCORES), pairs)),
+        'elo': elo,
+        'elo_low': elo_low,
+        'elo_high': elo_high,
+        'llr': llr,
+        'lower_bound': lower,
+        'upper_bound': upper,
+        'result': result,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Play a match between two players with SPRT early stopping')
+    parser.add_argument('-A', '--player-a', default='ai', help='first player type (random, ai or mcts), results are from its side')
+    parser.add_argument('-B', '--player-b', default='random', help='second player type (random, ai or mcts)')
+    parser.add_argument('--time-a', type=float, default=0.1, help='seconds per move for the first player')
+    parser.add_argument('--time-b', type=float, default=0.1, help='seconds per move for the second player')
+    parser.add_argument('--size', type=int, default=8, help='board size')
+    parser.add_argument('--backend', default='grid', help='board backend to play on')
+    parser.add_argument('--plies', type=int, default=4, help='turns in each fixed opening')
+    parser.add_argument('--pairs', type=int, default=500, help='game pairs to play at most')
+    parser.add_argument('--elo0', type=float, default=0.0, help='Elo difference of H0')
+    parser.add_argument('--elo1', type=float, default=10.0, help='Elo difference of H1')
+    parser.add_argument('--alpha', type=float, default=0.05, help='chance of accepting H1 when H0 is true')
+    parser.add_argument('--beta', type=float, default=0.05, help='chance of accepting H0 when H1 is true')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first pair')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = run_match((args.player_a, args.player_b), args.size, (args.time_a, args.time_b), args.backend, args.plies,
+                        args.pairs, args.elo0, args.elo1, args.alpha, args.beta, args.workers, args.seed)
+    summary['seconds'] = time.perf_counter() - start
+    print(json.dumps(summary, indent=4))
+
+
+if __name__ == "__main__":
+    main()
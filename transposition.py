@@ -0,0 +1,128 @@
+#bound types stored with a score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class TranspositionTable:
+    '''
+    Fixed size hash table of search results keyed on zobrist position hashes
+
+    The table is split into buckets of two slots. The first slot keeps the deepest result seen for the bucket
+    and is only replaced by a result searched at least as deep, the second slot always takes the newest result.
+    Every slot is allocated up front so memory use does not grow during a search.
+
+    Attributes:
+        buckets int: number of buckets (a power of two)
+        probes int: number of lookups
+        hits int: lookups which found their position
+        collisions int: lookups which missed while the bucket held other positions
+        stores int: number of results stored
+        overwrites int: stores which evicted a different position
+
+    Methods:
+        probe(key): returns (depth, score, bound, move) stored for a position or None
+        store(key, depth, score, bound, move): stores a search result
+        clear(): empties the table and resets the statistics
+        get_stats(): returns a dict with the table statistics
+    '''
+    def __init__(self, buckets=1 << 16):
+        '''
+        Constructor
+
+        ARGS:
+            buckets (int): number of buckets, rounded down to a power of two
+        '''
+        self.buckets = 1 << (max(buckets, 1).bit_length() - 1)
+        self.mask = self.buckets - 1
+        self.clear()
+
+    def clear(self):
+        '''
+        Empties the table and resets the statistics
+        '''
+        slots = self.buckets * 2
+
+        #one list per field, slot 2 * bucket is depth preferred and 2 * bucket + 1 always replace
+        self.keys = [None] * slots
+        self.depths = [0] * slots
+        self.scores = [0] * slots
+        self.bounds = [EXACT] * slots
+        self.moves = [None] * slots
+
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def probe(self, key):
+        '''
+        Looks up a position
+
+        ARGS:
+            key (int): zobrist hash of the position
+        RETURNS:
+            ((int, int, int, move)): depth, score, bound type and best move stored for the position, None if not stored
+        '''
+        self.probes += 1
+        slot = (key & self.mask) << 1
+
+        for s in (slot, slot + 1):
+            if(self.keys[s] == key):
+                self.hits += 1
+                return (self.depths[s], self.scores[s], self.bounds[s], self.moves[s])
+
+        if(self.keys[slot] is not None or self.keys[slot + 1] is not None):
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        '''
+        Stores a search result
+
+        ARGS:
+            key (int): zobrist hash of the position
+            depth (int): depth the position was searched to
+            score (int): score found
+            bound (int): EXACT, LOWER (score is a lower bound) or UPPER (score is an upper bound)
+            move: best move found, None if there was none
+        '''
+        self.stores += 1
+        slot = (key & self.mask) << 1
+
+        #the depth preferred slot takes the result if it is for the same position or at least as deep
+        #otherwise it goes in the always replace slot
+        if(self.keys[slot] != key and depth < self.depths[slot] and self.keys[slot] is not None):
+            slot += 1
+
+        if(self.keys[slot] is not None and self.keys[slot] != key):
+            self.overwrites += 1
+
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.scores[slot] = score
+        self.bounds[slot] = bound
+        self.moves[slot] = move
+
+    def get_stats(self):
+        '''
+        Statistics for the table since it was created or cleared
+
+        RETURNS:
+            ({str: number}): probe, hit, collision, store and overwrite counts, hit rate and fraction of slots filled
+        '''
+        filled = sum(1 for key in self.keys if key is not None)
+        return {
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.probes if self.probes else 0.0,
+            'collisions': self.collisions,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'fill': filled / len(self.keys),
+        }
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,53 @@
+import random
+
+#seed for the key tables so hashes are the same in every process (needed for worker pools and stored tables)
+ZOBRIST_SEED = 0x5EED
+
+#xor'd into a position's hash when X is to move, so the same pieces with a different side to move hash differently
+SIDE_KEY = random.Random(ZOBRIST_SEED - 1).getrandbits(64)
+
+#cache of the key tables for each board size, built once per size
+_key_tables = {}
+
+def get_keys(size):
+    '''
+    Gets the zobrist keys for a board size
+
+    Every square has a random 64 bit key for an O piece and one for an X piece. The hash of a position is the
+    xor of the keys of all its pieces, so placing or flipping a piece updates it with one or two xors.
+
+    ARGS:
+        size (int): size of the square board
+    RETURNS:
+        ({str: [int]}): keys indexed by square (i * size + j) under 'O' and 'X', plus 'flip' holding
+                        the xor of both keys for a square which is what flipping a piece there changes
+    '''
+    if(size in _key_tables):
+        return _key_tables[size]
+
+    rng = random.Random(ZOBRIST_SEED + size)
+    o_keys = [rng.getrandbits(64) for square in range(size * size)]
+    x_keys = [rng.getrandbits(64) for square in range(size * size)]
+
+    keys = {'O': o_keys, 'X': x_keys, 'flip': [o ^ x for o, x in zip(o_keys, x_keys)]}
+
+    _key_tables[size] = keys
+    return keys
+
+def position_key(board, player):
+    '''
+    Hash of a position including the side to move
+
+    ARGS:
+        board (Board): board holding the position
+        player (str): 'X' or 'O' for which player is to move
+    RETURNS:
+        (int): 64 bit hash
+    '''
+    if(player == 'X'):
+        return board.hash_key ^ SIDE_KEY
+    return board.hash_key
+
+
+if __name__ == "__main__":
+    pass